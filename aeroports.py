@@ -0,0 +1,124 @@
+import numpy as np
+import pandas as pd
+
+from distances import RAYON_TERRE_KM
+from instrumentation import mesure
+
+
+KM_PAR_DEGRE = np.radians(1) * RAYON_TERRE_KM
+
+# Décalages (en cases) des voisins possibles d'une case : les cases font eps/2 de côté
+DECALAGES = [(dx, dy) for dx in range(-2, 3) for dy in range(-2, 3)]
+
+
+def _composantes_connexes(nb_noeuds, sources, cibles):
+    """Étiquette les composantes connexes d'un graphe par propagation du plus petit numéro."""
+    etiquettes = np.arange(nb_noeuds)
+    while True:
+        precedentes = etiquettes.copy()
+        np.minimum.at(etiquettes, sources, etiquettes[cibles])
+        np.minimum.at(etiquettes, cibles, etiquettes[sources])
+        # Compression des chemins : chaque noeud pointe vers l'étiquette de son étiquette
+        etiquettes = etiquettes[etiquettes]
+        if np.array_equal(etiquettes, precedentes):
+            return etiquettes
+
+
+def etiqueter_positions(latitude, longitude, eps_km=10, min_points=5):
+    """Regroupe des positions en amas de type DBSCAN, accéléré par une grille.
+
+    Les positions sont d'abord agrégées dans des cases de eps_km/2 de côté (deux points
+    d'une même case sont toujours à moins de eps_km). Le DBSCAN s'applique ensuite aux
+    cases, pondérées par leur nombre de points : une case est un coeur si ses voisines à
+    moins de eps_km contiennent au moins min_points positions.
+
+    Arguments:
+    latitude, longitude -- tableaux de positions en degrés (sans NaN)
+    eps_km -- rayon de voisinage en km
+    min_points -- nombre minimal de positions dans le voisinage d'un coeur
+
+    Retourne:
+    tableau numpy des numéros d'amas par position (-1 pour le bruit)
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    if len(latitude) == 0:
+        return np.empty(0, dtype=np.int64)
+
+    # Projection équirectangulaire locale en km
+    y = latitude * KM_PAR_DEGRE
+    x = longitude * KM_PAR_DEGRE * np.cos(np.radians(latitude))
+    cote = eps_km / 2
+    cx = np.floor(x / cote).astype(np.int64)
+    cy = np.floor(y / cote).astype(np.int64)
+
+    # Clé entière unique par case (marge de 2 cases pour les voisines), triée :
+    # les voisines se retrouvent ensuite par recherche dichotomique
+    largeur = cy.max() - cy.min() + 5
+    cles_points = (cx - cx.min() + 2) * largeur + (cy - cy.min() + 2)
+    case_par_point, cles = pd.factorize(cles_points, sort=True)
+    poids = np.bincount(case_par_point)
+    centre_x = np.bincount(case_par_point, weights=x) / poids
+    centre_y = np.bincount(case_par_point, weights=y) / poids
+
+    sources, cibles = [], []
+    for dx, dy in DECALAGES:
+        cles_voisines = cles + dx * largeur + dy
+        j = np.searchsorted(cles, cles_voisines).clip(max=len(cles) - 1)
+        existe = cles[j] == cles_voisines
+        i = np.flatnonzero(existe)
+        j = j[existe]
+        proches = np.hypot(centre_x[i] - centre_x[j], centre_y[i] - centre_y[j]) <= eps_km
+        sources.append(i[proches])
+        cibles.append(j[proches])
+    sources = np.concatenate(sources)
+    cibles = np.concatenate(cibles)
+
+    densite = np.bincount(sources, weights=poids[cibles], minlength=len(cles))
+    coeur = densite >= min_points
+
+    # Les amas sont les composantes connexes des coeurs ; une case frontière rejoint un coeur voisin
+    entre_coeurs = coeur[sources] & coeur[cibles]
+    etiquettes = _composantes_connexes(len(cles), sources[entre_coeurs], cibles[entre_coeurs])
+    etiquettes = np.where(coeur, etiquettes, -1)
+    frontiere = ~coeur[sources] & coeur[cibles]
+    etiquettes[sources[frontiere]] = etiquettes[cibles[frontiere]]
+
+    # Renumérotation compacte 0..k-1
+    amas = np.unique(etiquettes[etiquettes >= 0])
+    numeros = np.full(len(cles), -1)
+    numeros[etiquettes >= 0] = np.searchsorted(amas, etiquettes[etiquettes >= 0])
+    return numeros[case_par_point]
+
+
+@mesure('aeroports.detecter_aeroports')
+def detecter_aeroports(df, eps_km=10, min_points=5):
+    """Détecte les aéroports en regroupant toutes les positions au sol.
+
+    Arguments:
+    df -- DataFrame avec colonnes 'on_ground', 'icao24', 'latitude', 'longitude'
+    eps_km -- rayon de voisinage en km (deux aéroports à moins de eps_km sont fusionnés)
+    min_points -- nombre minimal de positions au sol pour former un aéroport
+
+    Retourne:
+    DataFrame indexé par 'aeroport1', 'aeroport2'... (du plus fréquenté au moins fréquenté)
+    avec colonnes 'latitude', 'longitude' (centroïde), 'nb_positions', 'nb_avions'
+    """
+    sol = df[df['on_ground'].astype(bool) & df['latitude'].notna() & df['longitude'].notna()]
+    amas = etiqueter_positions(sol['latitude'].to_numpy(), sol['longitude'].to_numpy(), eps_km, min_points)
+    dans_un_amas = amas >= 0
+    amas = amas[dans_un_amas]
+    sol = sol[dans_un_amas]
+
+    nb_positions = np.bincount(amas)
+    avions, uniques = pd.factorize(sol['icao24'])
+    couples = pd.unique(amas * len(uniques) + avions) // max(len(uniques), 1)
+    resultat = pd.DataFrame({
+        'latitude': np.bincount(amas, weights=sol['latitude'].to_numpy(np.float64)) / nb_positions,
+        'longitude': np.bincount(amas, weights=sol['longitude'].to_numpy(np.float64)) / nb_positions,
+        'nb_positions': nb_positions,
+        'nb_avions': np.bincount(couples, minlength=len(nb_positions)),
+    })
+    resultat = resultat.sort_values(['nb_avions', 'nb_positions'], ascending=False, kind='stable').reset_index(drop=True)
+    resultat.index = [f"aeroport{i+1}" for i in range(len(resultat))]
+    return resultat
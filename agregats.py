@@ -0,0 +1,220 @@
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from donnees import DOSSIER_AF, charger_af
+from instrumentation import mesure
+from sketches import PRECISION_HLL, estimer_hll, registres_hll
+
+
+FICHIER_CUBE_AF = Path("data/cube_af.parquet")
+
+# Côté des régions (cases de la grille latitude / longitude) en degrés
+TAILLE_REGION = 5.0
+
+DIMENSIONS = ['heure', 'region', 'compagnie']
+
+# Mesures dont le cube garde les moments (nombre, somme, somme des carrés) : nom -> colonne source
+MESURES = {'vitesse': 'velocity', 'altitude': 'baroaltitude'}
+
+
+def regions(latitude, longitude, taille=TAILLE_REGION):
+    """Nom de la case de grille de chaque position, ex: '+45+000' (coin sud-ouest), '' si inconnue."""
+    lat0 = np.floor(np.asarray(latitude, dtype=np.float64) / taille) * taille
+    lon0 = np.floor(np.asarray(longitude, dtype=np.float64) / taille) * taille
+    codes, cases = pd.factorize(pd.MultiIndex.from_arrays([lat0, lon0]))
+    noms = np.array([f"{la:+03.0f}{lo:+04.0f}" if not (np.isnan(la) or np.isnan(lo)) else ''
+                     for la, lo in cases] + [''], dtype=object)
+    return noms[codes]
+
+
+def compagnies(callsign):
+    """Code OACI de la compagnie (3 premières lettres de l'indicatif), '' si inconnu."""
+    return pd.Series(callsign, dtype=object).fillna('').str.strip().str[:3].str.upper().to_numpy()
+
+
+def _matrice_hll(colonne, precision):
+    """Registres HyperLogLog d'une colonne de bytes, sous forme de matrice (lignes, 2**precision)."""
+    return np.frombuffer(b''.join(colonne), dtype=np.uint8).reshape(len(colonne), 2 ** precision)
+
+
+def _regrouper(table, par, precision):
+    """Additionne les moments et fusionne les compteurs HLL des lignes de même clé."""
+    non_additives = DIMENSIONS + ['jour', 'heure_du_jour', 'temps_min', 'temps_max', 'hll']
+    additives = [c for c in table.columns if c not in non_additives]
+    if par:
+        groupes = table.groupby(par, sort=True)
+        numeros = groupes.ngroup().to_numpy()
+        resultat = groupes[additives].sum()
+        resultat['temps_min'] = groupes['temps_min'].min()
+        resultat['temps_max'] = groupes['temps_max'].max()
+        resultat = resultat.reset_index()
+    else:
+        numeros = np.zeros(len(table), dtype=np.int64)
+        resultat = table[additives].sum().to_frame().T
+        resultat['temps_min'] = table['temps_min'].min()
+        resultat['temps_max'] = table['temps_max'].max()
+
+    registres = np.zeros((len(resultat), 2 ** precision), dtype=np.uint8)
+    if len(table):
+        np.maximum.at(registres, numeros, _matrice_hll(table['hll'].to_numpy(), precision))
+    resultat['hll'] = [bytes(r) for r in registres]
+    return resultat
+
+
+class CubeAgregats:
+    """Cube heure x région x compagnie des positions, calculé une fois par jeu de données.
+
+    Chaque cellule garde le nombre de positions, les bornes temporelles, les moments des
+    mesures (vitesse, altitude) et de la position, et un compteur HyperLogLog des avions.
+    Les cellules s'additionnent (et les compteurs se fusionnent) : toute statistique sur
+    une plage d'heures, de jours, de régions ou de compagnies se lit dans le cube.
+    """
+
+    def __init__(self, table, precision=PRECISION_HLL):
+        self.table = table
+        self.precision = precision
+
+    @classmethod
+    def calculer(cls, df, taille_region=TAILLE_REGION, precision=PRECISION_HLL,
+                 latitude='lat', longitude='lon', mesures=MESURES):
+        """Construit le cube à partir des positions brutes (une seule passe vectorisée).
+
+        Arguments:
+        df -- DataFrame avec colonnes 'time', 'icao24', 'callsign', latitude, longitude et les mesures
+        taille_region -- côté des régions en degrés
+        precision -- précision des compteurs HyperLogLog
+        latitude, longitude -- noms des colonnes de position
+        mesures -- dictionnaire nom de mesure -> colonne source
+
+        Retourne:
+        CubeAgregats
+        """
+        lat = df[latitude].to_numpy(dtype=np.float64)
+        lon = df[longitude].to_numpy(dtype=np.float64)
+        t = df['time'].to_numpy(dtype=np.int64)
+        cles = pd.DataFrame({
+            'heure': t // 3600 * 3600,
+            'region': regions(lat, lon, taille_region),
+            'compagnie': compagnies(df['callsign']),
+        })
+        groupes = cles.groupby(DIMENSIONS, sort=True)
+        numeros = groupes.ngroup().to_numpy()
+        table = groupes.size().rename('nb_positions').reset_index()
+        nb = len(table)
+
+        def somme(valeurs):
+            return np.bincount(numeros, weights=np.nan_to_num(valeurs), minlength=nb)
+
+        position_connue = ~(np.isnan(lat) | np.isnan(lon))
+        table['nb_positions_connues'] = np.bincount(numeros, weights=position_connue, minlength=nb)
+        table['somme_latitude'] = somme(np.where(position_connue, lat, 0))
+        table['somme_longitude'] = somme(np.where(position_connue, lon, 0))
+        for nom, colonne in mesures.items():
+            valeurs = df[colonne].to_numpy(dtype=np.float64)
+            table[f'{nom}_n'] = np.bincount(numeros, weights=~np.isnan(valeurs), minlength=nb)
+            table[f'{nom}_somme'] = somme(valeurs)
+            table[f'{nom}_somme_carres'] = somme(valeurs ** 2)
+        bornes = pd.Series(t).groupby(numeros).agg(['min', 'max'])
+        table['temps_min'] = bornes['min'].to_numpy()
+        table['temps_max'] = bornes['max'].to_numpy()
+
+        registre, rang = registres_hll(df['icao24'], precision)
+        registres = np.zeros((nb, 2 ** precision), dtype=np.uint8)
+        np.maximum.at(registres, (numeros, registre), rang)
+        table['hll'] = [bytes(r) for r in registres]
+        return cls(table, precision)
+
+    def fusionner(self, autre):
+        """Cube des deux jeux de données réunis (ex: deux jours collectés séparément)."""
+        table = pd.concat([self.table, autre.table], ignore_index=True)
+        return CubeAgregats(_regrouper(table, DIMENSIONS, self.precision), self.precision)
+
+    def agreger(self, par=(), heures=None, regions=None, compagnies=None):
+        """Statistiques agrégées selon des dimensions du cube, sans relire les positions.
+
+        Arguments:
+        par -- dimensions de regroupement parmi 'heure', 'region', 'compagnie',
+               'jour' et 'heure_du_jour' (UTC) ; vide pour le total
+        heures -- tuple (debut, fin) de timestamps unix pour filtrer les heures (optionnel)
+        regions, compagnies -- listes de valeurs à garder (optionnel)
+
+        Retourne:
+        DataFrame (une ligne par groupe) avec 'nb_avions' (estimation HyperLogLog),
+        'nb_positions', 'debut', 'fin', les moyennes et écarts-types des mesures et la
+        position moyenne
+        """
+        table = self.table
+        if heures is not None:
+            table = table[(table['heure'] + 3600 > heures[0]) & (table['heure'] <= heures[1])]
+        if regions is not None:
+            table = table[table['region'].isin(regions)]
+        if compagnies is not None:
+            table = table[table['compagnie'].isin(compagnies)]
+        table = table.assign(jour=pd.to_datetime(table['heure'], unit='s').dt.date,
+                             heure_du_jour=table['heure'] // 3600 % 24)
+
+        par = list(par)
+        groupes = _regrouper(table, par, self.precision)
+        resultat = groupes[par].copy()
+        resultat['nb_avions'] = np.round(estimer_hll(_matrice_hll(groupes['hll'].to_numpy(), self.precision))).astype(np.int64)
+        resultat['nb_positions'] = groupes['nb_positions'].astype(np.int64)
+        resultat['debut'] = pd.to_datetime(groupes['temps_min'], unit='s')
+        resultat['fin'] = pd.to_datetime(groupes['temps_max'], unit='s')
+        for nom in MESURES:
+            n = groupes[f'{nom}_n'].to_numpy(dtype=np.float64)
+            moyenne = groupes[f'{nom}_somme'].to_numpy(dtype=np.float64) / np.where(n > 0, n, np.nan)
+            carres = groupes[f'{nom}_somme_carres'].to_numpy(dtype=np.float64) / np.where(n > 0, n, np.nan)
+            resultat[f'{nom}_moyenne'] = moyenne
+            resultat[f'{nom}_ecart_type'] = np.sqrt(np.clip(carres - moyenne ** 2, 0, None))
+        n = groupes['nb_positions_connues'].to_numpy(dtype=np.float64)
+        n = np.where(n > 0, n, np.nan)
+        resultat['latitude_moyenne'] = groupes['somme_latitude'].to_numpy(dtype=np.float64) / n
+        resultat['longitude_moyenne'] = groupes['somme_longitude'].to_numpy(dtype=np.float64) / n
+        return resultat.set_index(par) if par else resultat
+
+    def total(self, **filtres):
+        """Statistiques de l'ensemble du cube (ou d'une partie, voir agreger) sous forme de Series."""
+        return self.agreger((), **filtres).iloc[0]
+
+    def sauvegarder(self, chemin):
+        self.table.to_parquet(chemin, index=False)
+
+    @classmethod
+    def charger(cls, chemin):
+        table = pd.read_parquet(chemin)
+        return cls(table, int(np.log2(len(table['hll'].iloc[0])) if len(table) else PRECISION_HLL))
+
+
+@mesure('agregats.charger_cube_af')
+def charger_cube_af(chemin=FICHIER_CUBE_AF):
+    """Lit le cube des données Air France, en le (re)calculant si besoin.
+
+    Le cube est recalculé si le fichier n'existe pas ou est plus ancien que le dataset AF_daily.
+
+    Retourne:
+    CubeAgregats
+    """
+    chemin = Path(chemin)
+    if chemin.exists() and (not DOSSIER_AF.exists() or chemin.stat().st_mtime >= DOSSIER_AF.stat().st_mtime):
+        return CubeAgregats.charger(chemin)
+    colonnes = ['time', 'icao24', 'callsign', 'lat', 'lon'] + list(MESURES.values())
+    cube = CubeAgregats.calculer(charger_af(colonnes))
+    cube.sauvegarder(chemin)
+    return cube
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Calcul du cube heure x région x compagnie des données Air France")
+    parser.add_argument('--cible', default=FICHIER_CUBE_AF, type=Path, help="fichier parquet du cube")
+    args = parser.parse_args()
+    if args.cible.exists():
+        args.cible.unlink()
+    cube = charger_cube_af(args.cible)
+    print(f"Cube : {len(cube.table)} cellules -> {args.cible}")
+
+
+if __name__ == "__main__":
+    main()
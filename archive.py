@@ -0,0 +1,349 @@
+import argparse
+import json
+import pickle
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from conversion import charger_instantane
+
+
+VERSION_ARCHIVE = 1
+DOSSIER_ARCHIVE = Path("data/archive")
+
+# Code des valeurs manquantes dans les colonnes codées par dictionnaire
+CODE_MANQUANT = np.uint32(0xFFFFFFFF)
+
+# Colonnes ignorées : listes de longueur variable, sans intérêt pour le rejeu
+COLONNES_IGNOREES = ['sensors', 'heure']
+
+
+class EcrivainArchive:
+    """Écrit une archive d'instantanés en colonnes binaires de largeur fixe.
+
+    Arborescence du dossier :
+    - entete.json : nombre de lignes, types des colonnes, largeur des dictionnaires ;
+    - <colonne>.bin : valeurs brutes de chaque colonne, lignes triées par temps ;
+    - <colonne>.dict : dictionnaire (chaînes de largeur fixe) des colonnes texte, dont
+      icao24, stockées sous forme de codes uint32 ;
+    - temps.bin / debuts.bin : temps de chaque instantané et indice de sa première ligne ;
+    - avions.bin / debuts_avions.bin : lignes triées par (icao24, temps) et indice de la
+      première ligne de chaque avion.
+
+    Les instantanés sont ajoutés dans l'ordre chronologique (même interface que
+    collecte.StockageInstantanes) ; les index sont écrits à la fermeture.
+    """
+
+    def __init__(self, dossier, temps='time'):
+        self.dossier = Path(dossier)
+        if (self.dossier / "entete.json").exists():
+            raise FileExistsError(f"Une archive existe déjà dans {self.dossier}")
+        self.dossier.mkdir(parents=True, exist_ok=True)
+        self.colonne_temps = temps
+        self.types = None
+        self.dictionnaires = {}
+        self.nb_lignes = 0
+        self.temps = []
+        self.tailles = []
+
+    def _schema(self, df):
+        """Fixe les types des colonnes au premier lot : numériques tels quels, le reste par dictionnaire."""
+        self.types = {}
+        for nom in df.columns:
+            if nom == self.colonne_temps:
+                self.types[nom] = np.dtype(np.int64)
+            elif df[nom].dtype.kind in 'biufM':
+                self.types[nom] = df[nom].dtype
+            else:
+                self.types[nom] = None
+                self.dictionnaires[nom] = pd.Index([], dtype=object)
+        for nom in self.types:
+            (self.dossier / f"{nom}.bin").write_bytes(b'')
+
+    def _coder(self, nom, valeurs):
+        """Codes uint32 d'une colonne texte ; le dictionnaire grandit au fil des lots."""
+        codes, uniques = pd.factorize(valeurs)
+        uniques = pd.Index(np.asarray(uniques, dtype=object).astype(str), dtype=object)
+        globaux = self.dictionnaires[nom].get_indexer(uniques)
+        if (globaux < 0).any():
+            self.dictionnaires[nom] = self.dictionnaires[nom].append(uniques[globaux < 0])
+            globaux = self.dictionnaires[nom].get_indexer(uniques)
+        return np.r_[globaux, CODE_MANQUANT].astype(np.uint32)[codes]
+
+    def ajouter_lot(self, df):
+        """Ajoute plusieurs instantanés d'un coup (DataFrame avec la colonne de temps).
+
+        Retourne:
+        nombre de lignes écrites
+        """
+        df = df.drop(columns=COLONNES_IGNOREES, errors='ignore')
+        df = df.sort_values([self.colonne_temps, 'icao24'], kind='stable')
+        if self.types is None:
+            self._schema(df)
+        if set(df.columns) != set(self.types):
+            raise ValueError(f"Colonnes différentes de celles de l'archive : {sorted(set(df.columns) ^ set(self.types))}")
+
+        t = df[self.colonne_temps].to_numpy(dtype=np.int64)
+        if len(t) == 0:
+            return 0
+        if self.temps and t[0] <= self.temps[-1]:
+            raise ValueError("Les instantanés doivent être ajoutés dans l'ordre chronologique")
+
+        for nom, type_colonne in self.types.items():
+            if type_colonne is None:
+                valeurs = self._coder(nom, df[nom])
+            else:
+                valeurs = df[nom].to_numpy().astype(type_colonne, copy=False)
+            with open(self.dossier / f"{nom}.bin", 'ab') as handle:
+                handle.write(np.ascontiguousarray(valeurs).tobytes())
+
+        instantanes, tailles = np.unique(t, return_counts=True)
+        self.temps.extend(instantanes.tolist())
+        self.tailles.extend(tailles.tolist())
+        self.nb_lignes += len(df)
+        return len(df)
+
+    def ajouter(self, temps, df):
+        """Ajoute un instantané (DataFrame typé des états, voir conversion.dataframe_etats)."""
+        return self.ajouter_lot(df.assign(**{self.colonne_temps: int(temps)}))
+
+    def fermer(self):
+        """Écrit les dictionnaires, l'index temporel, l'index par avion et l'en-tête."""
+        if self.types is None:
+            raise ValueError("Archive vide : aucun instantané ajouté")
+        colonnes = {}
+        for nom, type_colonne in self.types.items():
+            if type_colonne is None:
+                valeurs = list(self.dictionnaires[nom])
+                largeur = max((len(v.encode('utf-8')) for v in valeurs), default=1) or 1
+                (self.dossier / f"{nom}.dict").write_bytes(
+                    np.array([v.encode('utf-8') for v in valeurs], dtype=f'S{largeur}').tobytes())
+                colonnes[nom] = {'type': np.dtype(np.uint32).str, 'dictionnaire': largeur,
+                                 'taille_dictionnaire': len(valeurs)}
+            else:
+                colonnes[nom] = {'type': type_colonne.str}
+
+        (self.dossier / "temps.bin").write_bytes(np.array(self.temps, dtype=np.int64).tobytes())
+        (self.dossier / "debuts.bin").write_bytes(np.r_[0, np.cumsum(self.tailles)].astype(np.int64).tobytes())
+
+        # Index par avion : un seul tri stable des codes (les lignes sont déjà chronologiques)
+        codes = np.fromfile(self.dossier / "icao24.bin", dtype=np.uint32)
+        ordre = np.argsort(codes, kind='stable')
+        debuts_avions = np.searchsorted(codes[ordre], np.arange(len(self.dictionnaires['icao24']) + 1))
+        (self.dossier / "avions.bin").write_bytes(ordre.astype(np.int64).tobytes())
+        (self.dossier / "debuts_avions.bin").write_bytes(debuts_avions.astype(np.int64).tobytes())
+
+        entete = {'version': VERSION_ARCHIVE, 'nb_lignes': self.nb_lignes, 'nb_instantanes': len(self.temps),
+                  'colonne_temps': self.colonne_temps, 'colonnes': colonnes}
+        # L'en-tête est écrit en dernier : une archive interrompue n'est jamais ouverte
+        (self.dossier / "entete.json").write_text(json.dumps(entete, indent=2), encoding='utf-8')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type_exc, exc, tb):
+        if type_exc is None:
+            self.fermer()
+
+
+def _memmap(chemin, dtype, taille):
+    """Tableau projeté en mémoire (np.memmap ne sait pas projeter un fichier vide)."""
+    if taille == 0:
+        return np.empty(0, dtype=dtype)
+    return np.memmap(chemin, dtype=dtype, mode='r', shape=(taille,))
+
+
+class Archive:
+    """Lecture d'une archive d'instantanés par projection mémoire (voir EcrivainArchive).
+
+    Rien n'est chargé à l'ouverture : une tranche de temps ou un avion ne lit que les
+    pages des fichiers qui le concernent, quelle que soit la taille de l'archive.
+    """
+
+    def __init__(self, dossier=DOSSIER_ARCHIVE):
+        self.dossier = Path(dossier)
+        self.entete = json.loads((self.dossier / "entete.json").read_text(encoding='utf-8'))
+        if self.entete['version'] != VERSION_ARCHIVE:
+            raise ValueError(f"Version d'archive non prise en charge : {self.entete['version']}")
+        self.nb_lignes = self.entete['nb_lignes']
+        self.colonne_temps = self.entete['colonne_temps']
+        self.colonnes = list(self.entete['colonnes'])
+        self.temps = _memmap(self.dossier / "temps.bin", np.int64, self.entete['nb_instantanes'])
+        self.debuts = _memmap(self.dossier / "debuts.bin", np.int64, self.entete['nb_instantanes'] + 1)
+        self._valeurs = {}
+        self._categories = {}
+
+    def __len__(self):
+        return len(self.temps)
+
+    def _colonne(self, nom):
+        if nom not in self._valeurs:
+            description = self.entete['colonnes'][nom]
+            self._valeurs[nom] = _memmap(self.dossier / f"{nom}.bin", np.dtype(description['type']), self.nb_lignes)
+        return self._valeurs[nom]
+
+    def categories(self, nom):
+        """Dictionnaire d'une colonne texte (Index pandas des valeurs, dans l'ordre des codes)."""
+        if nom not in self._categories:
+            description = self.entete['colonnes'][nom]
+            brut = _memmap(self.dossier / f"{nom}.dict", np.dtype(f"S{description['dictionnaire']}"),
+                           description['taille_dictionnaire'])
+            self._categories[nom] = pd.Index(np.char.decode(np.asarray(brut), 'utf-8').astype(object))
+        return self._categories[nom]
+
+    def _dataframe(self, lignes, colonnes):
+        """DataFrame des lignes demandées (tranche ou tableau d'indices), colonnes texte catégorielles."""
+        donnees = {}
+        for nom in colonnes or self.colonnes:
+            valeurs = np.asarray(self._colonne(nom)[lignes])
+            if 'dictionnaire' in self.entete['colonnes'][nom]:
+                codes = valeurs.astype(np.int64)
+                codes[valeurs == CODE_MANQUANT] = -1
+                valeurs = pd.Categorical.from_codes(codes, self.categories(nom))
+            donnees[nom] = valeurs
+        return pd.DataFrame(donnees)
+
+    def bornes(self, debut=None, fin=None):
+        """Numéros des instantanés [premier, dernier[ entre deux timestamps (bornes incluses)."""
+        premier = 0 if debut is None else int(np.searchsorted(self.temps, debut, side='left'))
+        dernier = len(self.temps) if fin is None else int(np.searchsorted(self.temps, fin, side='right'))
+        return premier, max(premier, dernier)
+
+    def lire(self, debut=None, fin=None, colonnes=None):
+        """Lit toutes les lignes entre deux timestamps (bornes incluses), sans lire le reste.
+
+        Arguments:
+        debut, fin -- timestamps unix (défaut: pas de borne)
+        colonnes -- liste de colonnes à lire (défaut: toutes)
+
+        Retourne:
+        DataFrame pandas trié par (temps, icao24)
+        """
+        premier, dernier = self.bornes(debut, fin)
+        return self._dataframe(slice(int(self.debuts[premier]), int(self.debuts[dernier])), colonnes)
+
+    def instantane(self, numero, colonnes=None):
+        """Lit l'instantané numéro (0 pour le premier, -1 pour le dernier).
+
+        Retourne:
+        tuple (temps, DataFrame)
+        """
+        numero = range(len(self.temps))[numero]
+        lignes = slice(int(self.debuts[numero]), int(self.debuts[numero + 1]))
+        return int(self.temps[numero]), self._dataframe(lignes, colonnes)
+
+    def avion(self, icao24, colonnes=None):
+        """Lit toute la trajectoire d'un avion grâce à l'index par avion.
+
+        Retourne:
+        DataFrame pandas trié par temps (vide si l'avion est absent de l'archive)
+        """
+        code = self.categories('icao24').get_indexer([icao24])[0]
+        if code < 0:
+            return self._dataframe(slice(0, 0), colonnes)
+        debuts = _memmap(self.dossier / "debuts_avions.bin", np.int64, len(self.categories('icao24')) + 1)
+        ordre = _memmap(self.dossier / "avions.bin", np.int64, self.nb_lignes)
+        return self._dataframe(np.asarray(ordre[debuts[code]:debuts[code + 1]]), colonnes)
+
+    def rejouer(self, debut=None, fin=None, vitesse=1.0, colonnes=None, attendre=time.sleep):
+        """Rejoue les instantanés un par un, au rythme d'origine ou accéléré.
+
+        Un seul instantané est en mémoire à la fois : la mémoire utilisée ne dépend pas
+        de la taille de l'archive.
+
+        Arguments:
+        debut, fin -- timestamps unix des bornes du rejeu (défaut: toute l'archive)
+        vitesse -- facteur d'accélération (1 : temps réel, 10 : dix fois plus vite,
+                   None : sans attente)
+        colonnes -- liste de colonnes à lire (défaut: toutes)
+        attendre -- fonction d'attente (remplaçable pour les tests)
+
+        Retourne:
+        générateur de tuples (temps, DataFrame)
+        """
+        premier, dernier = self.bornes(debut, fin)
+        depart = time.monotonic()
+        for numero in range(premier, dernier):
+            if vitesse:
+                echeance = (self.temps[numero] - self.temps[premier]) / vitesse
+                attendre(max(0.0, echeance - (time.monotonic() - depart)))
+            yield self.instantane(numero, colonnes)
+
+
+class SourceArchive:
+    """Source de collecte hors ligne : rejoue une archive (voir collecte.Collecteur)."""
+
+    def __init__(self, dossier, debut=None, fin=None):
+        self.instantanes = Archive(dossier).rejouer(debut, fin, vitesse=None)
+
+    def lire(self):
+        return next(self.instantanes)  # StopIteration termine la collecte
+
+
+def _ajouter_dataframe(ecrivain, df):
+    """Ajoute un DataFrame d'états : plusieurs instantanés s'il a la colonne de temps,
+    sinon un seul, daté du dernier contact reçu (comme un instantané OpenSky)."""
+    if ecrivain.colonne_temps in df.columns:
+        ecrivain.ajouter_lot(df)
+    elif 'last_contact' in df.columns:
+        ecrivain.ajouter(df['last_contact'].max(), df)
+    else:
+        raise ValueError(f"Ni colonne '{ecrivain.colonne_temps}' ni colonne 'last_contact' : "
+                         "impossible de dater les instantanés")
+
+
+def convertir(source, cible):
+    """Convertit des instantanés en archive.
+
+    Arguments:
+    source -- pickle ou JSON d'un instantané OpenSky (data/states.pkl), pickle d'un DataFrame
+              (data/AF_daily.dat), fichier parquet ou stockage collecte.StockageInstantanes
+              (dossier) ; un DataFrame sans colonne 'time' est un seul instantané, daté de
+              son dernier contact (data/df_states.parquet)
+    cible -- dossier de l'archive
+
+    Retourne:
+    Archive ouverte
+    """
+    source = Path(source)
+    with EcrivainArchive(cible) as ecrivain:
+        if source.is_dir() or source.suffix == '.parquet':
+            _ajouter_dataframe(ecrivain, pd.read_parquet(source))
+        elif source.suffix == '.json':
+            with open(source, 'r', encoding='utf-8') as handle:
+                temps = json.load(handle)['time']
+            ecrivain.ajouter(temps, charger_instantane(source))
+        else:
+            with open(source, 'rb') as handle:
+                contenu = pickle.load(handle)
+            if isinstance(contenu, pd.DataFrame):
+                _ajouter_dataframe(ecrivain, contenu)
+            else:
+                df = charger_instantane(source)
+                ecrivain.ajouter(getattr(contenu, 'time', None) or df['last_contact'].max(), df)
+    return Archive(cible)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Archive d'instantanés en colonnes binaires projetées en mémoire")
+    commandes = parser.add_subparsers(dest='commande', required=True)
+    conversion = commandes.add_parser('convertir', help="convertit des instantanés en archive")
+    conversion.add_argument('source', type=Path, help="states.pkl, AF_daily.dat, parquet ou stockage de collecte")
+    conversion.add_argument('cible', type=Path, nargs='?', default=DOSSIER_ARCHIVE, help="dossier de l'archive")
+    rejeu = commandes.add_parser('rejouer', help="rejoue une archive instantané par instantané")
+    rejeu.add_argument('archive', type=Path, nargs='?', default=DOSSIER_ARCHIVE)
+    rejeu.add_argument('--vitesse', type=float, default=1.0, help="facteur d'accélération (0 : sans attente)")
+    args = parser.parse_args()
+
+    if args.commande == 'convertir':
+        archive = convertir(args.source, args.cible)
+        print(f"{args.source} -> {args.cible} : {archive.nb_lignes} lignes, {len(archive)} instantanés")
+    else:
+        for temps, df in Archive(args.archive).rejouer(vitesse=args.vitesse or None):
+            print(f"Instantané {temps} : {len(df)} avions")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,10 @@
+import numpy as np
+import pandas as pd
+
+from conversion import colonnes_etats
+from instrumentation import mesure
+
+
 class Avion:
     """
     Représente un aéronef avec ses caractéristiques de vol essentielles.
@@ -12,6 +19,8 @@ class Avion:
         on_ground (bool): True si l'avion est au sol
     """
     
+    __slots__ = ('icao24', 'callsign', 'longitude', 'latitude', 'velocity', 'true_track', 'on_ground')
+    
     def __init__(self, icao24, callsign, longitude, latitude, velocity, true_track, on_ground):
         self.icao24 = icao24
         self.callsign = callsign if callsign else "N/A"
@@ -94,9 +103,9 @@ class Avion:
         Vérifie si l'avion possède des coordonnées valides.
         
         Returns:
-            bool: True si longitude et latitude ne sont pas None
+            bool: True si longitude et latitude ne sont ni None ni NaN
         """
-        return self.longitude is not None and self.latitude is not None
+        return _connue(self.longitude) and _connue(self.latitude)
     
     def __repr__(self):
         """
@@ -106,10 +115,146 @@ class Avion:
             str: Chaîne décrivant l'avion
         """
         status = "au sol" if self.on_ground else "en vol"
+        position = f"({self.latitude:.2f}, {self.longitude:.2f})" if self.is_valid_position() else "inconnue"
         return (f"Avion(icao24={self.icao24}, callsign={self.callsign}, "
-                f"pos=({self.latitude:.2f}, {self.longitude:.2f}), "
+                f"pos={position}, "
                 f"vitesse={self.get_velocity_kmh():.0f} km/h, "
                 f"cap={self.true_track:.0f}°, {status})")
+
+
+class Flotte:
+    """
+    Ensemble d'aéronefs stocké sous forme de tableaux numpy parallèles (un tableau par attribut).
     
+    Les objets Avion ne sont créés qu'à la demande, lors de l'accès à un élément ou de l'itération.
+    Les valeurs manquantes des colonnes numériques sont représentées par NaN.
+    
+    Attributes:
+        icao24 (np.ndarray): Adresses ICAO24
+        callsign (np.ndarray): Indicatifs d'appel
+        longitude (np.ndarray): Longitudes en degrés
+        latitude (np.ndarray): Latitudes en degrés
+        velocity (np.ndarray): Vitesses au sol en m/s
+        true_track (np.ndarray): Directions vraies en degrés
+        on_ground (np.ndarray): True pour les avions au sol
+    """
+    
+    __slots__ = Avion.__slots__
+    
+    def __init__(self, icao24, callsign, longitude, latitude, velocity, true_track, on_ground):
+        self.icao24 = np.asarray(icao24)
+        self.callsign = np.asarray(callsign)
+        self.longitude = _flottants(longitude)
+        self.latitude = _flottants(latitude)
+        self.velocity = _flottants(velocity)
+        self.true_track = _flottants(true_track)
+        self.on_ground = np.asarray(on_ground, dtype=bool)
+    
+    @classmethod
+    @mesure('avion.Flotte.from_dataframe')
+    def from_dataframe(cls, df):
+        """
+        Crée une Flotte à partir d'un DataFrame, sans copier les colonnes numériques.
+        
+        Args:
+            df (pd.DataFrame): DataFrame contenant les colonnes de Avion.__slots__
+            
+        Returns:
+            Flotte: Flotte partageant la mémoire des colonnes du DataFrame
+        """
+        return cls(*(df[champ].to_numpy() for champ in cls.__slots__))
+    
+    @classmethod
+    @mesure('avion.Flotte.from_states')
+    def from_states(cls, states):
+        """
+        Crée une Flotte à partir d'un instantané OpenSky (OpenSkyStates ou JSON de l'API REST).
+        
+        Args:
+            states: Objet OpenSkyStates ou dictionnaire {"time": ..., "states": [...]}
+            
+        Returns:
+            Flotte: Flotte construite en une seule passe sur les StateVector
+        """
+        colonnes = colonnes_etats(states)
+        return cls(*(colonnes[champ] for champ in cls.__slots__))
+    
+    @classmethod
+    def from_avions(cls, liste_avion):
+        """
+        Crée une Flotte à partir d'une liste d'objets Avion.
+        
+        Args:
+            liste_avion (list): Liste d'objets Avion
+            
+        Returns:
+            Flotte: Flotte contenant les mêmes aéronefs
+        """
+        liste_avion = list(liste_avion)
+        return cls(*([getattr(a, champ) for a in liste_avion] for champ in cls.__slots__))
+    
+    def __len__(self):
+        return len(self.icao24)
+    
+    def __getitem__(self, cle):
+        """
+        Retourne un Avion (indice entier) ou une sous-Flotte (tranche, masque booléen, indices).
+        """
+        if isinstance(cle, (int, np.integer)):
+            # Valeurs Python comme from_state_vector : NaN redevient None (callsign "N/A", vitesse 0...)
+            return Avion(*(_scalaire(getattr(self, champ)[cle]) for champ in self.__slots__))
+        return Flotte(*(getattr(self, champ)[cle] for champ in self.__slots__))
+    
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+    
+    def to_dataframe(self):
+        """
+        Convertit la Flotte en DataFrame.
+        
+        Returns:
+            pd.DataFrame: Une colonne par attribut
+        """
+        return pd.DataFrame({champ: getattr(self, champ) for champ in self.__slots__})
+    
+    def get_velocity_kmh(self):
+        """
+        Retourne les vitesses en km/h (0 pour les vitesses inconnues, comme Avion).
+        
+        Returns:
+            np.ndarray: Vitesses en km/h
+        """
+        return np.nan_to_num(self.velocity, nan=0.0) * 3.6
+    
+    def is_valid_position(self):
+        """
+        Indique pour chaque avion s'il possède des coordonnées valides.
+        
+        Returns:
+            np.ndarray: Masque booléen, True si longitude et latitude sont connues
+        """
+        return ~(np.isnan(self.longitude) | np.isnan(self.latitude))
+    
+    def __repr__(self):
+        return f"Flotte({len(self)} avions, {int(self.on_ground.sum())} au sol)"
+
+
+def _flottants(valeurs):
+    """Convertit une séquence en tableau de flottants (None devient NaN), sans copie si déjà numérique."""
+    tableau = np.asarray(valeurs)
+    if tableau.dtype.kind != 'f':
+        tableau = tableau.astype(float)
+    return tableau
+
+
+def _connue(valeur):
+    """True si la valeur n'est ni None ni NaN."""
+    return valeur is not None and not (isinstance(valeur, (float, np.floating)) and np.isnan(valeur))
 
 
+def _scalaire(valeur):
+    """Convertit un élément de tableau numpy en valeur Python (NaN devient None)."""
+    if isinstance(valeur, np.generic):
+        valeur = valeur.item()
+    return valeur if _connue(valeur) else None
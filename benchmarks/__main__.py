@@ -0,0 +1,189 @@
+import argparse
+import fnmatch
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import timeit
+import traceback
+from datetime import datetime, timezone
+from pathlib import Path
+
+# Avant tout import de l'application : rendu sans écran, tuiles hors ligne et cache vide
+# (les cartes sont tracées sur fond gris, sans accès réseau ni tuiles déjà en cache)
+os.environ.setdefault("MPLBACKEND", "Agg")
+os.environ["TUILES_HORS_LIGNE"] = "1"
+os.environ.setdefault("TRACK_AIRCRAFT_CACHE", tempfile.mkdtemp(prefix="benchmarks-cache-"))
+
+import cartopy.crs as ccrs  # noqa: E402
+import cartopy.feature as cf  # noqa: E402
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+
+from benchmarks.cas import CAS  # noqa: E402
+
+
+# Fonds Natural Earth utilisés par utils (téléchargés par cartopy au premier tracé)
+FONDS_NATURAL_EARTH = ['BORDERS', 'COASTLINE', 'LAKES', 'LAND', 'OCEAN', 'RIVERS', 'STATES']
+
+
+def fonds_hors_ligne():
+    """Remplace les fonds Natural Earth de cartopy par des couches vides.
+
+    Comme les tuiles hors ligne, les tracés ne dépendent alors ni du réseau ni des
+    données déjà téléchargées : les mesures sont comparables d'une machine à l'autre.
+    """
+    for nom in FONDS_NATURAL_EARTH:
+        setattr(cf, nom, cf.ShapelyFeature([], ccrs.PlateCarree()))
+
+
+DOSSIER_RESULTATS = Path(__file__).parent / "resultats"
+
+# Au-delà de ce ratio de temps médian (nouveau / référence), un cas est signalé en régression
+SEUIL_REGRESSION = 1.2
+
+# Mode rapide : tailles les plus petites seulement
+TAILLE_MAX_RAPIDE = 100_000
+
+
+def _git(*args):
+    try:
+        return subprocess.run(['git', *args], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def commit_courant():
+    """Retourne (identifiant du commit, True si l'arbre de travail est modifié)."""
+    commit = _git('rev-parse', 'HEAD') or 'inconnu'
+    modifie = bool(_git('status', '--porcelain', '--untracked-files=no'))
+    return commit, modifie
+
+
+def mesurer(fonction, repetitions):
+    """Chronomètre une fonction avec timeit (nombre d'appels par mesure choisi automatiquement).
+
+    Retourne:
+    dictionnaire 'min_s', 'mediane_s' (secondes par appel), 'appels' (par mesure), 'repetitions'
+    """
+    chrono = timeit.Timer(fonction)
+    appels, _ = chrono.autorange()
+    temps = np.array(chrono.repeat(repeat=repetitions, number=appels)) / appels
+    return {'min_s': float(temps.min()), 'mediane_s': float(np.median(temps)),
+            'appels': appels, 'repetitions': repetitions}
+
+
+def executer(filtre='*', rapide=False, repetitions=5):
+    """Exécute les cas de mesure dont le nom correspond au filtre (motif fnmatch).
+
+    Retourne:
+    dictionnaire "nom[taille]" -> mesures (ou {'erreur': message})
+    """
+    resultats = {}
+    for nom, (tailles, preparer) in CAS.items():
+        if not fnmatch.fnmatch(nom, filtre):
+            continue
+        for taille in tailles:
+            if rapide and taille > TAILLE_MAX_RAPIDE:
+                continue
+            cle = f"{nom}[{taille}]"
+            try:
+                resultats[cle] = mesurer(preparer(taille), repetitions)
+                print(f"{cle:55s} {resultats[cle]['mediane_s'] * 1e3:12.2f} ms", flush=True)
+            except Exception as e:
+                # Un cas en échec n'arrête pas la série
+                resultats[cle] = {'erreur': f"{type(e).__name__}: {e}"}
+                print(f"{cle:55s} {'ERREUR':>12s}  {resultats[cle]['erreur']}", flush=True)
+                traceback.print_exc(limit=2)
+    return resultats
+
+
+def sauvegarder(resultats, dossier=DOSSIER_RESULTATS):
+    """Enregistre les résultats sous le nom du commit courant (suffixe -modifie si l'arbre est modifié).
+
+    Retourne:
+    chemin du fichier JSON
+    """
+    commit, modifie = commit_courant()
+    dossier = Path(dossier)
+    dossier.mkdir(parents=True, exist_ok=True)
+    chemin = dossier / f"{commit[:12]}{'-modifie' if modifie else ''}.json"
+    anciens = json.loads(chemin.read_text(encoding='utf-8'))['resultats'] if chemin.exists() else {}
+    contenu = {
+        'commit': commit,
+        'modifie': modifie,
+        'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'machine': {'systeme': platform.platform(), 'processeur': platform.processor() or platform.machine(),
+                    'nb_coeurs': os.cpu_count()},
+        'versions': {'python': platform.python_version(), 'numpy': np.__version__, 'pandas': pd.__version__},
+        # Une exécution partielle (--filtre, --rapide) complète les résultats du même commit
+        'resultats': {**anciens, **resultats},
+    }
+    chemin.write_text(json.dumps(contenu, indent=2, ensure_ascii=False), encoding='utf-8')
+    return chemin
+
+
+def comparer(resultats, reference, dossier=DOSSIER_RESULTATS, seuil=SEUIL_REGRESSION):
+    """Compare des résultats à ceux d'un commit de référence et affiche les écarts.
+
+    Arguments:
+    resultats -- résultats de executer
+    reference -- commit (identifiant, branche, HEAD~1...) dont les résultats sont enregistrés
+    seuil -- ratio des temps médians au-delà duquel un cas est en régression
+
+    Retourne:
+    liste des cas en régression
+    """
+    commit = _git('rev-parse', reference) or reference
+    # Résultats de l'arbre propre en priorité, sinon ceux de l'arbre modifié
+    fichiers = [f for f in (Path(dossier) / f"{commit[:12]}.json", Path(dossier) / f"{commit[:12]}-modifie.json")
+                if f.exists()]
+    if not fichiers:
+        print(f"Aucun résultat enregistré pour {reference}")
+        return []
+    anciens = json.loads(fichiers[0].read_text(encoding='utf-8'))['resultats']
+
+    regressions = []
+    print(f"\nComparaison avec {reference} ({commit[:12]}) :")
+    for cle, mesure in resultats.items():
+        ancien = anciens.get(cle, {})
+        if 'mediane_s' not in mesure or 'mediane_s' not in ancien:
+            continue
+        ratio = mesure['mediane_s'] / ancien['mediane_s']
+        marque = 'RÉGRESSION' if ratio > seuil else ('amélioration' if ratio < 1 / seuil else '')
+        print(f"{cle:55s} {ancien['mediane_s'] * 1e3:10.2f} -> {mesure['mediane_s'] * 1e3:10.2f} ms  x{ratio:5.2f}  {marque}")
+        if ratio > seuil:
+            regressions.append(cle)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mesures de performance sur données synthétiques",
+                                     prog="python -m benchmarks")
+    parser.add_argument('--filtre', default='*', help="motif des cas à exécuter (ex: 'utils.*')")
+    parser.add_argument('--rapide', action='store_true', help=f"tailles <= {TAILLE_MAX_RAPIDE} seulement")
+    parser.add_argument('--repetitions', type=int, default=5, help="nombre de mesures par cas")
+    parser.add_argument('--comparer', metavar='COMMIT', help="commit de référence (ex: HEAD~1)")
+    parser.add_argument('--seuil', type=float, default=SEUIL_REGRESSION,
+                        help="ratio de temps signalé comme régression")
+    parser.add_argument('--liste', action='store_true', help="affiche les cas sans les exécuter")
+    args = parser.parse_args()
+
+    if args.liste:
+        for nom, (tailles, _) in CAS.items():
+            print(f"{nom:45s} {tailles}")
+        return
+
+    fonds_hors_ligne()
+    resultats = executer(args.filtre, args.rapide, args.repetitions)
+    # Comparaison avant l'enregistrement, qui peut remplacer les résultats de la référence
+    regressions = comparer(resultats, args.comparer, seuil=args.seuil) if args.comparer else []
+    print(f"Résultats enregistrés dans {sauvegarder(resultats)}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,261 @@
+"""Cas de mesure : chaque cas prépare ses données (non chronométré) et retourne la fonction mesurée."""
+import asyncio
+import pickle
+import runpy
+import tempfile
+from contextlib import chdir
+from functools import cache
+from io import BytesIO
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import numpy as np
+
+from aeroports import detecter_aeroports
+from agregats import CubeAgregats
+from archive import Archive, EcrivainArchive
+from avion import Avion, Flotte
+from benchmarks.generateurs import AEROPORTS, EMPRISE_ETATS, etats_opensky, trajectoires_application, trajectoires_journalieres
+from benchmarks.serveur import ServeurOpenSky
+from cache_rendu import OPTIONS_PNG
+from client_async import ClientOpenSkyAsync
+from conversion import dataframe_etats, typer_dataframe
+from distances import haversine
+from evenements import evenements_aeroports
+from index_spatial import IndexSpatial
+from segmentation import segmenter_vols
+from simplification import simplifier_pour_zoom
+from utils import (collection_approches, plot_approches_aeroport, plot_avions, plot_tous_les_vols, plot_trajet_avion,
+                   tracer_position_moyenne)
+
+
+FLOTTES = [1_000, 10_000, 100_000]
+TRAJECTOIRES = [100_000, 1_000_000]
+
+# Nom du cas -> (tailles, fonction de préparation)
+CAS = {}
+
+
+def cas(nom, tailles):
+    """Enregistre un cas de mesure ; la fonction décorée reçoit la taille et retourne la fonction mesurée."""
+    def decorateur(preparer):
+        CAS[nom] = (tailles, preparer)
+        return preparer
+    return decorateur
+
+
+def _rendu(fig):
+    """Enregistre la figure en PNG comme cache_rendu, puis la ferme."""
+    fig.savefig(BytesIO(), **OPTIONS_PNG)
+    plt.close(fig)
+
+
+# Ingestion et conversion
+
+@cas('conversion.dataframe_etats', FLOTTES)
+def bench_dataframe_etats(n):
+    etats = etats_opensky(n)
+    return lambda: dataframe_etats(etats)
+
+
+# Script de conversion de l'instantané de l'application (pickle data/states.pkl -> data/df_states.parquet)
+SCRIPT_DATA = Path(__file__).resolve().parent.parent / "data" / "data.py"
+
+
+@cas('data/data.py (states.pkl -> parquet)', FLOTTES)
+def bench_script_data(n):
+    # Le script lui-même est exécuté, dans un dossier temporaire qui contient data/states.pkl
+    # (instantané synthétique au format de l'API REST, que charger_instantane lit comme un OpenSkyStates)
+    dossier = tempfile.TemporaryDirectory()
+    (Path(dossier.name) / "data").mkdir()
+    with open(Path(dossier.name) / "data" / "states.pkl", 'wb') as handle:
+        pickle.dump(etats_opensky(n), handle)
+
+    def convertir(dossier=dossier):
+        with chdir(dossier.name):
+            runpy.run_path(str(SCRIPT_DATA))
+    return convertir
+
+
+@cas('conversion.typer_dataframe', TRAJECTOIRES)
+def bench_typer_dataframe(n):
+    df = trajectoires_journalieres(n).rename(columns={'lat': 'latitude', 'lon': 'longitude', 'onground': 'on_ground'})
+    return lambda: typer_dataframe(df)
+
+
+@cas('segmentation.segmenter_vols', TRAJECTOIRES)
+def bench_segmenter_vols(n):
+    df = trajectoires_journalieres(n).rename(columns={'onground': 'on_ground'})
+    return lambda: segmenter_vols(df)
+
+
+def _archive(n):
+    """Archive des trajectoires synthétiques dans un dossier temporaire (supprimé avec la fonction mesurée)."""
+    dossier = tempfile.TemporaryDirectory()
+    with EcrivainArchive(dossier.name) as ecrivain:
+        ecrivain.ajouter_lot(trajectoires_journalieres(n))
+    return dossier, Archive(dossier.name)
+
+
+@cas('archive.lire (1 h)', TRAJECTOIRES)
+def bench_archive_lire(n):
+    dossier, archive = _archive(n)
+    debut = int(archive.temps[len(archive) // 2])
+    # dossier en argument par défaut : le dossier temporaire vit aussi longtemps que la fonction
+    return lambda dossier=dossier: archive.lire(debut, debut + 3600)
+
+
+@cas('archive.avion', TRAJECTOIRES)
+def bench_archive_avion(n):
+    dossier, archive = _archive(n)
+    icao24 = archive.categories('icao24')[0]
+    return lambda dossier=dossier: archive.avion(icao24)
+
+
+# Client asynchrone contre le serveur local (benchmarks/serveur.py) : n requêtes simultanées,
+# la durée doit rester proche d'une seule latence tant que n ne dépasse pas la concurrence du client
+
+LATENCE_SERVEUR_S = 0.05
+REQUETES = [1, 8]
+
+
+@cache
+def _serveur():
+    """Serveur local partagé par les cas du client, démarré au premier cas et arrêté avec le processus."""
+    return ServeurOpenSky(latence=LATENCE_SERVEUR_S).demarrer()
+
+
+async def _avec_client(url, requetes):
+    async with ClientOpenSkyAsync(url, debit=1000) as client:
+        return await requetes(client)
+
+
+@cas('client_async.etats_regions', REQUETES)
+def bench_etats_regions(n):
+    lon_min, lon_max, lat_min, lat_max = EMPRISE_ETATS
+    bords = np.linspace(lon_min, lon_max, n + 1)
+    bboxes = [(lat_min, lat_max, debut, fin) for debut, fin in zip(bords[:-1], bords[1:])]
+    url = _serveur().url
+    return lambda: asyncio.run(_avec_client(url, lambda client: client.etats_regions(bboxes)))
+
+
+@cas('client_async.trajectoires', REQUETES)
+def bench_trajectoires(n):
+    serveur = _serveur()
+    liste_icao24 = list(serveur.trajectoires['icao24'].unique()[:n])
+    return lambda: asyncio.run(_avec_client(serveur.url, lambda client: client.trajectoires(liste_icao24)))
+
+
+# Construction des avions
+
+@cas('avion.Flotte.from_states', FLOTTES)
+def bench_flotte_from_states(n):
+    etats = etats_opensky(n)
+    return lambda: Flotte.from_states(etats)
+
+
+@cas('avion.Flotte.from_dataframe', FLOTTES)
+def bench_flotte_from_dataframe(n):
+    df = dataframe_etats(etats_opensky(n))
+    return lambda: Flotte.from_dataframe(df)
+
+
+@cas('avion.Avion.from_dict', FLOTTES)
+def bench_avion_from_dict(n):
+    dictionnaires = dataframe_etats(etats_opensky(n))[list(Avion.__slots__)].to_dict('records')
+    return lambda: [Avion.from_dict(d) for d in dictionnaires]
+
+
+# Calculs géographiques
+
+@cas('distances.haversine', FLOTTES + [1_000_000])
+def bench_haversine(n):
+    rng = np.random.default_rng(0)
+    lat1, lat2 = rng.uniform(-80, 80, (2, n))
+    lon1, lon2 = rng.uniform(-180, 180, (2, n))
+    return lambda: haversine(lat1, lon1, lat2, lon2)
+
+
+@cas('index_spatial.construction', TRAJECTOIRES)
+def bench_index_construction(n):
+    df = trajectoires_application(n)
+    return lambda: IndexSpatial.from_dataframe(df)
+
+
+@cas('index_spatial.query_radius_km', TRAJECTOIRES)
+def bench_index_requete(n):
+    index = IndexSpatial.from_dataframe(trajectoires_application(n))
+    lat, lon = AEROPORTS['LFPG']
+    return lambda: index.query_radius_km(lat, lon, 15)
+
+
+@cas('aeroports.detecter_aeroports', TRAJECTOIRES)
+def bench_detecter_aeroports(n):
+    df = trajectoires_application(n)
+    return lambda: detecter_aeroports(df, eps_km=10, min_points=3)
+
+
+@cas('evenements.evenements_aeroports', TRAJECTOIRES)
+def bench_evenements(n):
+    df = trajectoires_application(n)
+    aeroports = detecter_aeroports(df, eps_km=10, min_points=3)
+    return lambda: evenements_aeroports(df, aeroports)
+
+
+# Rendu (tuiles en mode hors ligne : aucun accès réseau)
+
+@cas('utils.plot_avions', [1_000, 10_000])
+def bench_plot_avions(n):
+    flotte = Flotte.from_states(etats_opensky(n))
+    return lambda: _rendu(plot_avions(flotte, show_ground=True))
+
+
+@cas('utils.plot_trajet_avion', [1])
+def bench_plot_trajet_avion(n):
+    df = trajectoires_application(100_000)
+    df_vol = df[df['flight_id'] == 0].assign(manufacturericao='AIRBUS', model='A320-214').reset_index(drop=True)
+    return lambda: _rendu(plot_trajet_avion(df_vol, profils=True))
+
+
+@cas('utils.plot_tous_les_vols (densite)', TRAJECTOIRES)
+def bench_plot_tous_les_vols_densite(n):
+    df = trajectoires_application(n)[['longitude', 'latitude', 'date']]
+    return lambda: _rendu(plot_tous_les_vols(df, mode='densite'))
+
+
+@cas('utils.plot_tous_les_vols (points)', TRAJECTOIRES)
+def bench_plot_tous_les_vols_points(n):
+    df = simplifier_pour_zoom(trajectoires_application(n), 6)[['longitude', 'latitude', 'icao24', 'flight_id', 'date']]
+    return lambda: _rendu(plot_tous_les_vols(df, mode='points'))
+
+
+@cas('utils.tracer_position_moyenne', TRAJECTOIRES)
+def bench_tracer_position_moyenne(n):
+    # Comme dans la page : positions moyennes par région et position moyenne lues dans le cube
+    cube = CubeAgregats.calculer(trajectoires_journalieres(n))
+    regions, total = cube.agreger(['region']), cube.total()
+    return lambda: _rendu(tracer_position_moyenne(regions, total['latitude_moyenne'], total['longitude_moyenne']))
+
+
+def _approches(n):
+    """Arguments des approches de l'aéroport détecté le plus proche de LFPG, comme dans la page."""
+    df = simplifier_pour_zoom(trajectoires_application(n), 13)
+    aeroports = detecter_aeroports(df, eps_km=10, min_points=3)
+    evenements = evenements_aeroports(df, aeroports)
+    nom = aeroports.index[np.argmin(haversine(*AEROPORTS['LFPG'], aeroports['latitude'], aeroports['longitude']))]
+    lat, lon = aeroports.loc[nom, ['latitude', 'longitude']]
+    return (df, evenements, lat, lon, nom), {'_index': IndexSpatial.from_dataframe(df)}
+
+
+# Fonctions sans cache Streamlit : chaque appel refait le calcul complet
+
+@cas('utils.collection_approches', TRAJECTOIRES)
+def bench_collection_approches(n):
+    args, kwargs = _approches(n)
+    return lambda: collection_approches(*args, **kwargs)
+
+
+@cas('utils.plot_approches_aeroport', TRAJECTOIRES)
+def bench_plot_approches_aeroport(n):
+    args, kwargs = _approches(n)
+    return lambda: plot_approches_aeroport(*args, **kwargs).get_root().render()
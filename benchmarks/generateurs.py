@@ -0,0 +1,121 @@
+from functools import cache
+
+import numpy as np
+import pandas as pd
+
+from conversion import CHAMPS_ETAT
+from propagation import interpoler_grand_cercle
+from segmentation import segmenter_vols
+from simplification import importance_points
+
+
+# Aéroports des trajectoires synthétiques : (latitude, longitude)
+AEROPORTS = {
+    'LFPG': (49.0097, 2.5479), 'LFPO': (48.7262, 2.3652), 'LFMN': (43.6584, 7.2159),
+    'LFLL': (45.7256, 5.0811), 'LFBO': (43.6291, 1.3638), 'LFML': (43.4393, 5.2214),
+    'LFRS': (47.1532, -1.6107), 'LFSB': (47.5896, 7.5299), 'EGLL': (51.4700, -0.4543),
+    'EHAM': (52.3105, 4.7683), 'EDDF': (50.0379, 8.5622), 'LEMD': (40.4983, -3.5676),
+    'LIRF': (41.8003, 12.2389), 'KJFK': (40.6413, -73.7781), 'FMEE': (-20.8871, 55.5116),
+    'GOBD': (14.6700, -17.0733),
+}
+
+# Emprise des instantanés synthétiques (France métropolitaine élargie)
+EMPRISE_ETATS = (-10, 15, 38, 55)
+
+DEBUT_JOURNEE = 1_655_078_400  # 13 juin 2022, 00:00 UTC
+PAS_S = 10
+
+
+def _icao24(n, rng):
+    return np.char.mod('%06x', rng.choice(2 ** 24, n, replace=False))
+
+
+@cache
+def etats_opensky(n_avions, graine=0):
+    """Instantané synthétique au format de l'API REST OpenSky ({"time": ..., "states": [...]}).
+
+    Retourne:
+    dictionnaire JSON (lignes dans l'ordre de conversion.CHAMPS_ETAT)
+    """
+    rng = np.random.default_rng(graine)
+    lon_min, lon_max, lat_min, lat_max = EMPRISE_ETATS
+    au_sol = rng.random(n_avions) < 0.15
+    colonnes = {
+        'icao24': _icao24(n_avions, rng).tolist(),
+        'callsign': [f"AFR{i:<5d}" for i in range(n_avions)],
+        'origin_country': rng.choice(['France', 'Germany', 'Spain', 'United Kingdom', 'Italy'], n_avions).tolist(),
+        'time_position': (DEBUT_JOURNEE - rng.integers(0, 15, n_avions)).tolist(),
+        'last_contact': (DEBUT_JOURNEE - rng.integers(0, 5, n_avions)).tolist(),
+        'longitude': rng.uniform(lon_min, lon_max, n_avions).round(4).tolist(),
+        'latitude': rng.uniform(lat_min, lat_max, n_avions).round(4).tolist(),
+        'baro_altitude': np.where(au_sol, 0, rng.uniform(300, 12000, n_avions)).round(2).tolist(),
+        'on_ground': au_sol.tolist(),
+        'velocity': np.where(au_sol, rng.uniform(0, 15, n_avions), rng.uniform(80, 260, n_avions)).round(2).tolist(),
+        'true_track': rng.uniform(0, 360, n_avions).round(2).tolist(),
+        'vertical_rate': rng.normal(0, 5, n_avions).round(2).tolist(),
+        'sensors': [None] * n_avions,
+        'geo_altitude': np.where(au_sol, 0, rng.uniform(300, 12000, n_avions)).round(2).tolist(),
+        'squawk': np.char.mod('%04o', rng.integers(0, 4096, n_avions)).tolist(),
+        'spi': [False] * n_avions,
+        'position_source': [0] * n_avions,
+        'category': rng.integers(0, 8, n_avions).tolist(),
+    }
+    return {'time': DEBUT_JOURNEE, 'states': [list(ligne) for ligne in zip(*(colonnes[c] for c in CHAMPS_ETAT))]}
+
+
+@cache
+def trajectoires_journalieres(n_lignes=1_000_000, n_avions=2_000, graine=0):
+    """Positions synthétiques d'une journée au format de AF_daily (un point toutes les 10 s).
+
+    Chaque avion fait un vol entre deux aéroports de AEROPORTS : roulage au départ,
+    montée, croisière et descente sur le grand cercle, roulage à l'arrivée.
+
+    Retourne:
+    DataFrame avec colonnes 'time', 'icao24', 'lat', 'lon', 'velocity', 'heading', 'vertrate',
+    'onground', 'baroaltitude', 'geoaltitude', 'callsign' (triées par avion puis temps)
+    """
+    rng = np.random.default_rng(graine)
+    points = n_lignes // n_avions
+    coords = np.array(list(AEROPORTS.values()))
+    depart = rng.integers(0, len(coords), n_avions)
+    arrivee = (depart + rng.integers(1, len(coords), n_avions)) % len(coords)
+
+    avion = np.repeat(np.arange(n_avions), points)
+    rang = np.tile(np.arange(points), n_avions)
+    # 8 % des points au sol à chaque extrémité, la fraction du trajet reste dans [0, 1]
+    fraction = np.clip((rang / (points - 1) - 0.08) / 0.84, 0, 1)
+    au_sol = (fraction == 0) | (fraction == 1)
+    lat, lon = interpoler_grand_cercle(coords[depart[avion], 0], coords[depart[avion], 1],
+                                       coords[arrivee[avion], 0], coords[arrivee[avion], 1], fraction)
+    # Petit déplacement au sol (roulage) pour que les positions au sol ne soient pas confondues
+    roulage = np.where(au_sol, rng.normal(0, 0.004, len(avion)), 0)
+    altitude = np.where(au_sol, 0, np.minimum(np.minimum(fraction, 1 - fraction) / 0.2, 1) * 11_000)
+
+    icao24 = _icao24(n_avions, rng)
+    debut = DEBUT_JOURNEE + rng.integers(0, 12 * 3600, n_avions) // PAS_S * PAS_S
+    df = pd.DataFrame({
+        'time': debut[avion] + rang * PAS_S,
+        'icao24': icao24[avion],
+        'lat': lat + roulage,
+        'lon': lon + roulage,
+        'velocity': np.where(au_sol, 8.0, 230.0) + rng.normal(0, 3, len(avion)),
+        'heading': rng.uniform(0, 360, len(avion)),
+        'vertrate': np.r_[0, np.diff(altitude)] / PAS_S,
+        'onground': au_sol,
+        'baroaltitude': altitude + rng.normal(0, 15, len(avion)) * ~au_sol,
+        'geoaltitude': altitude,
+        'callsign': np.char.add('AFR', np.char.mod('%d', avion % 900 + 100)),
+    })
+    df['vertrate'] = np.where(rang == 0, 0, df['vertrate'])
+    return df
+
+
+@cache
+def trajectoires_application(n_lignes=1_000_000, n_avions=2_000, graine=0):
+    """Trajectoires synthétiques préparées comme dans pages/Partie 2.py (colonnes renommées, vols, importance)."""
+    df = trajectoires_journalieres(n_lignes, n_avions, graine).rename(
+        columns={'lon': 'longitude', 'lat': 'latitude', 'onground': 'on_ground'})
+    df['date'] = pd.to_datetime(df['time'], unit='s')
+    df = segmenter_vols(df)
+    df['importance'] = importance_points(df)
+    return df
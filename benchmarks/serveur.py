@@ -0,0 +1,154 @@
+"""Serveur local compatible avec l'API REST OpenSky, sur données synthétiques.
+
+Sert /states/all, /tracks/all et /flights/aircraft à partir des générateurs : le client
+asynchrone (client_async.py) et la collecte (--source) tournent ainsi sans réseau, avec
+une latence et des erreurs 503 simulées pour exercer la concurrence et les nouvelles tentatives.
+
+    python -m benchmarks.serveur --port 8000 --latence 0.2
+    python client_async.py --url http://localhost:8000 --bbox 42 51 -5 8 --icao24 <icao24 affichés>
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from benchmarks.generateurs import etats_opensky, trajectoires_journalieres
+from conversion import CHAMPS_ETAT
+
+
+# Colonnes de trajectoires_journalieres dans l'ordre des points de /tracks/all (client_async.COLONNES_TRAJECTOIRE)
+COLONNES_CHEMIN = ['time', 'lat', 'lon', 'baroaltitude', 'heading', 'onground']
+
+
+class ServeurOpenSky(ThreadingHTTPServer):
+    """Serveur HTTP (un thread par requête) imitant l'API REST OpenSky.
+
+    Arguments:
+    adresse -- (hôte, port), port 0 pour un port libre choisi par le système
+    n_avions -- taille de l'instantané servi par /states/all
+    n_lignes -- nombre de positions des trajectoires servies par /tracks/all et /flights/aircraft
+    latence -- attente en secondes avant chaque réponse
+    taux_erreurs -- proportion des requêtes répondues par une erreur 503
+    """
+
+    daemon_threads = True
+
+    def __init__(self, adresse=('127.0.0.1', 0), n_avions=10_000, n_lignes=100_000, latence=0.0,
+                 taux_erreurs=0.0, graine=0):
+        super().__init__(adresse, _Gestionnaire)
+        self.latence = latence
+        self.taux_erreurs = taux_erreurs
+        self._hasard = random.Random(graine)
+        self.etats = etats_opensky(n_avions, graine)
+        etats = np.array([[e[CHAMPS_ETAT.index('latitude')], e[CHAMPS_ETAT.index('longitude')]]
+                          for e in self.etats['states']], dtype=np.float64).reshape(-1, 2)
+        self._latitudes, self._longitudes = etats[:, 0], etats[:, 1]
+        self.trajectoires = trajectoires_journalieres(n_lignes, graine=graine)
+        self._lignes = self.trajectoires.groupby('icao24').indices
+        self.nb_requetes = 0
+
+    @property
+    def url(self):
+        hote, port = self.server_address[:2]
+        return f"http://{hote}:{port}"
+
+    def demarrer(self):
+        """Sert les requêtes dans un thread en arrière-plan."""
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def arreter(self):
+        self.shutdown()
+        self.server_close()
+
+    def erreur_simulee(self):
+        self.nb_requetes += 1
+        return self._hasard.random() < self.taux_erreurs
+
+    def etats_emprise(self, params):
+        """Réponse de /states/all : instantané entier ou limité à l'emprise lamin, lamax, lomin, lomax."""
+        if not {'lamin', 'lamax', 'lomin', 'lomax'} <= params.keys():
+            return self.etats
+        lamin, lamax, lomin, lomax = (float(params[cle]) for cle in ['lamin', 'lamax', 'lomin', 'lomax'])
+        dedans = np.flatnonzero((self._latitudes >= lamin) & (self._latitudes <= lamax)
+                                & (self._longitudes >= lomin) & (self._longitudes <= lomax))
+        return {'time': self.etats['time'], 'states': [self.etats['states'][i] for i in dedans]}
+
+    def trajectoire(self, params):
+        """Réponse de /tracks/all (None pour un avion inconnu : 404 comme l'API)."""
+        lignes = self._lignes.get(params.get('icao24'))
+        if lignes is None:
+            return None
+        points = self.trajectoires.iloc[lignes]
+        return {
+            'icao24': params['icao24'],
+            'callsign': points['callsign'].iloc[0],
+            'startTime': int(points['time'].iloc[0]),
+            'endTime': int(points['time'].iloc[-1]),
+            'path': [list(point) for point in zip(*(points[c].tolist() for c in COLONNES_CHEMIN))],
+        }
+
+    def vols(self, params):
+        """Réponse de /flights/aircraft : un vol par avion, s'il croise l'intervalle begin, end."""
+        lignes = self._lignes.get(params.get('icao24'))
+        if lignes is None:
+            return None
+        temps = self.trajectoires['time'].iloc[lignes]
+        debut, fin = int(temps.min()), int(temps.max())
+        if fin < int(params.get('begin', 0)) or debut > int(params.get('end', fin)):
+            return None
+        return [{'icao24': params['icao24'], 'callsign': self.trajectoires['callsign'].iloc[lignes[0]],
+                 'firstSeen': debut, 'lastSeen': fin}]
+
+
+class _Gestionnaire(BaseHTTPRequestHandler):
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = {cle: valeurs[0] for cle, valeurs in parse_qs(url.query).items()}
+        time.sleep(self.server.latence)
+        if self.server.erreur_simulee():
+            return self._repondre(503, None)
+        route = {'/states/all': self.server.etats_emprise, '/tracks/all': self.server.trajectoire,
+                 '/flights/aircraft': self.server.vols}.get(url.path)
+        contenu = route(params) if route else None
+        self._repondre(404 if contenu is None else 200, contenu)
+
+    def _repondre(self, statut, contenu):
+        corps = json.dumps(contenu).encode() if contenu is not None else b''
+        self.send_response(statut)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corps)))
+        self.end_headers()
+        self.wfile.write(corps)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serveur local compatible OpenSky (données synthétiques)",
+                                     prog="python -m benchmarks.serveur")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--avions', type=int, default=10_000, help="taille de l'instantané /states/all")
+    parser.add_argument('--latence', type=float, default=0.0, help="attente avant chaque réponse (s)")
+    parser.add_argument('--taux-erreurs', type=float, default=0.0, help="proportion de réponses 503")
+    args = parser.parse_args()
+
+    serveur = ServeurOpenSky(('127.0.0.1', args.port), n_avions=args.avions, latence=args.latence,
+                             taux_erreurs=args.taux_erreurs)
+    print(f"API OpenSky synthétique sur {serveur.url} (avions des trajectoires : "
+          f"{' '.join(list(serveur._lignes)[:3])}...)")
+    try:
+        serveur.serve_forever()
+    except KeyboardInterrupt:
+        serveur.server_close()
+
+
+if __name__ == "__main__":
+    main()
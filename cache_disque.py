@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from pathlib import Path
+
+from instrumentation import registre
+
+
+# Racine commune des caches sur disque (tuiles, images, rendus...)
+DOSSIER_CACHE = Path(os.getenv("TRACK_AIRCRAFT_CACHE", "data/cache"))
+
+
+class CacheDisque:
+    """Cache clé -> octets stocké dans un dossier, avec taille maximale, durée de vie et éviction LRU.
+
+    La date de modification de chaque fichier est sa date d'écriture (durée de vie ttl),
+    sa date d'accès celle de la dernière lecture : les fichiers les moins récemment lus
+    sont supprimés dès que la taille totale dépasse taille_max.
+    """
+
+    def __init__(self, racine, taille_max=500 * 2**20, ttl=None):
+        self.racine = Path(racine)
+        self.taille_max = taille_max
+        self.ttl = ttl
+        self._taille = None
+        self._verrou = threading.Lock()
+
+    def __getstate__(self):
+        # Le verrou n'est pas sérialisable (figures matplotlib mises en cache par streamlit)
+        etat = self.__dict__.copy()
+        del etat['_verrou']
+        return etat
+
+    def __setstate__(self, etat):
+        self.__dict__.update(etat)
+        self._verrou = threading.Lock()
+
+    def chemin(self, cle):
+        """Retourne le chemin du fichier associé à une clé (la clé peut contenir des '/')."""
+        return self.racine / cle
+
+    def lire(self, cle):
+        """Retourne les octets associés à la clé, ou None si elle est absente ou expirée."""
+        chemin = self.chemin(cle)
+        try:
+            ecriture = chemin.stat().st_mtime
+            if self.ttl is not None and time.time() - ecriture > self.ttl:
+                donnees = None
+            else:
+                donnees = chemin.read_bytes()
+                os.utime(chemin, (time.time(), ecriture))
+        except OSError:
+            donnees = None
+        # Taux de succès par cache (tuiles, images, rendus...)
+        registre().cache(f"cache_disque.{self.racine.name}", donnees is not None)
+        return donnees
+
+    def ecrire(self, cle, donnees):
+        """Enregistre les octets sous la clé puis libère de la place si nécessaire."""
+        chemin = self.chemin(cle)
+        chemin.parent.mkdir(parents=True, exist_ok=True)
+        # Écriture atomique : un lecteur concurrent ne voit jamais un fichier partiel
+        temporaire = chemin.with_name(f".{chemin.name}.{threading.get_ident()}.tmp")
+        temporaire.write_bytes(donnees)
+        ancienne_taille = chemin.stat().st_size if chemin.exists() else 0
+        os.replace(temporaire, chemin)
+
+        with self._verrou:
+            if self._taille is None:
+                self._taille = self.taille_totale()
+            else:
+                self._taille += len(donnees) - ancienne_taille
+            if self._taille > self.taille_max:
+                self._evincer()
+
+    def __contains__(self, cle):
+        try:
+            ecriture = self.chemin(cle).stat().st_mtime
+        except OSError:
+            return False
+        return self.ttl is None or time.time() - ecriture <= self.ttl
+
+    def fichiers(self):
+        """Liste les fichiers du cache (hors fichiers temporaires)."""
+        if not self.racine.exists():
+            return []
+        return [f for f in self.racine.rglob('*') if f.is_file() and not f.name.startswith('.')]
+
+    def taille_totale(self):
+        """Retourne la taille totale du cache en octets."""
+        return sum(f.stat().st_size for f in self.fichiers())
+
+    def _evincer(self):
+        """Supprime les fichiers les moins récemment utilisés jusqu'à repasser sous taille_max."""
+        fichiers = sorted(((f.stat().st_atime, f.stat().st_size, f) for f in self.fichiers()),
+                          key=lambda t: t[0])
+        taille = sum(t[1] for t in fichiers)
+        for _, taille_fichier, fichier in fichiers:
+            if taille <= self.taille_max:
+                break
+            try:
+                fichier.unlink()
+                taille -= taille_fichier
+            except OSError:
+                pass
+        self._taille = taille
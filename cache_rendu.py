@@ -0,0 +1,139 @@
+import hashlib
+import inspect
+import os
+from functools import cache
+from io import BytesIO
+
+import cartopy
+import matplotlib
+import matplotlib.pyplot as plt
+import numpy as np
+import pandas as pd
+
+from avion import Flotte
+from cache_disque import DOSSIER_CACHE, CacheDisque
+from instrumentation import mesure, registre
+import tuiles
+from tuiles import tuiles_google
+
+
+TAILLE_MAX_RENDUS = int(os.getenv("RENDUS_TAILLE_MAX", 200 * 2**20))
+
+# À incrémenter quand un changement hors du code source (données Natural Earth, styles...) modifie les rendus
+VERSION_RENDU = 1
+
+# Paramètres d'enregistrement identiques à ceux de st.pyplot
+OPTIONS_PNG = {'format': 'png', 'dpi': 200, 'bbox_inches': 'tight'}
+
+
+def _ajouter_empreinte(h, valeur):
+    """Ajoute le contenu d'une valeur (DataFrame, tableau, Flotte ou scalaire) à un hachage."""
+    if isinstance(valeur, Flotte):
+        valeur = valeur.to_dataframe()
+    if isinstance(valeur, pd.Series):
+        valeur = valeur.to_frame()
+    if isinstance(valeur, pd.DataFrame):
+        h.update(repr((valeur.shape, list(valeur.columns), [str(t) for t in valeur.dtypes])).encode())
+        h.update(pd.util.hash_pandas_object(valeur, index=True).to_numpy().tobytes())
+    elif isinstance(valeur, np.ndarray):
+        h.update(repr((valeur.dtype.str, valeur.shape)).encode())
+        h.update(np.ascontiguousarray(valeur).tobytes())
+    elif isinstance(valeur, (list, tuple)):
+        h.update(f"{type(valeur).__name__}{len(valeur)}".encode())
+        for element in valeur:
+            _ajouter_empreinte(h, element)
+    elif isinstance(valeur, dict):
+        for cle in sorted(valeur, key=repr):
+            h.update(repr(cle).encode())
+            _ajouter_empreinte(h, valeur[cle])
+    else:
+        h.update(repr(valeur).encode())
+
+
+@cache
+def _empreinte_code(module):
+    """Empreinte du code d'un module de tracé et de tout ce dont dépend le rendu.
+
+    Les fonctions auxiliaires du module, les tuiles, les options PNG et les versions
+    des bibliothèques de tracé en font partie : une mise à jour du code invalide les rendus.
+    """
+    h = hashlib.sha256(f"{VERSION_RENDU}|{matplotlib.__version__}|{cartopy.__version__}|{OPTIONS_PNG!r}".encode())
+    for source in (module, tuiles):
+        try:
+            h.update(inspect.getsource(source).encode())
+        except (OSError, TypeError):
+            h.update(getattr(source, '__name__', repr(source)).encode())
+    return h.hexdigest()
+
+
+def empreinte(fonction, *args, **kwargs):
+    """Empreinte d'un rendu : code de la fonction et de son module, contenu des données et options.
+
+    Retourne:
+    chaîne hexadécimale (sha256)
+    """
+    h = hashlib.sha256(_empreinte_code(inspect.getmodule(fonction)).encode())
+    try:
+        h.update(inspect.getsource(fonction).encode())
+    except (OSError, TypeError):
+        h.update(fonction.__qualname__.encode())
+    _ajouter_empreinte(h, args)
+    _ajouter_empreinte(h, kwargs)
+    return h.hexdigest()
+
+
+class CacheRendu:
+    """Cache des figures matplotlib rendues en PNG, indexé par l'empreinte des données.
+
+    Une figure n'est tracée que si aucun rendu des mêmes données avec les mêmes options
+    (et le même code) n'est en cache : changer de vol ou d'onglet relit directement le PNG.
+    Le mode des tuiles (en ligne / hors ligne) fait partie de la clé, pour ne pas
+    resservir une carte à fond gris une fois le réseau revenu.
+    """
+
+    def __init__(self, cache_disque=None, options_png=OPTIONS_PNG):
+        self.cache_disque = cache_disque or CacheDisque(DOSSIER_CACHE / "rendus", TAILLE_MAX_RENDUS)
+        self.options_png = options_png
+
+    @staticmethod
+    def _cle(fonction, empreinte_rendu):
+        mode = 'hors_ligne' if tuiles_google().hors_ligne else 'en_ligne'
+        return f"{fonction.__name__}/{mode}/{empreinte_rendu}.png"
+
+    def png(self, fonction, *args, **kwargs):
+        """Retourne le rendu PNG de fonction(*args, **kwargs), tracé seulement s'il n'est pas en cache.
+
+        Arguments:
+        fonction -- fonction de tracé retournant une figure matplotlib
+        args, kwargs -- données et options de la fonction
+
+        Retourne:
+        octets PNG
+        """
+        with mesure(f"cache_rendu.png.{fonction.__name__}"):
+            empreinte_rendu = empreinte(fonction, *args, **kwargs)
+            donnees = self.cache_disque.lire(self._cle(fonction, empreinte_rendu))
+            registre().cache(f"cache_rendu.png.{fonction.__name__}", donnees is not None)
+            if donnees is not None:
+                return donnees
+
+            fig = fonction(*args, **kwargs)
+            sortie = BytesIO()
+            with mesure("cache_rendu.savefig"):
+                fig.savefig(sortie, **self.options_png)
+            plt.close(fig)
+            donnees = sortie.getvalue()
+            # Clé recalculée après le tracé : les tuiles ont pu basculer hors ligne entre-temps
+            self.cache_disque.ecrire(self._cle(fonction, empreinte_rendu), donnees)
+            return donnees
+
+
+@cache
+def cache_rendu():
+    """Cache de rendus partagé par toute l'application."""
+    return CacheRendu()
+
+
+def rendu_png(fonction, *args, **kwargs):
+    """Raccourci : rendu PNG mis en cache de fonction(*args, **kwargs) (voir CacheRendu.png)."""
+    return cache_rendu().png(fonction, *args, **kwargs)
@@ -0,0 +1,237 @@
+import json
+import math
+import os
+from functools import cache
+
+import folium
+import numpy as np
+
+from cache_disque import DOSSIER_CACHE, CacheDisque
+from distances import RAYON_TERRE_KM
+from tuiles import tuiles_bbox
+
+
+# 5 décimales : environ 1 m au sol, bien en dessous du pixel au zoom 13
+PRECISION_COORDONNEES = 5
+
+# Zoom du découpage en tuiles GeoJSON (tuiles d'environ 150 km de côté)
+ZOOM_TUILES_GEOJSON = 8
+TAILLE_MAX_GEOJSON = int(os.getenv("GEOJSON_TAILLE_MAX", 100 * 2**20))
+
+STYLE_DEFAUT = {'color': '#3388ff', 'weight': 2, 'opacity': 0.8, 'fillOpacity': 0.9, 'radius': 6}
+
+
+def quantifier(latitude, longitude, precision=PRECISION_COORDONNEES):
+    """Arrondit des positions à precision décimales (coordonnées GeoJSON [longitude, latitude]).
+
+    Retourne:
+    tableau numpy (n, 2) des coordonnées arrondies
+    """
+    return np.round(np.column_stack([np.asarray(longitude, dtype=np.float64),
+                                     np.asarray(latitude, dtype=np.float64)]), precision)
+
+
+def _proprietes(df, colonnes):
+    return df[list(colonnes)].to_dict('records') if colonnes else [{} for _ in range(len(df))]
+
+
+def traces_geojson(df, groupe='flight_id', proprietes=(), precision=PRECISION_COORDONNEES):
+    """Une LineString par trajectoire, coordonnées quantifiées.
+
+    Les positions sont triées une fois par (groupe, temps) et arrondies en bloc ; les points
+    confondus après arrondi sont supprimés, ce qui allège d'autant les trajectoires lentes.
+
+    Arguments:
+    df -- DataFrame avec colonnes groupe, 'latitude', 'longitude' (et 'time' pour l'ordre)
+    groupe -- colonne identifiant la trajectoire
+    proprietes -- colonnes recopiées (valeur de la première position) dans les propriétés
+    precision -- nombre de décimales des coordonnées
+
+    Retourne:
+    liste de features GeoJSON (dict)
+    """
+    df = df[df['latitude'].notna() & df['longitude'].notna()]
+    if len(df) == 0:
+        return []
+    df = df.sort_values([groupe, 'time'] if 'time' in df.columns else [groupe], kind='stable')
+    coords = quantifier(df['latitude'], df['longitude'], precision)
+    groupes = df[groupe].to_numpy()
+
+    nouveau = np.r_[True, groupes[1:] != groupes[:-1]]
+    garde = nouveau | np.r_[True, np.any(coords[1:] != coords[:-1], axis=1)]
+    coords, nouveau, df = coords[garde], nouveau[garde], df[garde]
+
+    debuts = np.flatnonzero(nouveau)
+    fins = np.r_[debuts[1:], len(coords)]
+    valides = fins - debuts >= 2
+    debuts, fins = debuts[valides], fins[valides]
+    return [{'type': 'Feature',
+             'geometry': {'type': 'LineString', 'coordinates': coords[debut:fin].tolist()},
+             'properties': props}
+            for debut, fin, props in zip(debuts, fins, _proprietes(df.iloc[debuts], proprietes))]
+
+
+def points_geojson(df, proprietes=(), precision=PRECISION_COORDONNEES):
+    """Un Point par ligne de df (colonnes 'latitude', 'longitude'), coordonnées quantifiées.
+
+    Retourne:
+    liste de features GeoJSON (dict)
+    """
+    df = df[df['latitude'].notna() & df['longitude'].notna()]
+    coords = quantifier(df['latitude'], df['longitude'], precision).tolist()
+    return [{'type': 'Feature', 'geometry': {'type': 'Point', 'coordinates': xy}, 'properties': props}
+            for xy, props in zip(coords, _proprietes(df, proprietes))]
+
+
+def collection_geojson(*features):
+    """Réunit des listes de features en une FeatureCollection (identifiants numérotés)."""
+    collection = {'type': 'FeatureCollection', 'features': [f for liste in features for f in liste]}
+    for i, feature in enumerate(collection['features']):
+        feature['id'] = i
+    return collection
+
+
+def octets_geojson(collection):
+    """Sérialisation compacte (sans espaces) d'une collection GeoJSON."""
+    return json.dumps(collection, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _style(feature):
+    """Style Leaflet d'une feature : STYLE_DEFAUT, surchargé par ses propriétés 'couleur' et 'rayon'."""
+    props = feature['properties']
+    style = dict(STYLE_DEFAUT)
+    if 'couleur' in props:
+        style['color'] = style['fillColor'] = props['couleur']
+    if 'rayon' in props:
+        style['radius'] = props['rayon']
+    return style
+
+
+def carte_geojson(collection, location, zoom_start, **kwargs):
+    """Carte folium affichant toute une collection en une seule couche GeoJson.
+
+    Les points sont des cercles, les styles viennent des propriétés 'couleur' et 'rayon'
+    des features, l'info-bulle de la propriété 'infobulle'.
+
+    Arguments:
+    collection -- FeatureCollection GeoJSON (dict)
+    location -- centre [latitude, longitude]
+    zoom_start -- zoom initial
+    kwargs -- options supplémentaires de folium.Map
+
+    Retourne:
+    objet folium.Map
+    """
+    m = folium.Map(location=location, zoom_start=zoom_start, **kwargs)
+    if collection['features']:
+        infobulle = all('infobulle' in f['properties'] for f in collection['features'])
+        folium.GeoJson(
+            collection,
+            style_function=_style,
+            marker=folium.CircleMarker(fill=True),
+            tooltip=folium.GeoJsonTooltip(fields=['infobulle'], labels=False) if infobulle else None,
+        ).add_to(m)
+    return m
+
+
+def emprise_rayon(lat, lon, rayon_km):
+    """Emprise (lon_min, lon_max, lat_min, lat_max) d'un disque de rayon_km autour d'un point."""
+    dlat = math.degrees(rayon_km / RAYON_TERRE_KM)
+    dlon = dlat / max(math.cos(math.radians(min(abs(lat) + dlat, 89.9))), 1e-6)
+    return lon - dlon, lon + dlon, max(lat - dlat, -90), min(lat + dlat, 90)
+
+
+def _tuiles_positions(coords, zoom):
+    """Numéros (x, y) des tuiles contenant des coordonnées [longitude, latitude]."""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(coords[:, 1], -85.0511, 85.0511))
+    x = np.clip(((coords[:, 0] + 180) / 360 * n).astype(np.int64), 0, n - 1)
+    y = np.clip(((1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n).astype(np.int64), 0, n - 1)
+    return x, y
+
+
+def decouper_en_tuiles(collection, zoom=ZOOM_TUILES_GEOJSON):
+    """Répartit une collection en tuiles (x, y, zoom) du découpage web Mercator.
+
+    Une LineString traversant plusieurs tuiles est coupée en morceaux ; chaque morceau
+    reprend le premier point du morceau suivant, pour que le tracé reste continu.
+
+    Retourne:
+    dictionnaire (x, y, zoom) -> liste de features
+    """
+    tuiles = {}
+    for feature in collection['features']:
+        geometrie = feature['geometry']
+        coords = np.asarray(geometrie['coordinates'], dtype=np.float64).reshape(-1, 2)
+        x, y = _tuiles_positions(coords, zoom)
+        if geometrie['type'] == 'Point':
+            tuiles.setdefault((int(x[0]), int(y[0]), zoom), []).append(feature)
+            continue
+        debuts = np.flatnonzero(np.r_[True, (x[1:] != x[:-1]) | (y[1:] != y[:-1])])
+        fins = np.r_[debuts[1:] + 1, len(coords)]
+        for debut, fin in zip(debuts, fins):
+            if fin - debut < 2:
+                # Dernier point seul dans sa tuile : déjà repris par le morceau précédent
+                continue
+            morceau = {'type': 'Feature', 'properties': feature['properties'],
+                       'geometry': {'type': 'LineString', 'coordinates': geometrie['coordinates'][debut:fin]}}
+            tuiles.setdefault((int(x[debut]), int(y[debut]), zoom), []).append(morceau)
+    return tuiles
+
+
+class TuilesGeoJSON:
+    """Collections GeoJSON précalculées, découpées en tuiles dans un cache disque.
+
+    Une collection est écrite une fois sous un nom ; la carte ne relit ensuite que les
+    tuiles qui recoupent la zone affichée, si bien que le volume envoyé au navigateur
+    dépend de la vue et non du nombre total de vols.
+    """
+
+    def __init__(self, cache_disque=None, zoom=ZOOM_TUILES_GEOJSON):
+        self.cache_disque = cache_disque or CacheDisque(DOSSIER_CACHE / "geojson", TAILLE_MAX_GEOJSON)
+        self.zoom = zoom
+
+    def ecrire(self, nom, collection):
+        """Découpe et enregistre une collection sous un nom (les tuiles précédentes sont remplacées).
+
+        Retourne:
+        nombre de tuiles écrites
+        """
+        tuiles = decouper_en_tuiles(collection, self.zoom)
+        for (x, y, z), features in tuiles.items():
+            self.cache_disque.ecrire(f"{nom}/{z}/{x}/{y}.json",
+                                     octets_geojson({'type': 'FeatureCollection', 'features': features}))
+        # L'index est écrit en dernier : une collection à moitié écrite n'est jamais lue
+        self.cache_disque.ecrire(f"{nom}/index.json", json.dumps(sorted(tuiles)).encode())
+        return len(tuiles)
+
+    def __contains__(self, nom):
+        """Vrai si l'index de la collection et toutes les tuiles qu'il liste sont en cache.
+
+        Le cache disque évince les fichiers les moins lus : une collection dont une tuile
+        a disparu n'est plus considérée comme présente et doit être réécrite.
+        """
+        index = self.cache_disque.lire(f"{nom}/index.json")
+        return index is not None and all(f"{nom}/{z}/{x}/{y}.json" in self.cache_disque
+                                         for x, y, z in json.loads(index))
+
+    def lire(self, nom, lon_min, lon_max, lat_min, lat_max):
+        """Relit les tuiles d'une collection qui recoupent une emprise et les réunit.
+
+        Retourne:
+        FeatureCollection GeoJSON (vide si la collection n'est pas en cache)
+        """
+        index = self.cache_disque.lire(f"{nom}/index.json")
+        presentes = {tuple(t) for t in json.loads(index)} if index is not None else set()
+        features = []
+        for x, y, z in tuiles_bbox(lon_min, lon_max, lat_min, lat_max, self.zoom):
+            donnees = self.cache_disque.lire(f"{nom}/{z}/{x}/{y}.json") if (x, y, z) in presentes else None
+            if donnees is not None:
+                features.append(json.loads(donnees)['features'])
+        return collection_geojson(*features)
+
+
+@cache
+def tuiles_geojson():
+    """Cache de tuiles GeoJSON partagé par toute l'application."""
+    return TuilesGeoJSON()
@@ -0,0 +1,259 @@
+import argparse
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from collecte import URL_OPENSKY, LimiteDebit
+from conversion import TYPES_ETAT, dataframe_etats
+
+
+# Codes HTTP pour lesquels la requête est retentée
+CODES_A_RETENTER = {429, 500, 502, 503, 504}
+
+# Colonnes des points de trajectoire renvoyés par /tracks/all, typées comme les états
+COLONNES_TRAJECTOIRE = ['time', 'latitude', 'longitude', 'baro_altitude', 'true_track', 'on_ground']
+TYPES_TRAJECTOIRE = {'time': np.int64, **{c: TYPES_ETAT[c] for c in COLONNES_TRAJECTOIRE[1:]}}
+
+
+class LimiteurDebit:
+    """Seau à jetons partagé par toutes les requêtes d'un client.
+
+    Le seau se remplit de 'debit' jetons par seconde, jusqu'à 'rafale' jetons ;
+    chaque requête consomme un jeton et attend s'il n'y en a plus.
+    """
+
+    def __init__(self, debit=4.0, rafale=None, horloge=time.monotonic):
+        self.debit = debit
+        self.rafale = rafale or max(1.0, debit)
+        self.horloge = horloge
+        self.jetons = self.rafale
+        self.dernier = horloge()
+        self._verrou = asyncio.Lock()
+
+    async def acquerir(self):
+        async with self._verrou:
+            while True:
+                maintenant = self.horloge()
+                self.jetons = min(self.rafale, self.jetons + (maintenant - self.dernier) * self.debit)
+                self.dernier = maintenant
+                if self.jetons >= 1:
+                    self.jetons -= 1
+                    return
+                await asyncio.sleep((1 - self.jetons) / self.debit)
+
+
+class ClientOpenSkyAsync:
+    """Client asynchrone de l'API REST OpenSky (ou d'un serveur compatible local).
+
+    Les requêtes bloquantes passent par une session requests partagée (pool de connexions
+    HTTP persistantes) exécutée dans un pool de threads dédié : 'concurrence' requêtes au
+    plus sont en cours simultanément, sous la limite de débit globale du client. Les
+    réponses se lisent en flux par blocs (flux), et les erreurs 429/5xx ou réseau sont
+    retentées avec une attente exponentielle (ou celle indiquée par le serveur).
+
+    Exemple :
+        async with ClientOpenSkyAsync() as client:
+            instantanes = await client.etats_regions([(42, 51, -5, 8), (35, 44, -10, 4)])
+    """
+
+    def __init__(self, url_base=URL_OPENSKY, auth=None, concurrence=8, debit=4.0, essais_max=4,
+                 backoff=1.0, timeout=15, taille_bloc=64 * 1024):
+        self.url_base = url_base.rstrip('/')
+        self.auth = auth
+        self.essais_max = essais_max
+        self.backoff = backoff
+        self.timeout = timeout
+        self.taille_bloc = taille_bloc
+        self.limiteur = LimiteurDebit(debit)
+        self._semaphore = asyncio.Semaphore(concurrence)
+        self._threads = ThreadPoolExecutor(max_workers=concurrence)
+        self.session = requests.Session()
+        adaptateur = HTTPAdapter(pool_connections=concurrence, pool_maxsize=concurrence)
+        self.session.mount('http://', adaptateur)
+        self.session.mount('https://', adaptateur)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self.fermer()
+
+    def fermer(self):
+        self._threads.shutdown(wait=False)
+        self.session.close()
+
+    def _get(self, url, params):
+        """Requête bloquante (exécutée dans un thread) : réponse ouverte en flux, corps pas encore lu."""
+        return self.session.get(url, params=params, auth=self.auth, timeout=self.timeout, stream=True)
+
+    async def _dans_thread(self, fonction, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._threads, fonction, *args)
+
+    async def _ouvrir(self, url, params):
+        """Ouvre la réponse d'une requête, en retentant les erreurs 429/5xx et réseau.
+
+        Une réponse retournée garde sa place de concurrence (la connexion sert à lire le corps) :
+        l'appelant la ferme puis libère self._semaphore.
+
+        Retourne:
+        réponse requests ouverte en flux, ou None si la ressource n'existe pas (HTTP 404)
+        """
+        for essai in range(self.essais_max):
+            await self.limiteur.acquerir()
+            attente = self.backoff * 2 ** essai
+            await self._semaphore.acquire()
+            try:
+                resp = await self._dans_thread(self._get, url, params)
+            except BaseException as e:
+                self._semaphore.release()
+                if not isinstance(e, (requests.ConnectionError, requests.Timeout)) or essai == self.essais_max - 1:
+                    raise
+                await asyncio.sleep(attente)
+                continue
+
+            statut = resp.status_code
+            if statut < 400:
+                return resp
+            resp.close()
+            self._semaphore.release()
+            if statut == 404:
+                return None
+            if statut not in CODES_A_RETENTER:
+                raise requests.HTTPError(f"{statut} pour {url}")
+
+            conseil = resp.headers.get('X-Rate-Limit-Retry-After-Seconds') or resp.headers.get('Retry-After')
+            if conseil:
+                attente = float(conseil)
+            if essai == self.essais_max - 1:
+                if statut == 429:
+                    raise LimiteDebit(attente)
+                raise requests.HTTPError(f"{statut} pour {url}")
+            await asyncio.sleep(attente)
+
+    async def flux(self, chemin, params=None):
+        """Corps de la réponse d'un point d'accès, bloc par bloc au fil de sa réception.
+
+        Chaque bloc (taille_bloc octets au plus) est lu dans le pool de threads : la boucle
+        asyncio reste libre entre deux blocs et le corps n'est jamais entièrement en mémoire.
+        Seule l'ouverture de la réponse est retentée, pas une coupure en cours de lecture.
+        Pour s'arrêter avant la fin, fermer le générateur (contextlib.aclosing).
+
+        Exemple :
+            async with aclosing(client.flux('/states/all')) as blocs:
+                async for bloc in blocs:
+                    fichier.write(bloc)
+
+        Arguments:
+        chemin -- chemin relatif à l'URL de base (ex: '/states/all')
+        params -- paramètres de la requête
+
+        Produit:
+        blocs de bytes (aucun si la ressource n'existe pas, HTTP 404)
+        """
+        resp = await self._ouvrir(self.url_base + chemin, params)
+        if resp is None:
+            return
+        try:
+            blocs = resp.iter_content(self.taille_bloc)
+            while (bloc := await self._dans_thread(next, blocs, None)) is not None:
+                yield bloc
+        finally:
+            resp.close()
+            self._semaphore.release()
+
+    async def requete(self, chemin, params=None):
+        """Interroge un point d'accès de l'API et décode la réponse JSON (lue avec flux).
+
+        Arguments:
+        chemin -- chemin relatif à l'URL de base (ex: '/states/all')
+        params -- paramètres de la requête
+
+        Retourne:
+        objet JSON décodé, ou None si la ressource n'existe pas (HTTP 404)
+        """
+        corps = b''.join([bloc async for bloc in self.flux(chemin, params)])
+        return json.loads(corps) if corps else None
+
+    async def etats(self, bbox=None):
+        """Instantané des états, éventuellement limité à une emprise (lamin, lamax, lomin, lomax).
+
+        Retourne:
+        tuple (time, DataFrame typé des états)
+        """
+        params = dict(zip(['lamin', 'lamax', 'lomin', 'lomax'], bbox)) if bbox else None
+        payload = await self.requete('/states/all', params)
+        if payload is None:
+            raise LimiteDebit()
+        return payload['time'], dataframe_etats(payload)
+
+    async def trajectoire(self, icao24, temps=0):
+        """Trajectoire d'un avion (/tracks/all), temps=0 pour le vol en cours.
+
+        Retourne:
+        DataFrame (icao24, callsign, COLONNES_TRAJECTOIRE), vide si aucune trajectoire
+        """
+        payload = await self.requete('/tracks/all', {'icao24': icao24, 'time': int(temps)})
+        points = pd.DataFrame((payload or {}).get('path') or [], columns=COLONNES_TRAJECTOIRE)
+        points = points.astype(TYPES_TRAJECTOIRE)
+        points.insert(0, 'icao24', icao24)
+        points.insert(1, 'callsign', ((payload or {}).get('callsign') or '').strip())
+        return points
+
+    async def vols_avion(self, icao24, debut, fin):
+        """Vols d'un avion entre deux timestamps unix (/flights/aircraft).
+
+        Retourne:
+        DataFrame d'un vol par ligne (colonnes de l'API), vide si aucun vol
+        """
+        vols = await self.requete('/flights/aircraft', {'icao24': icao24, 'begin': int(debut), 'end': int(fin)})
+        return pd.DataFrame(vols or [])
+
+    async def etats_regions(self, bboxes):
+        """Instantanés de plusieurs emprises, récupérés simultanément.
+
+        Retourne:
+        liste de tuples (time, DataFrame) dans l'ordre des emprises
+        """
+        return await asyncio.gather(*(self.etats(bbox) for bbox in bboxes))
+
+    async def trajectoires(self, liste_icao24, temps=0):
+        """Trajectoires de plusieurs avions, récupérées simultanément et concaténées."""
+        resultats = await asyncio.gather(*(self.trajectoire(icao24, temps) for icao24 in liste_icao24))
+        return pd.concat(resultats, ignore_index=True)
+
+    async def vols_avions(self, liste_icao24, debut, fin):
+        """Vols de plusieurs avions entre deux timestamps, récupérés simultanément et concaténés."""
+        resultats = await asyncio.gather(*(self.vols_avion(icao24, debut, fin) for icao24 in liste_icao24))
+        return pd.concat(resultats, ignore_index=True)
+
+
+async def _principal(args):
+    async with ClientOpenSkyAsync(args.url, concurrence=args.concurrence, debit=args.debit) as client:
+        debut = time.monotonic()
+        if args.bbox:
+            for bbox, (temps, df) in zip(args.bbox, await client.etats_regions(args.bbox)):
+                print(f"Emprise {bbox} : {len(df)} avions à {temps}")
+        if args.icao24:
+            df = await client.trajectoires(args.icao24)
+            print(f"Trajectoires : {len(df)} points pour {df['icao24'].nunique()} avions")
+        print(f"Terminé en {time.monotonic() - debut:.2f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Requêtes OpenSky simultanées (emprises et trajectoires)")
+    parser.add_argument('--url', default=URL_OPENSKY, help="URL de base de l'API (ou d'un serveur local)")
+    parser.add_argument('--bbox', type=float, nargs=4, action='append', metavar=('LAMIN', 'LAMAX', 'LOMIN', 'LOMAX'))
+    parser.add_argument('--icao24', nargs='+', help="avions dont récupérer la trajectoire")
+    parser.add_argument('--concurrence', type=int, default=8, help="requêtes simultanées au plus")
+    parser.add_argument('--debit', type=float, default=4.0, help="requêtes par seconde au plus")
+    asyncio.run(_principal(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,216 @@
+import argparse
+import json
+import time
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import requests
+
+from archive import SourceArchive
+from conversion import dataframe_etats
+from delta import EtatCourant
+from donnees import heure_partition
+from statistiques import FICHIER_STATISTIQUES, StatistiquesFlux
+
+
+URL_OPENSKY = "https://opensky-network.org/api"
+
+
+class LimiteDebit(Exception):
+    """Levée par une source quand l'API refuse la requête (HTTP 429 ou réponse vide)."""
+
+    def __init__(self, attente=None):
+        super().__init__(f"Limite de débit atteinte (attente conseillée : {attente}s)")
+        self.attente = attente
+
+
+class SourceOpenSky:
+    """Source réelle : client officiel opensky_api (get_states)."""
+
+    def __init__(self, username=None, password=None, bbox=()):
+        from opensky_api import OpenSkyApi
+        self.api = OpenSkyApi(username, password)
+        self.bbox = bbox
+
+    def lire(self):
+        states = self.api.get_states(bbox=self.bbox)
+        if states is None:
+            # opensky_api renvoie None en cas de refus (limite de débit ou erreur serveur)
+            raise LimiteDebit()
+        return states.time, dataframe_etats(states)
+
+
+class SourceHttp:
+    """Source REST : interroge /states/all d'une URL de base (OpenSky ou faux serveur local)."""
+
+    def __init__(self, url_base=URL_OPENSKY, auth=None, bbox=None, timeout=15):
+        self.url = url_base.rstrip('/') + "/states/all"
+        self.auth = auth
+        self.params = dict(zip(['lamin', 'lamax', 'lomin', 'lomax'], bbox)) if bbox else {}
+        self.timeout = timeout
+        self.session = requests.Session()
+
+    def lire(self):
+        resp = self.session.get(self.url, params=self.params, auth=self.auth, timeout=self.timeout)
+        if resp.status_code == 429:
+            attente = resp.headers.get('X-Rate-Limit-Retry-After-Seconds') or resp.headers.get('Retry-After')
+            raise LimiteDebit(float(attente) if attente else None)
+        resp.raise_for_status()
+        payload = resp.json()
+        return payload['time'], dataframe_etats(payload)
+
+
+class SourceRejeu:
+    """Source hors ligne : rejoue des réponses JSON sauvegardées, dans l'ordre des noms de fichier."""
+
+    def __init__(self, dossier):
+        self.fichiers = iter(sorted(Path(dossier).glob('*.json')))
+
+    def lire(self):
+        chemin = next(self.fichiers)  # StopIteration termine la collecte
+        with open(chemin, 'r', encoding='utf-8') as handle:
+            payload = json.load(handle)
+        return payload['time'], dataframe_etats(payload)
+
+
+class StockageInstantanes:
+    """Stockage parquet en ajout seul, partitionné par heure de l'instantané.
+
+    Arborescence : racine/heure=AAAA-MM-JJTHH/<time>-0.parquet
+    """
+
+    def __init__(self, racine):
+        self.racine = Path(racine)
+        self.racine.mkdir(parents=True, exist_ok=True)
+
+    # Clé de partition (heure UTC) d'un timestamp unix, commune avec donnees
+    heure = staticmethod(heure_partition)
+
+    def ajouter(self, temps, df):
+        """Ajoute un instantané au stockage sans toucher aux fichiers existants.
+
+        Arguments:
+        temps -- timestamp unix de l'instantané (champ 'time' de l'API)
+        df -- DataFrame typé de l'instantané (voir conversion.dataframe_etats)
+
+        Retourne:
+        nombre de lignes écrites
+        """
+        # 'sensors' est presque toujours vide et son type varie d'un instantané à l'autre
+        df = df.drop(columns=['sensors'], errors='ignore').assign(time=int(temps), heure=self.heure(temps))
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        pq.write_to_dataset(table, self.racine, partition_cols=['heure'],
+                            basename_template=f"{int(temps)}-{{i}}.parquet")
+        return len(df)
+
+    def lire(self, debut=None, fin=None, colonnes=None):
+        """Relit l'historique entre deux timestamps (bornes incluses).
+
+        Arguments:
+        debut -- timestamp unix de début (défaut: pas de borne)
+        fin -- timestamp unix de fin (défaut: pas de borne)
+        colonnes -- liste de colonnes à lire (défaut: toutes)
+
+        Retourne:
+        DataFrame pandas
+        """
+        filtres = []
+        if debut is not None:
+            filtres += [('heure', '>=', self.heure(debut)), ('time', '>=', int(debut))]
+        if fin is not None:
+            filtres += [('heure', '<=', self.heure(fin)), ('time', '<=', int(fin))]
+        return pd.read_parquet(self.racine, columns=colonnes, filters=filtres or None)
+
+
+class Collecteur:
+    """Interroge une source à intervalle régulier et archive chaque instantané.
+
+    En cas de limite de débit ou d'erreur réseau, l'attente double à chaque échec
+    (jusqu'à backoff_max) puis revient à l'intervalle normal au premier succès.
+    """
+
+    def __init__(self, source, stockage, intervalle=10, backoff_max=300, rappel=None, attendre=time.sleep):
+        self.source = source
+        self.stockage = stockage
+        self.intervalle = intervalle
+        self.backoff_max = backoff_max
+        self.rappel = rappel
+        self.attendre = attendre
+
+    def executer(self, nb_max=None):
+        """Lance la boucle de collecte.
+
+        Arguments:
+        nb_max -- nombre d'instantanés à collecter avant de s'arrêter (défaut: infini)
+
+        Retourne:
+        nombre d'instantanés archivés
+        """
+        nb = 0
+        attente_echec = self.intervalle
+        while nb_max is None or nb < nb_max:
+            debut = time.monotonic()
+            try:
+                temps, df = self.source.lire()
+            except StopIteration:
+                break
+            except (LimiteDebit, requests.RequestException) as e:
+                attente = getattr(e, 'attente', None) or attente_echec
+                attente_echec = min(attente_echec * 2, self.backoff_max)
+                print(f"Échec de la collecte ({e}), nouvel essai dans {attente:.0f}s")
+                self.attendre(attente)
+                continue
+
+            attente_echec = self.intervalle
+            self.stockage.ajouter(temps, df)
+            nb += 1
+            print(f"Instantané {temps} archivé : {len(df)} avions")
+            if self.rappel:
+                self.rappel(temps, df)
+            self.attendre(max(0.0, self.intervalle - (time.monotonic() - debut)))
+        return nb
+
+
+def creer_source(description, bbox=None):
+    """Crée la source décrite par 'opensky', une URL http(s), une archive (archive.py) ou un dossier de JSON."""
+    if description == 'opensky':
+        return SourceOpenSky(bbox=bbox or ())
+    if description.startswith(('http://', 'https://')):
+        return SourceHttp(description, bbox=bbox)
+    if (Path(description) / "entete.json").exists():
+        return SourceArchive(description)
+    return SourceRejeu(description)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collecte continue des états OpenSky")
+    parser.add_argument('--source', default='opensky',
+                        help="'opensky', URL d'une API compatible, archive ou dossier de JSON à rejouer")
+    parser.add_argument('--stockage', default='data/instantanes', help="racine du stockage parquet")
+    parser.add_argument('--intervalle', type=float, default=10, help="secondes entre deux requêtes")
+    parser.add_argument('--nb', type=int, default=None, help="nombre d'instantanés à collecter")
+    parser.add_argument('--bbox', type=float, nargs=4, metavar=('LAMIN', 'LAMAX', 'LOMIN', 'LOMAX'))
+    parser.add_argument('--statistiques', type=Path, nargs='?', const=FICHIER_STATISTIQUES, default=None,
+                        help="fichier des statistiques incrémentales, mis à jour à chaque instantané "
+                             f"(défaut: {FICHIER_STATISTIQUES})")
+    args = parser.parse_args()
+
+    etat = EtatCourant()
+    stats = None
+    if args.statistiques:
+        stats = StatistiquesFlux.charger(args.statistiques) if args.statistiques.exists() else StatistiquesFlux()
+
+    def rappel(temps, df):
+        print(f"  {etat.appliquer(df, temps)}")
+        if stats is not None:
+            stats.ajouter(df).sauvegarder(args.statistiques)
+
+    collecteur = Collecteur(creer_source(args.source, args.bbox), StockageInstantanes(args.stockage),
+                            intervalle=args.intervalle, rappel=rappel)
+    collecteur.executer(args.nb)
+
+
+if __name__ == "__main__":
+    main()
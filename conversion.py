@@ -0,0 +1,192 @@
+import argparse
+import json
+import pickle
+from operator import attrgetter
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# Ordre des champs d'un StateVector OpenSky (identique au tableau "states" de l'API REST)
+CHAMPS_ETAT = [
+    'icao24', 'callsign', 'origin_country', 'time_position', 'last_contact',
+    'longitude', 'latitude', 'baro_altitude', 'on_ground', 'velocity',
+    'true_track', 'vertical_rate', 'sensors', 'geo_altitude', 'squawk',
+    'spi', 'position_source', 'category'
+]
+
+# Types cibles des colonnes (les champs absents de ce dictionnaire restent en object)
+TYPES_ETAT = {
+    'icao24': 'str',
+    'callsign': 'str',
+    'origin_country': 'category',
+    'time_position': np.float64,
+    'last_contact': np.int64,
+    'longitude': np.float32,
+    'latitude': np.float32,
+    'baro_altitude': np.float32,
+    'on_ground': np.bool_,
+    'velocity': np.float32,
+    'true_track': np.float32,
+    'vertical_rate': np.float32,
+    'geo_altitude': np.float32,
+    'squawk': 'str',
+    'spi': np.bool_,
+    'position_source': np.int8,
+    'category': np.int8,
+}
+
+
+def _lignes_etats(states):
+    """Retourne les lignes brutes (tuples ou listes) d'un instantané OpenSky.
+
+    Arguments:
+    states -- objet OpenSkyStates, dictionnaire JSON {"time": ..., "states": [...]} ou liste de lignes
+
+    Retourne:
+    liste de lignes dans l'ordre de CHAMPS_ETAT
+    """
+    if isinstance(states, dict):
+        return states.get('states') or []
+    lignes = getattr(states, 'states', states) or []
+    if lignes and not isinstance(lignes[0], (list, tuple)):
+        # StateVector : un seul attrgetter pour extraire tous les champs d'un coup
+        getter = attrgetter(*[c for c in CHAMPS_ETAT if hasattr(lignes[0], c)])
+        return [getter(s) for s in lignes]
+    return lignes
+
+
+def _colonne(valeurs, type_cible):
+    """Convertit une séquence Python en tableau numpy typé (None devient NaN / False / 0)."""
+    if type_cible in ('str', 'object'):
+        tableau = np.empty(len(valeurs), dtype=object)
+        tableau[:] = valeurs
+        return tableau
+    if type_cible == 'category':
+        return pd.Categorical(valeurs)
+    if type_cible is np.bool_:
+        return np.array([bool(v) for v in valeurs], dtype=np.bool_)
+    if np.issubdtype(type_cible, np.integer):
+        return np.array([v if v is not None else 0 for v in valeurs], dtype=type_cible)
+    return np.array(valeurs, dtype=np.float64).astype(type_cible, copy=False)
+
+
+def colonnes_etats(states):
+    """Transforme un instantané OpenSky en colonnes numpy typées, en une seule passe.
+
+    Arguments:
+    states -- objet OpenSkyStates, dictionnaire JSON de l'API REST ou liste de StateVector
+
+    Retourne:
+    dictionnaire {nom de colonne: tableau numpy / Categorical}
+    """
+    lignes = _lignes_etats(states)
+
+    # Transposition unique : une séquence par champ au lieu d'une affectation par cellule
+    colonnes_brutes = list(zip(*lignes))
+    colonnes = {}
+    for i, nom in enumerate(CHAMPS_ETAT):
+        # Les anciens instantanés n'ont pas le champ 'category'
+        valeurs = colonnes_brutes[i] if i < len(colonnes_brutes) else (None,) * len(lignes)
+        colonnes[nom] = _colonne(valeurs, TYPES_ETAT.get(nom, 'object'))
+    return colonnes
+
+
+def dataframe_etats(states):
+    """Construit le DataFrame typé d'un instantané OpenSky.
+
+    Arguments:
+    states -- objet OpenSkyStates, dictionnaire JSON de l'API REST ou liste de StateVector
+
+    Retourne:
+    DataFrame pandas avec positions en float32, origin_country catégoriel et on_ground booléen
+    """
+    return pd.DataFrame(colonnes_etats(states), columns=CHAMPS_ETAT)
+
+
+def typer_dataframe(df):
+    """Applique les types de TYPES_ETAT à un DataFrame d'états déjà existant.
+
+    Arguments:
+    df -- DataFrame avec (une partie) des colonnes de CHAMPS_ETAT
+
+    Retourne:
+    nouveau DataFrame typé
+    """
+    df = df.copy()
+    for nom, type_cible in TYPES_ETAT.items():
+        if nom not in df.columns:
+            continue
+        if type_cible == 'str':
+            df[nom] = df[nom].astype(object)
+        elif type_cible == 'category':
+            df[nom] = df[nom].astype('category')
+        elif type_cible is np.bool_:
+            df[nom] = df[nom].fillna(False).astype(np.bool_)
+        elif np.issubdtype(type_cible, np.integer):
+            df[nom] = df[nom].fillna(0).astype(type_cible)
+        else:
+            df[nom] = pd.to_numeric(df[nom], errors='coerce').astype(type_cible)
+    return df
+
+
+def charger_instantane(chemin):
+    """Lit un instantané sauvegardé (pickle OpenSkyStates ou JSON de l'API REST).
+
+    Arguments:
+    chemin -- chemin du fichier .pkl ou .json
+
+    Retourne:
+    DataFrame typé de l'instantané
+    """
+    chemin = Path(chemin)
+    if chemin.suffix == '.json':
+        with open(chemin, 'r', encoding='utf-8') as handle:
+            return dataframe_etats(json.load(handle))
+    with open(chemin, 'rb') as handle:
+        return dataframe_etats(pickle.load(handle))
+
+
+def convertir_dossier(dossier_source, dossier_cible=None):
+    """Convertit tous les instantanés (.pkl, .json) d'un dossier en fichiers parquet typés.
+
+    Arguments:
+    dossier_source -- dossier contenant les instantanés
+    dossier_cible -- dossier de sortie (défaut: le dossier source)
+
+    Retourne:
+    liste des chemins parquet écrits
+    """
+    dossier_source = Path(dossier_source)
+    dossier_cible = Path(dossier_cible) if dossier_cible else dossier_source
+    dossier_cible.mkdir(parents=True, exist_ok=True)
+
+    ecrits = []
+    for chemin in sorted(dossier_source.iterdir()):
+        if chemin.suffix not in ('.pkl', '.json'):
+            continue
+        sortie = dossier_cible / f"{chemin.stem}.parquet"
+        charger_instantane(chemin).to_parquet(sortie, index=False)
+        ecrits.append(sortie)
+        print(f"{chemin.name} -> {sortie}")
+    return ecrits
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion des instantanés OpenSky en parquet typé")
+    parser.add_argument('source', help="fichier .pkl/.json ou dossier d'instantanés")
+    parser.add_argument('cible', nargs='?', help="fichier ou dossier de sortie")
+    args = parser.parse_args()
+
+    source = Path(args.source)
+    if source.is_dir():
+        convertir_dossier(source, args.cible)
+    else:
+        cible = Path(args.cible) if args.cible else source.with_suffix('.parquet')
+        charger_instantane(source).to_parquet(cible, index=False)
+        print(f"{source.name} -> {cible}")
+
+
+if __name__ == "__main__":
+    main()
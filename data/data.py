@@ -1,14 +1,10 @@
-import pickle
-import pandas as pd
+import os
+import sys
 
-with open('data/states.pkl', 'rb') as handle:
-    states = pickle.load(handle)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-df_states=pd.DataFrame()
-for col in vars(states.states[0]):
-    df_states[col]=None
-for i in range(0,len(states.states)): #len(states.states)
-    avion = states.states[i]
-    for col in vars(avion).keys():
-        df_states.loc[i,col]=vars(avion)[col]
-df_states.to_parquet('data/df_states.parquet')
+from conversion import charger_instantane
+
+# Conversion vectorisée (une seule passe) de l'instantané OpenSky en parquet typé
+df_states = charger_instantane('data/states.pkl')
+df_states.to_parquet('data/df_states.parquet', index=False)
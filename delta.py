@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+
+# Un avion est considéré comme déplacé si l'un de ces champs change
+CHAMPS_POSITION = ['longitude', 'latitude', 'baro_altitude']
+
+
+class Delta:
+    """Différences entre deux instantanés consécutifs, indexées par icao24.
+
+    Attributes:
+        apparus (pd.DataFrame): Nouveaux avions (état complet)
+        disparus (pd.DataFrame): Avions absents du nouvel instantané (dernier état connu)
+        deplaces (pd.DataFrame): Avions dont la position a changé (nouvel état complet)
+        modifications (pd.DataFrame): Un champ modifié par ligne : icao24, champ, ancien, nouveau
+        temps: Timestamp du nouvel instantané (None si inconnu)
+    """
+
+    def __init__(self, apparus, disparus, deplaces, modifications, temps=None):
+        self.apparus = apparus
+        self.disparus = disparus
+        self.deplaces = deplaces
+        self.modifications = modifications
+        self.temps = temps
+
+    def __len__(self):
+        return len(self.apparus) + len(self.disparus) + self.modifications['icao24'].nunique()
+
+    def __repr__(self):
+        return (f"Delta(temps={self.temps}, {len(self.apparus)} apparus, {len(self.disparus)} disparus, "
+                f"{len(self.deplaces)} déplacés, {len(self.modifications)} champs modifiés)")
+
+
+def _aligner_categories(table, nouveau):
+    """Donne aux colonnes catégorielles des deux tables les mêmes catégories (union)."""
+    for col in table.columns.intersection(nouveau.columns):
+        if isinstance(table[col].dtype, pd.CategoricalDtype) or isinstance(nouveau[col].dtype, pd.CategoricalDtype):
+            categories = union_categoricals([table[col].astype('category'), nouveau[col].astype('category')],
+                                            ignore_order=True).categories
+            dtype = pd.CategoricalDtype(categories)
+            table[col] = table[col].astype(dtype)
+            nouveau[col] = nouveau[col].astype(dtype)
+
+
+class EtatCourant:
+    """Table de l'état courant du trafic, mise à jour à chaque instantané par différence.
+
+    La table (une ligne par icao24) est modifiée sur place : seules les lignes des avions
+    qui ont changé sont réécrites, les disparus sont supprimés et les apparus ajoutés.
+    Chaque mise à jour retourne un Delta que les consommateurs (carte, métriques)
+    peuvent appliquer au lieu de tout recalculer.
+    """
+
+    def __init__(self, colonnes=None):
+        self.colonnes = colonnes
+        self.table = None
+        self.temps = None
+
+    def __len__(self):
+        return 0 if self.table is None else len(self.table)
+
+    def appliquer(self, df, temps=None):
+        """Compare un nouvel instantané à l'état courant puis met l'état à jour.
+
+        Arguments:
+        df -- DataFrame de l'instantané, avec une colonne 'icao24'
+        temps -- timestamp de l'instantané (optionnel)
+
+        Retourne:
+        Delta entre l'état précédent et le nouvel instantané
+        """
+        nouveau = df.drop_duplicates('icao24', keep='last').set_index('icao24')
+        if self.colonnes is not None:
+            nouveau = nouveau[self.colonnes]
+        vide = nouveau.iloc[:0]
+        modifications_vides = pd.DataFrame({'icao24': [], 'champ': [], 'ancien': [], 'nouveau': []})
+
+        if self.table is None:
+            self.table = nouveau.copy()
+            self.temps = temps
+            return Delta(nouveau, vide, vide, modifications_vides, temps)
+
+        _aligner_categories(self.table, nouveau)
+        communs = self.table.index.intersection(nouveau.index)
+        apparus = nouveau.loc[nouveau.index.difference(self.table.index)]
+        disparus = self.table.loc[self.table.index.difference(nouveau.index)]
+
+        # Matrice booléenne (avions communs x champs) des valeurs modifiées, NaN == NaN
+        colonnes = self.table.columns.intersection(nouveau.columns)
+        ancien = self.table.loc[communs, colonnes]
+        courant = nouveau.loc[communs, colonnes]
+        change = pd.DataFrame({
+            col: (ancien[col].to_numpy() != courant[col].to_numpy()) & ~(ancien[col].isna().to_numpy() & courant[col].isna().to_numpy())
+            for col in colonnes
+        }, index=communs)
+
+        champs_position = change.columns.intersection(CHAMPS_POSITION)
+        deplaces = courant[change[champs_position].any(axis=1).to_numpy()]
+
+        lignes, cols = np.nonzero(change.to_numpy())
+        modifications = pd.DataFrame({
+            'icao24': communs[lignes],
+            'champ': colonnes[cols],
+            'ancien': ancien.to_numpy(dtype=object)[lignes, cols],
+            'nouveau': courant.to_numpy(dtype=object)[lignes, cols],
+        }) if len(lignes) else modifications_vides
+
+        # Mise à jour sur place : seules les lignes modifiées sont réécrites
+        modifies = communs[change.any(axis=1).to_numpy()]
+        if len(modifies):
+            self.table.loc[modifies, colonnes] = courant.loc[modifies]
+        if len(disparus):
+            self.table.drop(index=disparus.index, inplace=True)
+        if len(apparus):
+            self.table = pd.concat([self.table, apparus])
+        self.temps = temps
+        return Delta(apparus, disparus, deplaces, modifications, temps)
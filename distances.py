@@ -0,0 +1,94 @@
+import numpy as np
+import pandas as pd
+
+
+RAYON_TERRE_KM = 6371
+
+
+def haversine(lat1, lon1, lat2, lon2):
+    """Calcule la distance orthodromique entre des points géographiques.
+
+    Les arguments peuvent être des scalaires ou des tableaux numpy / Series
+    (broadcasting numpy).
+
+    Arguments:
+    lat1 -- latitude(s) du premier point en degrés
+    lon1 -- longitude(s) du premier point en degrés
+    lat2 -- latitude(s) du deuxième point en degrés
+    lon2 -- longitude(s) du deuxième point en degrés
+
+    Retourne:
+    distance(s) en kilomètres (float ou tableau numpy)
+    """
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(v, dtype=np.float64)) for v in (lat1, lon1, lat2, lon2))
+    a = np.sin((lat2 - lat1) / 2)**2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2)**2
+    return 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+def matrice_distances(lat1, lon1, lat2=None, lon2=None):
+    """Calcule la matrice des distances entre deux ensembles de points.
+
+    Arguments:
+    lat1, lon1 -- tableaux des n premiers points en degrés
+    lat2, lon2 -- tableaux des m seconds points (défaut: les premiers points)
+
+    Retourne:
+    tableau numpy (n, m) des distances en kilomètres
+    """
+    if lat2 is None:
+        lat2, lon2 = lat1, lon1
+    return haversine(np.asarray(lat1)[:, None], np.asarray(lon1)[:, None],
+                     np.asarray(lat2)[None, :], np.asarray(lon2)[None, :])
+
+
+def matrice_distances_par_blocs(lat1, lon1, lat2=None, lon2=None, taille_bloc=2048):
+    """Parcourt la matrice des distances par blocs de lignes, à mémoire bornée.
+
+    Chaque bloc occupe au plus taille_bloc x m flottants.
+
+    Arguments:
+    lat1, lon1 -- tableaux des n premiers points en degrés
+    lat2, lon2 -- tableaux des m seconds points (défaut: les premiers points)
+    taille_bloc -- nombre de lignes par bloc
+
+    Retourne:
+    générateur de tuples (indice de la première ligne, bloc numpy (<= taille_bloc, m))
+    """
+    lat1, lon1 = np.asarray(lat1), np.asarray(lon1)
+    if lat2 is None:
+        lat2, lon2 = lat1, lon1
+    for debut in range(0, len(lat1), taille_bloc):
+        fin = debut + taille_bloc
+        yield debut, matrice_distances(lat1[debut:fin], lon1[debut:fin], lat2, lon2)
+
+
+def distance_cumulee(df, groupe='icao24', temps='time'):
+    """Calcule la distance parcourue depuis le premier point de chaque groupe (avion ou vol).
+
+    Arguments:
+    df -- DataFrame avec colonnes 'latitude', 'longitude', groupe et temps
+    groupe -- colonne identifiant la trajectoire (défaut: 'icao24')
+    temps -- colonne de tri chronologique (défaut: 'time')
+
+    Retourne:
+    Series des distances cumulées en km, alignée sur l'index de df
+    (NaN si la position est manquante)
+    """
+    trie = df.sort_values([groupe, temps], kind='stable')
+    lat = trie['latitude'].to_numpy(dtype=np.float64)
+    lon = trie['longitude'].to_numpy(dtype=np.float64)
+    groupes = trie[groupe].to_numpy()
+
+    # Les positions manquantes sont sautées : chaque point est relié au dernier point connu du groupe
+    connues = ~(np.isnan(lat) | np.isnan(lon))
+    pas = np.full(len(trie), np.nan)
+    idx = np.flatnonzero(connues)
+    segments = haversine(lat[idx[:-1]], lon[idx[:-1]], lat[idx[1:]], lon[idx[1:]])
+    meme_groupe = groupes[idx[1:]] == groupes[idx[:-1]]
+    pas[idx[1:]] = np.where(meme_groupe, segments, 0.0)
+    if len(idx):
+        pas[idx[0]] = 0.0
+
+    cumul = pd.Series(pas, index=trie.index).groupby(groupes).cumsum()
+    cumul[~connues] = np.nan
+    return cumul.reindex(df.index)
@@ -0,0 +1,151 @@
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from instrumentation import mesure
+
+
+SOURCE_AF = Path("data/AF_daily.dat")
+SOURCE_AERONEFS = Path("data/aircraftDatabase-2022-06.csv")
+DOSSIER_AF = Path("data/af_daily")
+FICHIER_AERONEFS = Path("data/aircraftDatabase.parquet")
+
+# Colonnes de la base d'aéronefs utilisées par l'application
+COLONNES_AERONEFS = ['icao24', 'manufacturername', 'manufacturericao', 'model',
+                     'icaoaircrafttype', 'engines', 'serialnumber']
+
+# Taille des groupes de lignes parquet : la base étant triée par icao24, les statistiques
+# min/max de chaque groupe permettent de sauter les groupes sans avion recherché
+TAILLE_GROUPE_LIGNES = 20_000
+
+# Clé de partition des datasets parquet (heure UTC), partagée avec le stockage de la collecte
+FORMAT_HEURE = '%Y-%m-%dT%H'
+
+
+def heure_partition(temps):
+    """Retourne la clé de partition (heure UTC) d'un timestamp unix."""
+    return datetime.fromtimestamp(int(temps), tz=timezone.utc).strftime(FORMAT_HEURE)
+
+
+def convertir_af_daily(source=SOURCE_AF, cible=DOSSIER_AF):
+    """Convertit le pickle AF_daily en dataset parquet partitionné par heure (une seule fois).
+
+    Arguments:
+    source -- chemin du pickle AF_daily
+    cible -- dossier du dataset parquet
+
+    Retourne:
+    nombre de lignes écrites
+    """
+    df = pd.read_pickle(source)
+    df = df.sort_values(['icao24', 'time'], kind='stable')
+    df['icao24'] = df['icao24'].astype('category')
+    df['heure'] = pd.to_datetime(df['time'], unit='s', utc=True).dt.strftime(FORMAT_HEURE)
+    pq.write_to_dataset(pa.Table.from_pandas(df, preserve_index=False), cible,
+                        partition_cols=['heure'], existing_data_behavior='delete_matching')
+    return len(df)
+
+
+def convertir_base_aeronefs(source=SOURCE_AERONEFS, cible=FICHIER_AERONEFS):
+    """Convertit le CSV de la base d'aéronefs en parquet trié par icao24 (une seule fois).
+
+    Arguments:
+    source -- chemin du CSV OpenSky
+    cible -- chemin du fichier parquet
+
+    Retourne:
+    nombre de lignes écrites
+    """
+    df = pd.read_csv(source, dtype=str)
+    df = df.dropna(subset=['icao24']).sort_values('icao24', kind='stable')
+    if 'engines' in df.columns:
+        df['engines'] = df['engines'].astype('category')
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), cible,
+                   row_group_size=TAILLE_GROUPE_LIGNES)
+    return len(df)
+
+
+def _filtre_icao24(icao24):
+    return [('icao24', 'in', sorted(set(icao24)))] if icao24 is not None else []
+
+
+@mesure('donnees.charger_af')
+def charger_af(colonnes=None, icao24=None, debut=None, fin=None):
+    """Lit les positions Air France, en ne lisant que les colonnes et partitions nécessaires.
+
+    Arguments:
+    colonnes -- liste de colonnes à lire (défaut: toutes)
+    icao24 -- liste d'avions à garder (défaut: tous)
+    debut -- timestamp unix de début, inclus (défaut: pas de borne)
+    fin -- timestamp unix de fin, inclus (défaut: pas de borne)
+
+    Retourne:
+    DataFrame pandas (icao24 catégoriel)
+    """
+    if not DOSSIER_AF.exists():
+        convertir_af_daily()
+
+    filtres = _filtre_icao24(icao24)
+    if debut is not None:
+        filtres += [('heure', '>=', heure_partition(debut)), ('time', '>=', debut)]
+    if fin is not None:
+        filtres += [('heure', '<=', heure_partition(fin)), ('time', '<=', fin)]
+
+    df = pd.read_parquet(DOSSIER_AF, columns=colonnes, filters=filtres or None)
+    if colonnes is None or 'heure' not in colonnes:
+        df = df.drop(columns=['heure'], errors='ignore')
+    return df
+
+
+@mesure('donnees.charger_aeronefs')
+def charger_aeronefs(colonnes=COLONNES_AERONEFS, icao24=None):
+    """Lit la base d'aéronefs, limitée aux colonnes demandées et éventuellement à certains avions.
+
+    Arguments:
+    colonnes -- liste de colonnes à lire (défaut: COLONNES_AERONEFS, None pour toutes)
+    icao24 -- liste d'avions à garder (défaut: tous)
+
+    Retourne:
+    DataFrame pandas
+    """
+    if not FICHIER_AERONEFS.exists():
+        convertir_base_aeronefs()
+    return pd.read_parquet(FICHIER_AERONEFS, columns=colonnes, filters=_filtre_icao24(icao24) or None)
+
+
+@mesure('donnees.charger_af_avec_aeronefs')
+def charger_af_avec_aeronefs(colonnes_af=None, colonnes_aeronefs=COLONNES_AERONEFS, debut=None, fin=None):
+    """Jointure des positions Air France et des caractéristiques de leurs avions.
+
+    Seuls les avions présents dans les données Air France sont lus dans la base d'aéronefs,
+    et la clé de jointure reste catégorielle des deux côtés.
+
+    Arguments:
+    colonnes_af -- colonnes des positions à lire (défaut: toutes)
+    colonnes_aeronefs -- colonnes de la base d'aéronefs à joindre
+    debut, fin -- bornes temporelles (timestamps unix, défaut: pas de borne)
+
+    Retourne:
+    DataFrame pandas (jointure interne sur icao24)
+    """
+    df_af = charger_af(colonnes_af, debut=debut, fin=fin)
+    avions = df_af['icao24'].cat.remove_unused_categories().cat.categories
+    df_ae = charger_aeronefs(colonnes_aeronefs, icao24=avions)
+    df_ae['icao24'] = df_ae['icao24'].astype(pd.CategoricalDtype(avions))
+    df_af['icao24'] = df_af['icao24'].astype(pd.CategoricalDtype(avions))
+    return pd.merge(df_af, df_ae, on='icao24', how='inner')
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Conversion de AF_daily et de la base d'aéronefs en parquet")
+    parser.parse_args()
+    print(f"AF_daily : {convertir_af_daily()} lignes -> {DOSSIER_AF}")
+    print(f"Base d'aéronefs : {convertir_base_aeronefs()} lignes -> {FICHIER_AERONEFS}")
+
+
+if __name__ == "__main__":
+    main()
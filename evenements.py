@@ -0,0 +1,178 @@
+import numpy as np
+import pandas as pd
+
+from distances import haversine, matrice_distances_par_blocs
+from instrumentation import mesure
+
+
+TYPES_EVENEMENTS = ['arrivee', 'depart', 'remise_des_gaz']
+
+# Distance maximale entre la position au sol d'un événement et le centre de l'aéroport (km)
+RAYON_AEROPORT_KM = 5
+
+# Une approche est une suite de positions en vol à moins de RAYON_APPROCHE_KM d'un aéroport
+# et sous ALTITUDE_APPROCHE_M ; elle devient une remise des gaz si l'avion y descend puis
+# remonte chacun d'au moins VARIATION_MIN_M mètres
+RAYON_APPROCHE_KM = 15
+ALTITUDE_APPROCHE_M = 1500
+VARIATION_MIN_M = 150
+
+
+def aeroport_le_plus_proche(latitude, longitude, aeroports, rayon_km=RAYON_AEROPORT_KM):
+    """Cherche l'aéroport le plus proche de chaque position (calcul par blocs, à mémoire bornée).
+
+    Arguments:
+    latitude, longitude -- tableaux de positions en degrés
+    aeroports -- DataFrame avec colonnes 'latitude', 'longitude' (voir aeroports.detecter_aeroports)
+    rayon_km -- distance maximale en km
+
+    Retourne:
+    tuple (numéros d'aéroport, -1 si aucun à moins de rayon_km ; distances en km)
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    numeros = np.full(len(latitude), -1, dtype=np.int64)
+    distances = np.full(len(latitude), np.inf)
+    if len(aeroports) == 0:
+        return numeros, distances
+    blocs = matrice_distances_par_blocs(latitude, np.asarray(longitude, dtype=np.float64),
+                                        aeroports['latitude'].to_numpy(dtype=np.float64),
+                                        aeroports['longitude'].to_numpy(dtype=np.float64))
+    for debut, bloc in blocs:
+        fin = debut + len(bloc)
+        numeros[debut:fin] = bloc.argmin(axis=1)
+        distances[debut:fin] = bloc.min(axis=1)
+    numeros[~(distances <= rayon_km)] = -1
+    return numeros, distances
+
+
+def _bornes_groupes(codes):
+    """Premier et dernier indice de chaque groupe d'un tableau de codes trié.
+
+    Retourne:
+    tuple (codes présents, premiers indices, derniers indices)
+    """
+    presents, premiers = np.unique(codes, return_index=True)
+    derniers = np.r_[premiers[1:], len(codes)] - 1
+    return presents, premiers, derniers
+
+
+def _maximum_cumule_par_groupe(valeurs, groupes):
+    """Maximum cumulé de valeurs, repris à chaque groupe (numéros de groupes croissants).
+
+    Chaque groupe est décalé vers le haut d'une constante assez grande pour que le maximum
+    ne déborde jamais d'un groupe sur le suivant : une seule passe numpy, sans boucle par groupe.
+    """
+    decalage = groupes * (np.abs(valeurs).max() * 4 + 1 if len(valeurs) else 1)
+    return np.maximum.accumulate(valeurs + decalage) - decalage
+
+
+def _remises_des_gaz(vol, en_vol, lat, lon, alt, aeroports, rayon_approche_km, altitude_approche, variation_min):
+    """Indices (dans le tableau trié) du point bas de chaque remise des gaz, et leur aéroport."""
+    candidats = np.flatnonzero(en_vol & (alt < altitude_approche))
+    numeros, _ = aeroport_le_plus_proche(lat[candidats], lon[candidats], aeroports, rayon_approche_km)
+    dans_zone = numeros >= 0
+    candidats, numeros = candidats[dans_zone], numeros[dans_zone]
+    if len(candidats) == 0:
+        return candidats, numeros
+
+    # Passages : suites de positions consécutives d'un même vol dans la zone d'un même aéroport
+    suite = np.r_[False, (np.diff(candidats) == 1) & (vol[candidats[1:]] == vol[candidats[:-1]])
+                  & (numeros[1:] == numeros[:-1])]
+    passage = np.cumsum(~suite) - 1
+    a = alt[candidats]
+
+    # En chaque point : descente depuis le plus haut point précédent, remontée jusqu'au plus haut point suivant
+    descente = _maximum_cumule_par_groupe(a, passage) - a
+    inverse = passage[::-1].max() - passage[::-1]
+    remontee = _maximum_cumule_par_groupe(a[::-1], inverse)[::-1] - a
+    remise = (descente >= variation_min) & (remontee >= variation_min)
+
+    # Un seul événement par passage : son point le plus bas
+    indices = np.flatnonzero(remise)
+    ordre = np.lexsort((a[indices], passage[indices]))
+    indices = indices[ordre]
+    _, premiers, _ = _bornes_groupes(passage[indices])
+    indices = indices[premiers]
+    return candidats[indices], numeros[indices]
+
+
+@mesure('evenements.evenements_aeroports')
+def evenements_aeroports(df, aeroports, rayon_km=RAYON_AEROPORT_KM, rayon_approche_km=RAYON_APPROCHE_KM,
+                         altitude_approche=ALTITUDE_APPROCHE_M, variation_min=VARIATION_MIN_M,
+                         vol='flight_id', temps='time', altitude='baroaltitude'):
+    """Détecte les arrivées, départs et remises des gaz de tous les vols, pour tous les aéroports.
+
+    Le DataFrame est trié une seule fois par (vol, temps) ; les premières et dernières
+    positions au sol et en vol de chaque vol sont lues par réductions vectorisées :
+    - arrivée : le vol finit au sol, à moins de rayon_km d'un aéroport, après avoir volé ;
+    - départ : le vol commence au sol, à moins de rayon_km d'un aéroport, puis décolle ;
+    - remise des gaz : en approche (moins de rayon_approche_km, sous altitude_approche),
+      l'avion descend puis remonte d'au moins variation_min mètres sans se poser.
+
+    Arguments:
+    df -- DataFrame avec colonnes vol, temps, 'icao24', 'on_ground', 'latitude', 'longitude' et altitude
+    aeroports -- DataFrame indexé par nom d'aéroport, avec colonnes 'latitude', 'longitude'
+    rayon_km -- distance maximale entre la position au sol et l'aéroport (km)
+    rayon_approche_km -- rayon de la zone d'approche (km)
+    altitude_approche -- altitude maximale d'une position d'approche (m)
+    variation_min -- descente et remontée minimales d'une remise des gaz (m)
+    vol -- colonne identifiant le vol (défaut: 'flight_id', voir segmentation.segmenter_vols)
+    temps -- colonne temps en secondes
+    altitude -- colonne d'altitude en mètres
+
+    Retourne:
+    DataFrame indexé par 'aeroport' (trié par aéroport puis par temps), avec colonnes 'type'
+    (catégorie parmi TYPES_EVENEMENTS), vol, 'icao24', temps, 'latitude', 'longitude',
+    'altitude' et 'distance_km'
+    """
+    trie = df[df['latitude'].notna() & df['longitude'].notna()].sort_values([vol, temps], kind='stable')
+    codes = pd.factorize(trie[vol], sort=True)[0]
+    lat = trie['latitude'].to_numpy(dtype=np.float64)
+    lon = trie['longitude'].to_numpy(dtype=np.float64)
+    alt = trie[altitude].to_numpy(dtype=np.float64)
+    au_sol = trie['on_ground'].fillna(False).to_numpy(dtype=bool)
+    en_vol = ~au_sol
+
+    nb_vols = codes.max() + 1 if len(codes) else 0
+    bornes = {}
+    for nom, masque in [('sol', au_sol), ('vol', en_vol)]:
+        indices = np.flatnonzero(masque)
+        presents, premiers, derniers = _bornes_groupes(codes[indices])
+        premier = np.full(nb_vols, -1)
+        dernier = np.full(nb_vols, -1)
+        premier[presents] = indices[premiers]
+        dernier[presents] = indices[derniers]
+        bornes[nom] = premier, dernier
+    premier_sol, dernier_sol = bornes['sol']
+    premier_vol, dernier_vol = bornes['vol']
+
+    # Positions au sol des arrivées et des départs (vols ayant à la fois des positions au sol et en vol)
+    deux_phases = (premier_sol >= 0) & (premier_vol >= 0)
+    arrivees = dernier_sol[deux_phases & (dernier_sol > premier_vol)]
+    departs = premier_sol[deux_phases & (premier_sol < dernier_vol)]
+    au_sol_indices = np.r_[arrivees, departs]
+    numeros_sol, _ = aeroport_le_plus_proche(lat[au_sol_indices], lon[au_sol_indices], aeroports, rayon_km)
+    types_sol = np.r_[np.zeros(len(arrivees), dtype=np.int64), np.ones(len(departs), dtype=np.int64)]
+    pres = numeros_sol >= 0
+
+    remises, numeros_remises = _remises_des_gaz(codes, en_vol, lat, lon, alt, aeroports,
+                                                rayon_approche_km, altitude_approche, variation_min)
+
+    indices = np.r_[au_sol_indices[pres], remises]
+    numeros = np.r_[numeros_sol[pres], numeros_remises]
+    types = np.r_[types_sol[pres], np.full(len(remises), 2, dtype=np.int64)]
+
+    resultat = pd.DataFrame({
+        'aeroport': np.asarray(aeroports.index, dtype=object)[numeros],
+        'type': pd.Categorical.from_codes(types, TYPES_EVENEMENTS),
+        vol: trie[vol].to_numpy()[indices],
+        'icao24': trie['icao24'].to_numpy()[indices],
+        temps: trie[temps].to_numpy()[indices],
+        'latitude': lat[indices],
+        'longitude': lon[indices],
+        'altitude': alt[indices],
+    })
+    resultat['distance_km'] = haversine(resultat['latitude'], resultat['longitude'],
+                                        aeroports['latitude'].to_numpy(dtype=np.float64)[numeros],
+                                        aeroports['longitude'].to_numpy(dtype=np.float64)[numeros])
+    return resultat.sort_values(['aeroport', temps], kind='stable').set_index('aeroport')
@@ -0,0 +1,152 @@
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from io import BytesIO
+
+import requests
+from dotenv import load_dotenv
+from PIL import Image, ImageDraw
+
+from cache_disque import DOSSIER_CACHE, CacheDisque
+
+
+load_dotenv()
+
+URL_UNSPLASH = "https://api.unsplash.com/photos/random"
+TTL_IMAGES_S = 7 * 24 * 3600
+# Après un échec (modèle sans photo, réseau coupé), délai avant de retenter le téléchargement
+TTL_ECHECS_S = float(os.getenv("IMAGES_TTL_ECHEC", 15 * 60))
+TAILLE_MAX_IMAGES = int(os.getenv("IMAGES_TAILLE_MAX", 50 * 2**20))
+
+# Formats proposés par Unsplash (largeur en pixels) : on télécharge le plus petit suffisant
+FORMATS_UNSPLASH = [(200, 'thumb'), (400, 'small'), (1080, 'regular')]
+
+
+def cle_image(modele, largeur):
+    """Clé de cache adressée par contenu : empreinte du modèle normalisé et largeur de la vignette."""
+    empreinte = hashlib.sha256(str(modele).strip().lower().encode('utf-8')).hexdigest()
+    return f"{empreinte[:2]}/{empreinte}-{largeur}.jpg"
+
+
+def vignette(donnees, largeur):
+    """Redimensionne une image à la largeur voulue (sans agrandir) et l'encode en JPEG."""
+    img = Image.open(BytesIO(donnees)).convert('RGB')
+    if img.width > largeur:
+        img = img.resize((largeur, int(img.height * largeur / img.width)))
+    sortie = BytesIO()
+    img.save(sortie, format='JPEG', quality=85)
+    return sortie.getvalue()
+
+
+@cache
+def image_par_defaut(largeur):
+    """Image de remplacement générée localement (aucun accès réseau)."""
+    img = Image.new('RGB', (largeur, largeur * 2 // 3), (225, 228, 232))
+    dessin = ImageDraw.Draw(img)
+    dessin.text((largeur // 2, largeur // 3), "Image indisponible", fill=(110, 115, 125), anchor='mm')
+    sortie = BytesIO()
+    img.save(sortie, format='JPEG', quality=85)
+    return sortie.getvalue()
+
+
+class ServiceImages:
+    """Images d'avions par modèle : cache disque de vignettes et téléchargement en arrière-plan.
+
+    Une vignette déjà en cache (et de moins de ttl secondes) est servie sans aucun accès
+    réseau. Sinon, demander() lance le téléchargement dans un thread et rend la main
+    tout de suite, pour que la page s'affiche pendant ce temps ; image() attend le
+    résultat (ou non, avec attente=0) et renvoie l'image de remplacement en cas d'échec.
+    Les échecs sont mémorisés ttl_echecs secondes : pendant ce délai, le modèle est servi
+    avec l'image de remplacement sans nouvel accès réseau.
+    """
+
+    def __init__(self, cle_acces=None, cache_disque=None, timeout=5, nb_threads=2, ttl_echecs=TTL_ECHECS_S):
+        self.cle_acces = cle_acces or os.getenv("UNSPLASH_ACCESS_KEY")
+        self.cache_disque = cache_disque or CacheDisque(DOSSIER_CACHE / "images", TAILLE_MAX_IMAGES, TTL_IMAGES_S)
+        self.timeout = timeout
+        self.session = requests.Session()
+        self._threads = ThreadPoolExecutor(max_workers=nb_threads)
+        self._en_cours = {}
+        self._echecs = {}
+        self.ttl_echecs = ttl_echecs
+        self._verrou = threading.Lock()
+
+    def _telecharger(self, modele, largeur):
+        """Cherche une photo du modèle sur Unsplash et enregistre sa vignette (exécuté dans un thread)."""
+        try:
+            resp = self.session.get(URL_UNSPLASH, params={'query': modele, 'client_id': self.cle_acces},
+                                    timeout=self.timeout)
+            resp.raise_for_status()
+            urls = resp.json()['urls']
+            format_url = next((nom for w, nom in FORMATS_UNSPLASH if w >= largeur), 'regular')
+            img = self.session.get(urls[format_url], timeout=self.timeout)
+            img.raise_for_status()
+            donnees = vignette(img.content, largeur)
+        except Exception:
+            with self._verrou:
+                self._echecs[cle_image(modele, largeur)] = time.time()
+            raise
+        self.cache_disque.ecrire(cle_image(modele, largeur), donnees)
+        return donnees
+
+    def _echec_recent(self, cle):
+        with self._verrou:
+            echec = self._echecs.get(cle)
+            if echec is not None and time.time() - echec > self.ttl_echecs:
+                del self._echecs[cle]
+                echec = None
+        return echec is not None
+
+    def en_attente(self, modele, largeur=200):
+        """Vrai si le téléchargement de la vignette est en cours."""
+        return cle_image(modele, largeur) in self._en_cours
+
+    def demander(self, modele, largeur=200):
+        """Lance le téléchargement de la vignette si elle n'est ni en cache ni déjà demandée.
+
+        Retourne:
+        Future des octets JPEG, ou None si la vignette est en cache, sans clé d'accès
+        ou en échec depuis moins de ttl_echecs secondes
+        """
+        cle = cle_image(modele, largeur)
+        if not self.cle_acces or cle in self.cache_disque or self._echec_recent(cle):
+            return None
+        with self._verrou:
+            futur = self._en_cours.get(cle)
+            if futur is None:
+                futur = self._threads.submit(self._telecharger, modele, largeur)
+                self._en_cours[cle] = futur
+                futur.add_done_callback(lambda f: self._en_cours.pop(cle, None))
+            return futur
+
+    def image(self, modele, largeur=200, attente=None):
+        """Retourne la vignette du modèle, ou l'image de remplacement.
+
+        Arguments:
+        modele -- nom du modèle d'avion
+        largeur -- largeur de la vignette en pixels
+        attente -- temps maximal d'attente du téléchargement en secondes (défaut: timeout réseau,
+                   0 pour ne pas attendre : l'image de remplacement est rendue tant qu'il est en cours)
+
+        Retourne:
+        tuple (octets JPEG, True si c'est une vraie photo)
+        """
+        donnees = self.cache_disque.lire(cle_image(modele, largeur))
+        if donnees is not None:
+            return donnees, True
+        futur = self.demander(modele, largeur)
+        if futur is not None:
+            try:
+                return futur.result(timeout=2 * self.timeout if attente is None else attente), True
+            except Exception:
+                pass
+        return image_par_defaut(largeur), False
+
+
+@cache
+def service_images():
+    """Service d'images partagé par toute l'application."""
+    return ServiceImages()
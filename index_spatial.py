@@ -0,0 +1,102 @@
+import numpy as np
+
+from distances import RAYON_TERRE_KM, haversine
+from instrumentation import mesure
+
+
+class IndexSpatial:
+    """Index en grille régulière (latitude, longitude) sur des positions d'avions.
+
+    Les points sont triés une fois par numéro de case ; une requête ne lit que les
+    tranches de cases qui recoupent la zone demandée (recherche dichotomique),
+    puis filtre exactement les candidats. Les indices retournés sont des positions
+    (à utiliser avec df.iloc) dans l'ordre croissant.
+    """
+
+    def __init__(self, latitude, longitude, taille_case=0.5):
+        self.latitude = np.asarray(latitude, dtype=np.float64)
+        self.longitude = np.asarray(longitude, dtype=np.float64)
+        self.taille_case = taille_case
+        self.nb_colonnes = int(np.ceil(360 / taille_case))
+        self.nb_lignes = int(np.ceil(180 / taille_case))
+
+        valides = np.flatnonzero(~(np.isnan(self.latitude) | np.isnan(self.longitude)))
+        cles = self._cle(self._ligne(self.latitude[valides]), self._colonne(self.longitude[valides]))
+        ordre = np.argsort(cles, kind='stable')
+        self._cles = cles[ordre]
+        self._positions = valides[ordre]
+
+    @classmethod
+    @mesure('index_spatial.IndexSpatial.from_dataframe')
+    def from_dataframe(cls, df, taille_case=0.5):
+        """Construit l'index à partir des colonnes 'latitude' et 'longitude' d'un DataFrame."""
+        return cls(df['latitude'].to_numpy(), df['longitude'].to_numpy(), taille_case)
+
+    def __len__(self):
+        return len(self._positions)
+
+    def _ligne(self, lat):
+        return np.clip(((np.asarray(lat) + 90) // self.taille_case).astype(np.int64), 0, self.nb_lignes - 1)
+
+    def _colonne(self, lon):
+        return np.clip(((np.asarray(lon) + 180) // self.taille_case).astype(np.int64), 0, self.nb_colonnes - 1)
+
+    def _cle(self, ligne, colonne):
+        return ligne * self.nb_colonnes + colonne
+
+    def _candidats(self, lon_min, lon_max, lat_min, lat_max):
+        """Positions des points situés dans les cases recoupant l'emprise (sans filtrage exact)."""
+        lignes = np.arange(self._ligne(lat_min), self._ligne(lat_max) + 1)
+        # Dans une ligne de la grille, les cases [colonne min, colonne max] forment une plage contiguë de clés
+        debuts = np.searchsorted(self._cles, self._cle(lignes, self._colonne(lon_min)), side='left')
+        fins = np.searchsorted(self._cles, self._cle(lignes, self._colonne(lon_max)), side='right')
+        longueurs = fins - debuts
+        if longueurs.sum() == 0:
+            return np.empty(0, dtype=np.int64)
+        # Concaténation vectorisée des plages [debut, fin[
+        decalages = np.repeat(debuts - np.cumsum(longueurs) + longueurs, longueurs)
+        return self._positions[np.arange(longueurs.sum()) + decalages]
+
+    def query_bbox(self, lon_min, lon_max, lat_min, lat_max):
+        """Retourne les positions des points dans une emprise (bornes incluses).
+
+        Arguments:
+        lon_min, lon_max -- longitudes en degrés (lon_min > lon_max si l'emprise traverse l'antiméridien)
+        lat_min, lat_max -- latitudes en degrés
+
+        Retourne:
+        tableau numpy d'indices positionnels triés
+        """
+        if lon_min > lon_max:
+            return np.union1d(self.query_bbox(lon_min, 180, lat_min, lat_max),
+                              self.query_bbox(-180, lon_max, lat_min, lat_max))
+        candidats = self._candidats(lon_min, lon_max, lat_min, lat_max)
+        lat = self.latitude[candidats]
+        lon = self.longitude[candidats]
+        dedans = (lat >= lat_min) & (lat <= lat_max) & (lon >= lon_min) & (lon <= lon_max)
+        return np.sort(candidats[dedans])
+
+    @mesure('index_spatial.IndexSpatial.query_radius_km')
+    def query_radius_km(self, lat, lon, rayon_km):
+        """Retourne les positions des points à moins de rayon_km d'un point (distance haversine).
+
+        Arguments:
+        lat, lon -- centre en degrés
+        rayon_km -- rayon en kilomètres
+
+        Retourne:
+        tableau numpy d'indices positionnels triés
+        """
+        dlat = np.degrees(rayon_km / RAYON_TERRE_KM)
+        lat_min, lat_max = max(lat - dlat, -90), min(lat + dlat, 90)
+        cos_lat = np.cos(np.radians(max(abs(lat_min), abs(lat_max))))
+        if cos_lat < 1e-6 or dlat / cos_lat >= 180:
+            lon_min, lon_max = -180, 180
+        else:
+            dlon = dlat / cos_lat
+            lon_min = (lon - dlon + 180) % 360 - 180
+            lon_max = (lon + dlon + 180) % 360 - 180
+
+        candidats = self.query_bbox(lon_min, lon_max, lat_min, lat_max)
+        distances = haversine(lat, lon, self.latitude[candidats], self.longitude[candidats])
+        return candidats[distances <= rayon_km]
@@ -0,0 +1,202 @@
+import json
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from functools import cache, wraps
+
+import numpy as np
+
+
+# Durées gardées par mesure pour les quantiles (les plus récentes)
+TAILLE_HISTORIQUE = int(os.getenv("INSTRUMENTATION_HISTORIQUE", 1000))
+
+# Panneau de la barre latérale affiché sur toutes les pages (sinon seulement avec ?debug=1 dans l'URL)
+PANNEAU_DEBUG = os.getenv("INSTRUMENTATION_PANNEAU") == "1"
+
+
+class Registre:
+    """Métriques du processus : nombre d'appels et durées de chaque mesure, succès des caches.
+
+    Le registre est partagé par toutes les sessions Streamlit du processus (accès protégés
+    par un verrou) : il reflète la charge réelle de l'application, pas une seule page.
+    Seules les TAILLE_HISTORIQUE dernières durées de chaque mesure servent aux quantiles,
+    les compteurs et durées totales portent sur tous les appels.
+    """
+
+    def __init__(self, taille_historique=TAILLE_HISTORIQUE):
+        self.taille_historique = taille_historique
+        self._verrou = threading.Lock()
+        self.reinitialiser()
+
+    def reinitialiser(self):
+        """Remet toutes les métriques à zéro."""
+        with self._verrou:
+            self._durees = defaultdict(lambda: deque(maxlen=self.taille_historique))
+            self._appels = defaultdict(int)
+            self._erreurs = defaultdict(int)
+            self._totaux = defaultdict(float)
+            self._succes = defaultdict(int)
+            self._echecs = defaultdict(int)
+            self._debut = time.time()
+
+    def enregistrer(self, nom, duree, erreur=False):
+        """Ajoute un appel de durée duree (secondes) à la mesure nom."""
+        with self._verrou:
+            self._durees[nom].append(duree)
+            self._appels[nom] += 1
+            self._totaux[nom] += duree
+            if erreur:
+                self._erreurs[nom] += 1
+
+    def cache(self, nom, trouve):
+        """Compte une lecture du cache nom, réussie (trouve) ou non."""
+        with self._verrou:
+            if trouve:
+                self._succes[nom] += 1
+            else:
+                self._echecs[nom] += 1
+
+    def statistiques(self):
+        """Résumé des mesures, triées par durée totale décroissante.
+
+        Retourne:
+        liste de dictionnaires 'nom', 'appels', 'erreurs', 'total_s', 'p50_ms', 'p95_ms', 'max_ms',
+        'succes_cache', 'echecs_cache', 'taux_succes_cache' (None sans lecture de cache)
+        """
+        with self._verrou:
+            noms = set(self._appels) | set(self._succes) | set(self._echecs)
+            lignes = []
+            for nom in noms:
+                durees = np.array(self._durees[nom]) * 1e3 if nom in self._durees else np.empty(0)
+                succes, echecs = self._succes.get(nom, 0), self._echecs.get(nom, 0)
+                p50, p95 = np.percentile(durees, [50, 95]) if len(durees) else (np.nan, np.nan)
+                lignes.append({
+                    'nom': nom,
+                    'appels': self._appels.get(nom, 0),
+                    'erreurs': self._erreurs.get(nom, 0),
+                    'total_s': self._totaux.get(nom, 0.0),
+                    'p50_ms': float(p50),
+                    'p95_ms': float(p95),
+                    'max_ms': float(durees.max()) if len(durees) else np.nan,
+                    'succes_cache': succes,
+                    'echecs_cache': echecs,
+                    'taux_succes_cache': succes / (succes + echecs) if succes + echecs else None,
+                })
+        return sorted(lignes, key=lambda ligne: -ligne['total_s'])
+
+    def exporter_json(self, chemin=None):
+        """Export JSON des statistiques (durées en ms, quantiles absents remplacés par null).
+
+        Arguments:
+        chemin -- fichier où écrire l'export (facultatif)
+
+        Retourne:
+        texte JSON
+        """
+        statistiques = [{cle: None if isinstance(v, float) and np.isnan(v) else v for cle, v in ligne.items()}
+                        for ligne in self.statistiques()]
+        texte = json.dumps({
+            'debut': datetime.fromtimestamp(self._debut, timezone.utc).isoformat(timespec='seconds'),
+            'export': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'pid': os.getpid(),
+            'mesures': statistiques,
+        }, indent=2, ensure_ascii=False)
+        if chemin is not None:
+            with open(chemin, 'w', encoding='utf-8') as f:
+                f.write(texte)
+        return texte
+
+
+@cache
+def registre():
+    """Registre de métriques partagé par tout le processus."""
+    return Registre()
+
+
+@contextmanager
+def mesure(nom):
+    """Chronomètre un bloc (with mesure(nom): ...) ou chaque appel d'une fonction (@mesure(nom)).
+
+    La durée est enregistrée même si le bloc lève une exception (comptée dans 'erreurs').
+    """
+    debut = time.perf_counter()
+    erreur = False
+    try:
+        yield
+    except BaseException:
+        erreur = True
+        raise
+    finally:
+        registre().enregistrer(nom, time.perf_counter() - debut, erreur)
+
+
+def mesure_cache(nom, decorateur_cache):
+    """Applique un décorateur de cache (st.cache_data, functools.cache...) en mesurant chaque appel.
+
+    Un appel dont le corps de la fonction ne s'exécute pas a été servi par le cache :
+    le taux de succès du cache est compté sous le même nom que la durée.
+
+    Arguments:
+    nom -- nom de la mesure
+    decorateur_cache -- décorateur de mise en cache, appliqué à la fonction
+
+    Retourne:
+    décorateur
+    """
+    def decorateur(fonction):
+        calcul = threading.local()
+
+        @wraps(fonction)
+        def calculer(*args, **kwargs):
+            calcul.effectue = True
+            return fonction(*args, **kwargs)
+
+        en_cache = decorateur_cache(calculer)
+
+        @wraps(fonction)
+        def appeler(*args, **kwargs):
+            calcul.effectue = False
+            with mesure(nom):
+                resultat = en_cache(*args, **kwargs)
+            registre().cache(nom, not calcul.effectue)
+            return resultat
+
+        # Vidage du cache toujours accessible (st.cache_data : clear, functools : cache_clear)
+        for methode in ('clear', 'cache_clear'):
+            if hasattr(en_cache, methode):
+                setattr(appeler, methode, getattr(en_cache, methode))
+        return appeler
+    return decorateur
+
+
+def panneau_debug(force=False):
+    """Panneau Streamlit des métriques dans la barre latérale, avec export JSON.
+
+    Affiché si INSTRUMENTATION_PANNEAU=1, si l'URL contient ?debug=1 ou si force est vrai ;
+    à appeler en fin de page pour inclure les mesures de l'exécution en cours.
+    """
+    # Import local : le module reste utilisable hors de Streamlit (collecte, benchmarks)
+    import pandas as pd
+    import streamlit as st
+
+    if not (force or PANNEAU_DEBUG or st.query_params.get('debug') == '1'):
+        return
+    with st.sidebar.expander("Instrumentation", expanded=True):
+        statistiques = registre().statistiques()
+        if statistiques:
+            st.dataframe(pd.DataFrame(statistiques).set_index('nom'), column_config={
+                'total_s': st.column_config.NumberColumn(format="%.2f"),
+                'p50_ms': st.column_config.NumberColumn(format="%.1f"),
+                'p95_ms': st.column_config.NumberColumn(format="%.1f"),
+                'max_ms': st.column_config.NumberColumn(format="%.1f"),
+                'taux_succes_cache': st.column_config.ProgressColumn(min_value=0, max_value=1, format="percent"),
+            })
+        else:
+            st.write("Aucune mesure enregistrée")
+        st.download_button("Exporter en JSON", registre().exporter_json(), file_name="instrumentation.json",
+                           mime="application/json")
+        if st.button("Remettre à zéro"):
+            registre().reinitialiser()
@@ -1,12 +1,54 @@
+import os
 import streamlit as st
 import pandas as pd
-from avion import Avion
+from avion import Flotte
 from utils import plot_avions
+from cache_rendu import rendu_png
+from index_spatial import IndexSpatial
+from propagation import propager
+from statistiques import FICHIER_STATISTIQUES, StatistiquesFlux
+from instrumentation import mesure_cache, panneau_debug
 import plotly.express as px
 
-
-df=pd.read_parquet('data/df_states.parquet')
-df['date'] = pd.to_datetime(df['time_position'], unit='s')
+CARRE_METROPOLITAIN = (-5, 8, 42, 51)  # lon_min, lon_max, lat_min, lat_max
+FICHIER_STATES = 'data/df_states.parquet'
+
+
+@mesure_cache('load_states', st.cache_data)
+def load_states(chemin, mtime):
+    # Date de modification dans la clé : un fichier régénéré est relu au rerun suivant
+    df=pd.read_parquet(chemin)
+    df['date'] = pd.to_datetime(df['time_position'], unit='s')
+    return df, IndexSpatial.from_dataframe(df)
+
+@mesure_cache('load_statistiques', st.cache_data)
+def load_statistiques(_df, _index, mtime):
+    # Statistiques incrémentales : les métriques et histogrammes sont lus sans rebalayer les états
+    # (mtime du fichier des états dans la clé, les arguments _ ne sont pas hachés)
+    stats_monde=StatistiquesFlux().ajouter(_df)
+    stats_france=StatistiquesFlux().ajouter(_df.iloc[_index.query_bbox(*CARRE_METROPOLITAIN)])
+    # Instantané en mémoire : comptes exacts plutôt que les estimations HyperLogLog
+    au_sol_transpondeur=_df['on_ground'].fillna(False).astype(bool) & _df['squawk'].notna()
+    comptes={
+        'avions': _df['icao24'].nunique(),
+        'pays': _df['origin_country'].nunique(),
+        'au_sol_transpondeur': _df.loc[au_sol_transpondeur, 'icao24'].nunique(),
+    }
+    return stats_monde, stats_france, comptes
+
+@mesure_cache('load_statistiques_collecte', st.cache_data)
+def load_statistiques_collecte(chemin, mtime):
+    # Fichier réécrit par la collecte à chaque instantané : relu dès que sa date change
+    return StatistiquesFlux.charger(chemin)
+
+def histogramme(stats, champ):
+    classes=stats.histogramme(champ)
+    return px.bar(classes, x='centre', y='effectif', labels={'centre': champ, 'effectif': 'count'})
+
+mtime_states=os.path.getmtime(FICHIER_STATES)
+df, index_spatial=load_states(FICHIER_STATES, mtime_states)
+df_france=df.iloc[index_spatial.query_bbox(*CARRE_METROPOLITAIN)]
+stats_monde, stats_france, comptes=load_statistiques(df, index_spatial, mtime_states)
 
 onglet = st.sidebar.radio(
     "Choisir l'onglet",
@@ -18,18 +60,17 @@ if onglet=='Statistiques globales':
     st.dataframe(df)
 
 
-    nombre_avions=df['icao24'].nunique()
-    nb_pays_origine=df['origin_country'].nunique()
-    nb_avions_sol_transpondeur_allume=df[(df['on_ground']==1) & (df['squawk']!=None)].shape[0]
+    nombre_avions=comptes['avions']
+    nb_pays_origine=comptes['pays']
+    nb_avions_sol_transpondeur_allume=comptes['au_sol_transpondeur']
 
-    au_sol=(df['on_ground'].value_counts(normalize=True).iloc[1]*100).round(1)
-    taux_de_montee=df['vertical_rate'].mean()
-    carre=(df['latitude']<=51)&(df['latitude']>=42)&(df['longitude']<=8)&(df['longitude']>=-5)
-    vitesse_moyenne_carre=df[carre]['velocity'].mean()
+    au_sol=round(stats_monde.proportion_au_sol*100, 1)
+    taux_de_montee=stats_monde.moyenne('vertical_rate')
+    vitesse_moyenne_carre=stats_france.moyenne('velocity')
 
-    fig_velocity=px.histogram(df,x='velocity')
-    fig_vertical_rate=px.histogram(df,x='vertical_rate')
-    fig_baro_altitude=px.histogram(df,x='baro_altitude')
+    fig_velocity=histogramme(stats_monde, 'velocity')
+    fig_vertical_rate=histogramme(stats_monde, 'vertical_rate')
+    fig_baro_altitude=histogramme(stats_monde, 'baro_altitude')
 
 
     a,b,c=st.columns(3)
@@ -37,33 +78,47 @@ if onglet=='Statistiques globales':
         st.metric("Nombre d'avions volant en ce moment dans le monde",nombre_avions)
         st.metric("Proportion d'avions au sol",f"{au_sol}%")
         st.plotly_chart(fig_velocity)
+        st.caption(f"Vitesse médiane : {stats_monde.quantile('velocity', 0.5):.0f} m/s")
     with b: 
         st.metric("Nombre de pays d'origine",nb_pays_origine)
         st.metric("Taux de montée moyen",f"{taux_de_montee:.2f} m/s")
         st.plotly_chart(fig_vertical_rate)
+        st.caption(f"95 % des taux de montée sous {stats_monde.quantile('vertical_rate', 0.95):.1f} m/s")
     with c:
         st.metric("Nombre d'avions au sol avec le transpondeur allumé",nb_avions_sol_transpondeur_allume)
         st.metric("Vitesse moyenne des avions dans le carré métropolitain",f"{vitesse_moyenne_carre:.1f} m/s")
         st.plotly_chart(fig_baro_altitude)
+        st.caption(f"Altitude médiane : {stats_monde.quantile('baro_altitude', 0.5):.0f} m")
+
+    # Historique de la collecte en cours si elle tourne avec --statistiques (estimations sur tous ses instantanés)
+    if FICHIER_STATISTIQUES.exists():
+        stats_collecte=load_statistiques_collecte(FICHIER_STATISTIQUES, FICHIER_STATISTIQUES.stat().st_mtime)
+        st.subheader(f"Historique de la collecte ({stats_collecte.nb_instantanes} instantanés)")
+        st.caption(f"Statistiques de {FICHIER_STATISTIQUES}, mises à jour à chaque instantané ; "
+                   "nombres d'avions et de pays distincts estimés")
+
+        a,b,c=st.columns(3)
+        with a:
+            st.metric("Avions distincts vus depuis le début de la collecte",stats_collecte.nb_avions)
+            st.metric("Proportion des états reçus au sol",f"{round(stats_collecte.proportion_au_sol*100, 1)}%")
+            st.plotly_chart(histogramme(stats_collecte, 'velocity'), key='historique_velocity')
+        with b:
+            st.metric("Pays d'origine distincts",stats_collecte.nb_pays)
+            st.metric("Taux de montée moyen sur la collecte",f"{stats_collecte.moyenne('vertical_rate'):.2f} m/s")
+            st.plotly_chart(histogramme(stats_collecte, 'vertical_rate'), key='historique_vertical_rate')
+        with c:
+            st.metric("Avions distincts vus au sol avec le transpondeur allumé",stats_collecte.nb_au_sol_transpondeur)
+            st.metric("Vitesse moyenne sur la collecte",f"{stats_collecte.moyenne('velocity'):.1f} m/s")
+            st.plotly_chart(histogramme(stats_collecte, 'baro_altitude'), key='historique_baro_altitude')
 else:
-    carre=(df['latitude']<=51)&(df['latitude']>=42)&(df['longitude']<=8)&(df['longitude']>=-5)
-    df_france=df[carre]
-
     st.subheader("Dataframe des avions en France")
     st.dataframe(df_france)
 
     st.write("Ouvrir l'image à l'aide du petit bouton en haut à droite")
 
-    liste_france=[]
-    for i in range(0,len(df_france)):
-        liste_france.append(Avion.from_dict(df_france.iloc[i]))
-
-    @st.cache_data
-    def load_plot_avions():
-        fig_carte=plot_avions(liste_france)
-        return fig_carte
-
-    fig_carte=load_plot_avions()
-    st.pyplot(fig_carte, use_container_width=False)
-
+    # Positions ramenées au même instant (dernier contact reçu) par navigation à l'estime
+    flotte_france=Flotte.from_dataframe(propager(df_france, df['last_contact'].max()))
+    # Rendu PNG mis en cache sur disque selon le contenu de la flotte
+    st.image(rendu_png(plot_avions, flotte_france), use_container_width=False)
 
+panneau_debug()
@@ -1,64 +1,128 @@
 import streamlit as st
 import pandas as pd
-from utils import plot_trajet_avion, plot_tous_les_vols, haversine, plot_approches_aeroport, tracer_position_moyenne,charger_image_unsplash
-import time
-import folium
+from utils import plot_trajet_avion, plot_tous_les_vols, collection_approches, tracer_position_moyenne,charger_image_unsplash
+from carte_geojson import carte_geojson, collection_geojson, emprise_rayon, points_geojson, tuiles_geojson
+from index_spatial import IndexSpatial
+from distances import haversine
+from aeroports import detecter_aeroports
+from evenements import evenements_aeroports
+from segmentation import segmenter_vols
+from simplification import importance_points, simplifier_pour_zoom
+from images import service_images
+from cache_rendu import empreinte, rendu_png
+from agregats import charger_cube_af
+from donnees import charger_af, charger_aeronefs, charger_af_avec_aeronefs
+from instrumentation import mesure, mesure_cache, panneau_debug
 from streamlit_folium import st_folium
 
-@st.cache_data
+@mesure_cache('load_data_air_france', st.cache_data)
 def load_data_air_france(): 
-    return pd.read_pickle("data/AF_daily.dat")
+    return charger_af()
 
-@st.cache_data
-def load_data_aeronefs(): 
-    return pd.read_csv("data/aircraftDatabase-2022-06.csv")
+@mesure_cache('load_cube_af', st.cache_data)
+def load_cube_af():
+    # Cube heure x région x compagnie, calculé une fois puis relu depuis data/cube_af.parquet
+    return charger_cube_af()
 
-df_af=load_data_air_france()
-df_af['date'] = pd.to_datetime(df_af['time'], unit='s')
-df_ae=load_data_aeronefs()
-df_merge=pd.merge(df_af,df_ae[['icao24','manufacturername','manufacturericao','model','engines','serialnumber']],on='icao24',how='inner')
+@mesure_cache('load_data_aeronefs', st.cache_data)
+def load_data_aeronefs(): 
+    return charger_aeronefs()
+
+@mesure_cache('load_data_merge', st.cache_data)
+def load_data_merge():
+    # Seuls les avions Air France sont lus dans la base d'aéronefs (filtre sur icao24)
+    return charger_af_avec_aeronefs(colonnes_aeronefs=['icao24','manufacturername','manufacturericao','model','engines','serialnumber'])
+
+# Les trajectoires viennent toutes du jeu de données fixe chargé par load_data_merge :
+# elles ne sont pas hachées à chaque exécution (arguments _), seul le niveau de zoom sert de clé
+
+@mesure_cache('load_index_spatial', st.cache_data)
+def load_index_spatial(_df, zoom):
+    return IndexSpatial.from_dataframe(_df)
+
+@mesure_cache('load_aeroports', st.cache_data)
+def load_aeroports(_df):
+    return detecter_aeroports(_df, eps_km=10, min_points=3)
+
+@mesure_cache('load_evenements', st.cache_data)
+def load_evenements(_df, _aeroports):
+    # Arrivées, départs et remises des gaz de tous les aéroports, détectés une fois pour toutes
+    # (arguments non hachés : ils viennent du jeu de données fixe chargé plus haut)
+    return evenements_aeroports(_df, _aeroports)
+
+@mesure_cache('load_empreinte_approches', st.cache_data)
+def load_empreinte_approches(_df, _evenements, zoom, aeroport, lat, lon):
+    # Empreinte des données, des événements et du code de collection_approches, calculée une fois par processus :
+    # les tuiles d'un autre jeu de données ou d'une ancienne version du code ne sont jamais relues
+    return empreinte(collection_approches, _df, _evenements, lat, lon, aeroport)[:16]
+
+@mesure('load_approches')
+def load_approches(df, zoom, evenements, aeroport, lat, lon):
+    # Pas de st.cache_data : les tuiles sont réécrites dès que l'index ou une tuile a été évincé du cache disque
+    nom = f"approches/{aeroport}-{load_empreinte_approches(df, evenements, zoom, aeroport, lat, lon)}"
+    if nom not in tuiles_geojson():
+        tuiles_geojson().ecrire(nom, collection_approches(df, evenements, lat, lon, aeroport,
+                                                          _index=load_index_spatial(df, zoom)))
+    return nom
+
+@mesure_cache('load_vols', st.cache_data)
+def load_vols(_df):
+    # Découpage des trajectoires en vols, puis importance RDP de chaque point
+    # (tous les niveaux de détail sont calculés en une seule passe)
+    df = segmenter_vols(_df)
+    df['importance'] = importance_points(df)
+    return df
+
+@mesure_cache('load_vols_zoom', st.cache_data)
+def load_vols_zoom(_df, zoom):
+    # Simplification des trajectoires selon le zoom de la carte (écart < 1 pixel), calculée une fois par zoom
+    return simplifier_pour_zoom(_df, zoom)
+
+COORD_CDG = (49.0097, 2.5479)
+
+df_merge=load_data_merge()
+df_merge['date'] = pd.to_datetime(df_merge['time'], unit='s')
 df_merge=df_merge.rename(columns={'lon':'longitude',
                              'lat':'latitude',
                              'onground':'on_ground'})
-df_merge=df_merge.iloc[::30] # Important ! Pas de 30 pour alléger les données
+df_merge=load_vols(df_merge)
+df_merge_z6=load_vols_zoom(df_merge, 6) # cartes cartopy (tuiles au zoom 6)
+df_merge_z13=load_vols_zoom(df_merge, 13) # carte folium des approches (zoom 13)
 onglet = st.sidebar.radio(
     "Choisir l'onglet",
     ["Air France", "Aéronefs", "Tracé d'un vol", "Tracé de tous les vols","Aéroport"],
 )
 
 if onglet=='Air France':
-    st.dataframe(df_af)
-    debut=time.time()
-    min_date=df_af['date'].min()
-    max_date=df_af['date'].max()
-    delta=max_date-min_date
-    fin=time.time()
-    st.write(f"La plage horaire est de : (temps pris : {fin-debut:.2f}s)")
+    # Positions brutes lues seulement à la demande : le reste de l'onglet vient du cube d'agrégats
+    if st.checkbox("Afficher les positions brutes"):
+        df_af=load_data_air_france()
+        df_af['date'] = pd.to_datetime(df_af['time'], unit='s')
+        st.dataframe(df_af)
+    cube_af=load_cube_af()
+    with mesure("Partie 2.plage_horaire"):
+        total=cube_af.total()
+        delta=total['fin']-total['debut']
+    st.write("La plage horaire est de :")
     st.write(delta)
 
-    debut=time.time()
-    vitesse_moyenne=df_af['velocity'].mean()
-    fin=time.time()
-    st.metric(f"Vitesse moyenne (temps pris : {fin-debut:.2f}s)",f"{vitesse_moyenne:.1f} m/s")
+    vitesse_moyenne=total['vitesse_moyenne']
+    st.metric("Vitesse moyenne",f"{vitesse_moyenne:.1f} m/s")
 
-    df_af['hour']=df_af['date'].dt.hour
-    debut=time.time()
-    df_af_hour = df_af.groupby('hour')['icao24'].nunique().reset_index()
-    df_af_hour = df_af_hour.rename(columns={'icao24':'amount'})
-    st.subheader("Nombre d'avions par tranche horaire")
-    st.line_chart(data=df_af_hour, x="hour", y="amount")
-    fin=time.time()
-    st.write(f"{fin-debut:.2f} secondes pour générer le graphique")
+    with mesure("Partie 2.avions_par_heure"):
+        df_af_hour = cube_af.agreger(['heure_du_jour'])['nb_avions'].reset_index()
+        df_af_hour = df_af_hour.rename(columns={'heure_du_jour':'hour','nb_avions':'amount'})
+        st.subheader("Nombre d'avions par tranche horaire")
+        st.line_chart(data=df_af_hour, x="hour", y="amount")
 
     st.subheader("Position moyenne des avions Air France")
-    debut=time.time()
-    fig_position_moyenne = tracer_position_moyenne(df_af)
-    st.pyplot(fig_position_moyenne)
-    fin=time.time()
-    st.write(f"{fin-debut:.2f} secondes pour générer l'image")
+    regions_af=cube_af.agreger(['region'])[['latitude_moyenne','longitude_moyenne','nb_positions']]
+    st.image(rendu_png(tracer_position_moyenne, regions_af, total['latitude_moyenne'], total['longitude_moyenne']),
+             use_container_width=True)
     
 
 elif onglet=='Aéronefs':
+    df_ae=load_data_aeronefs()
     st.subheader("Dataframe des aéronefs")
     st.dataframe(df_ae)
 
@@ -83,105 +147,89 @@ elif onglet=='Aéronefs':
     st.write(df_ae['manufacturername'].value_counts().head(1))
 
     st.header("Jointure des 2 Dataframes (Air France et aéronefs)")
-    st.subheader("Une position toutes les 5 minutes (pour moins de lenteur)")
-    st.dataframe(df_merge)
+    st.subheader(f"Trajectoires simplifiées : {len(df_merge_z6)} positions gardées sur {len(df_merge)} (pour moins de lenteur)")
+    st.dataframe(df_merge_z6)
 
 elif onglet=="Tracé d'un vol":
     vols = df_merge['icao24'].unique()
     index_defaut = list(vols).index("39cf0a")
     choix_vol=st.sidebar.selectbox("Choisissez un vol", df_merge['icao24'].unique(),index=index_defaut)
-    df_vol=df_merge[df_merge['icao24']==choix_vol]
+    df_avion=df_merge[df_merge['icao24']==choix_vol]
+    legs=df_avion.groupby('flight_id')['date'].agg(['min','max'])
+    choix_leg=st.sidebar.selectbox(
+        "Choisissez un trajet",
+        legs.index,
+        format_func=lambda f: f"{legs.loc[f,'min']:%H:%M} → {legs.loc[f,'max']:%H:%M}",
+    )
+    couleur=st.sidebar.radio("Couleur du tracé", ["Temps", "Altitude"])
+    profils=st.sidebar.checkbox("Profils d'altitude et de vitesse")
+    df_vol=df_avion[df_avion['flight_id']==choix_leg]
     st.write(f"Nombre de données manquantes pour la latitude :{df_vol['latitude'].isna().mean()*100:.1f}%")
     st.write(f"Nombre de données manquantes pour la longitude : {df_vol['longitude'].isna().mean()*100:.1f}%")
     df_vol=df_vol[(~df_vol['latitude'].isna())&(~df_vol['longitude'].isna())]
+    df_vol=simplifier_pour_zoom(df_vol, 6)
     df_vol=df_vol.reset_index(drop=True)
     st.subheader(f"Dataframe du {choix_vol}")
     st.dataframe(df_vol)
 
+    # Téléchargement de la photo en arrière-plan pendant le tracé de la carte
+    model = df_vol['model'].unique()[0]
+    service_images().demander(model, 400)
+
     a,b=st.columns(2)
     with a:
-        debut=time.time()
-        fig_trajet_avion=plot_trajet_avion(df_vol)
-        st.pyplot(fig_trajet_avion, use_container_width=False)
-        fin=time.time()
-        st.write(f"{fin-debut:.1f} secondes pour charger le tracé")
+        st.image(rendu_png(plot_trajet_avion, df_vol, couleur=couleur.lower(), profils=profils), use_container_width=False)
     with b:
-        debut=time.time()
-        model = df_vol['model'].unique()[0]
         charger_image_unsplash(model, largeur_max=400)
-        fin=time.time()
-        st.write(f"{fin-debut:.1f} secondes pour charger l'image")
     
 elif onglet=="Tracé de tous les vols":
-    st.subheader("Tracé de tous les vols : patientez un tout petit peu")
-    debut=time.time()
-    fig2=plot_tous_les_vols(df_merge)
-    st.pyplot(fig2)
-    fin=time.time()
-    st.write(f"{fin-debut:.1f} secondes pour charger l'image")
+    st.subheader("Tracé de tous les vols")
+    mode=st.sidebar.radio("Affichage", ["Densité", "Points"])
+    # Seules les colonnes tracées entrent dans l'empreinte du rendu
+    if mode=="Densité":
+        # Toutes les positions, agrégées en une grille à la résolution de l'écran
+        st.image(rendu_png(plot_tous_les_vols, df_merge[['longitude','latitude','date']], mode='densite'), use_container_width=True)
+    else:
+        colonnes_trace=['longitude','latitude','icao24','flight_id','date']
+        st.image(rendu_png(plot_tous_les_vols, df_merge_z6[colonnes_trace], mode='points'), use_container_width=True)
 
 
 
 
 else:
     st.header("Utilisation de Streamlit Folium pour cette dernière partie (une vue plus dynamique)")
-    df_ground = df_merge[df_merge["on_ground"] == True]
-    # Pour chaque avion, on garde la première apparition au sol 
-    df_airports = (
-        df_ground.sort_values(["icao24", "time"])
-                .groupby("icao24")
-                .first()[["latitude", "longitude", "date"]]
-                .reset_index()
-    )
-    df_airports=df_airports[~df_airports['latitude'].isna()]
-    df_airports=df_airports.reset_index()
+    # Les aéroports sont les amas de positions au sol (DBSCAN sur grille, rayon de 10 km)
+    df_aeroports=load_aeroports(df_merge)
     st.subheader("Tous les aéroports accueillant des Air France (13 juin 22)")
-    st.write("Il y a des doublons que l'on va supprimer")
-    st.dataframe(df_airports)
-
-    dict_aeroports={f"aeroport{i+1}":(df_airports.loc[i,'latitude'],df_airports.loc[i,'longitude']) for i in range(len(df_airports))}
-   
-    # Il y a certains doublons d'aéroports, on va garder une seule position par aéroport à l'aide de la formule de haversine
-    dict_aero_clean = {}
-
-    for name, (lat, lon) in dict_aeroports.items():
-        already_found = False
-        
-        for keep_name, (keep_lat, keep_lon) in dict_aero_clean.items():
-            if haversine(lat, lon, keep_lat, keep_lon) < 10:  # 10 km est un bon range
-                already_found = True
-                break
-        
-        if not already_found:
-            dict_aero_clean[name] = (lat, lon)
+    st.dataframe(df_aeroports)
+
+    dict_aero_clean={name:(row.latitude,row.longitude) for name,row in df_aeroports.iterrows()}
 
-    
     lat_center = sum([v[0] for v in dict_aero_clean.values()]) / len(dict_aero_clean)
     lon_center = sum([v[1] for v in dict_aero_clean.values()]) / len(dict_aero_clean)
 
     st.subheader("Tous les aéroports accueillant des Air France (13 juin 22)")
-    m = folium.Map(location=[lat_center, lon_center], zoom_start=2)
-
-    for name, (lat, lon) in dict_aero_clean.items():
-        folium.Marker(
-            location=[lat, lon],
-            popup=name,
-            icon=folium.Icon(icon="plane", prefix="fa")
-        ).add_to(m)
-
+    # Tous les aéroports en une seule couche GeoJSON
+    marqueurs_aeroports=df_aeroports.assign(infobulle=df_aeroports.index)
+    m = carte_geojson(collection_geojson(points_geojson(marqueurs_aeroports, proprietes=['infobulle'])),
+                      [lat_center, lon_center], 2)
     st_folium(m, width=800, height=600)
 
-
-
-
-
-    aeroport_cdg="aeroport1"
+    # Aéroport détecté le plus proche des coordonnées de Charles de Gaulle
+    distances_cdg=haversine(COORD_CDG[0], COORD_CDG[1], df_aeroports['latitude'], df_aeroports['longitude'])
+    aeroport_cdg=df_aeroports.index[distances_cdg.argmin()]
     lat_aero, lon_aero = dict_aero_clean[aeroport_cdg]
 
+    evenements=load_evenements(df_merge, df_aeroports)
+    st.subheader("Arrivées, départs et remises des gaz par aéroport")
+    st.dataframe(evenements.groupby(level='aeroport', sort=False)['type'].value_counts().unstack(fill_value=0))
+
     st.subheader("Avions arrivant à l'aéroport Charles de Gaulle")
 
-    m = plot_approches_aeroport(df_merge, lat_aero, lon_aero, aeroport_cdg)
+    # Collection exportée une fois en tuiles GeoJSON ; seules les tuiles de la vue sont relues
+    nom=load_approches(df_merge_z13, 13, evenements, aeroport_cdg, lat_aero, lon_aero)
+    collection=tuiles_geojson().lire(nom, *emprise_rayon(lat_aero, lon_aero, 15))
+    m = carte_geojson(collection, [lat_aero, lon_aero], 13)
     st_folium(m, width=800, height=600)
 
-    
-  
\ No newline at end of file
+panneau_debug()
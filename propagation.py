@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+from distances import RAYON_TERRE_KM
+from instrumentation import mesure
+
+
+# Au-delà de cet âge (secondes), une position n'est plus extrapolée plus loin
+HORIZON_MAX_S = 60
+
+
+def _vecteurs(lat, lon):
+    """Vecteurs unitaires 3D (x, y, z) de positions en degrés."""
+    lat, lon = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)])
+
+
+def destination(lat, lon, cap, distance_m):
+    """Calcule le point atteint en suivant un grand cercle depuis un point de départ.
+
+    Les arguments peuvent être des scalaires ou des tableaux numpy (broadcasting numpy).
+
+    Arguments:
+    lat, lon -- position de départ en degrés
+    cap -- cap initial en degrés (0 = nord, sens horaire)
+    distance_m -- distance parcourue en mètres
+
+    Retourne:
+    tuple (latitude, longitude) en degrés, longitude dans [-180, 180[
+    """
+    lat1 = np.radians(np.asarray(lat, dtype=np.float64))
+    lon1 = np.radians(np.asarray(lon, dtype=np.float64))
+    cap = np.radians(np.asarray(cap, dtype=np.float64))
+    delta = np.asarray(distance_m, dtype=np.float64) / (RAYON_TERRE_KM * 1000)
+
+    sin_lat2 = np.sin(lat1) * np.cos(delta) + np.cos(lat1) * np.sin(delta) * np.cos(cap)
+    lat2 = np.arcsin(np.clip(sin_lat2, -1, 1))
+    lon2 = lon1 + np.arctan2(np.sin(cap) * np.sin(delta) * np.cos(lat1), np.cos(delta) - np.sin(lat1) * sin_lat2)
+    return np.degrees(lat2), (np.degrees(lon2) + 180) % 360 - 180
+
+
+def interpoler_grand_cercle(lat0, lon0, lat1, lon1, fraction):
+    """Interpole sur le grand cercle entre deux points (slerp).
+
+    Arguments:
+    lat0, lon0 -- premiers points en degrés
+    lat1, lon1 -- seconds points en degrés
+    fraction -- position entre les deux points (0 = premier point, 1 = second)
+
+    Retourne:
+    tuple (latitude, longitude) en degrés
+    """
+    v0 = _vecteurs(np.asarray(lat0, dtype=np.float64), np.asarray(lon0, dtype=np.float64))
+    v1 = _vecteurs(np.asarray(lat1, dtype=np.float64), np.asarray(lon1, dtype=np.float64))
+    fraction = np.asarray(fraction, dtype=np.float64)
+    omega = np.arccos(np.clip((v0 * v1).sum(axis=0), -1, 1))
+    sin_omega = np.sin(omega)
+
+    # Points confondus ou très proches : l'interpolation linéaire des vecteurs suffit
+    proches = sin_omega < 1e-12
+    sin_omega = np.where(proches, 1.0, sin_omega)
+    a = np.where(proches, 1 - fraction, np.sin((1 - fraction) * omega) / sin_omega)
+    b = np.where(proches, fraction, np.sin(fraction * omega) / sin_omega)
+    v = a * v0 + b * v1
+    return np.degrees(np.arctan2(v[2], np.hypot(v[0], v[1]))), np.degrees(np.arctan2(v[1], v[0]))
+
+
+@mesure('propagation.propager')
+def propager(df, temps_cible=None, temps='time_position', vitesse='velocity', cap='true_track',
+             vario='vertical_rate', altitudes=('baro_altitude', 'geo_altitude'), horizon_max=HORIZON_MAX_S):
+    """Projette tous les avions à un instant commun par navigation à l'estime.
+
+    Chaque avion suit le grand cercle de son cap à vitesse constante, et son altitude
+    varie selon le taux de montée. Les vitesses ou caps manquants laissent la position
+    inchangée, et l'extrapolation est limitée à horizon_max secondes. La colonne temps
+    reçoit l'instant réellement atteint par chaque position : temps_cible, sauf pour les
+    extrapolations écourtées, les positions non datées (NaN) et celles non propagées.
+
+    Arguments:
+    df -- DataFrame avec colonnes 'latitude', 'longitude', temps, vitesse, cap (et vario)
+    temps_cible -- timestamp unix visé (défaut: le plus récent de la colonne temps)
+    temps -- colonne de l'instant de chaque position (défaut: 'time_position')
+    vitesse -- colonne de vitesse sol en m/s
+    cap -- colonne de cap en degrés
+    vario -- colonne de taux de montée en m/s (None pour ne pas modifier les altitudes)
+    altitudes -- colonnes d'altitude à propager (celles absentes de df sont ignorées)
+    horizon_max -- durée maximale d'extrapolation en secondes (None pour ne pas limiter)
+
+    Retourne:
+    copie de df avec positions et altitudes propagées, et la colonne temps mise à l'instant atteint
+    """
+    t = df[temps].to_numpy(dtype=np.float64)
+    if temps_cible is None:
+        temps_cible = np.nanmax(t) if len(t) else 0
+    dt = np.nan_to_num(temps_cible - t)
+    if horizon_max is not None:
+        dt = np.clip(dt, -horizon_max, horizon_max)
+
+    v = df[vitesse].to_numpy(dtype=np.float64)
+    c = df[cap].to_numpy(dtype=np.float64)
+    # Sans vitesse ou sans cap, la position reste celle de l'instant d'origine
+    propagee = ~(np.isnan(v) | np.isnan(c))
+    v, c = np.nan_to_num(v), np.nan_to_num(c)
+    lat, lon = destination(df['latitude'].to_numpy(dtype=np.float64),
+                           df['longitude'].to_numpy(dtype=np.float64), c, v * dt)
+
+    resultat = df.copy()
+    resultat['latitude'] = lat.astype(df['latitude'].dtype)
+    resultat['longitude'] = lon.astype(df['longitude'].dtype)
+    if vario is not None:
+        # Altitudes des positions non propagées laissées à l'instant d'origine, comme la colonne temps
+        montee = np.where(propagee, np.nan_to_num(df[vario].to_numpy(dtype=np.float64)) * dt, 0)
+        for col in (a for a in altitudes if a in df.columns):
+            resultat[col] = (df[col].to_numpy(dtype=np.float64) + montee).astype(df[col].dtype)
+    atteint = np.where(propagee, t + dt, t)
+    entier = np.issubdtype(df[temps].dtype, np.integer) and not np.isnan(atteint).any()
+    resultat[temps] = np.round(atteint).astype(df[temps].dtype) if entier else atteint
+    return resultat
+
+
+def reechantillonner(df, pas=10, groupe='flight_id', temps='time', colonnes=(), ecart_max=None):
+    """Rééchantillonne des trajectoires sur une grille temporelle régulière.
+
+    Les positions sont interpolées sur le grand cercle entre les deux positions qui
+    encadrent chaque instant de la grille ; les colonnes numériques supplémentaires
+    (altitude, vitesse...) sont interpolées linéairement. Tous les vols sont traités
+    ensemble, sans boucle Python.
+
+    Arguments:
+    df -- DataFrame avec colonnes 'latitude', 'longitude', groupe et temps
+    pas -- pas de la grille en secondes (les instants sont des multiples de pas)
+    groupe -- colonne identifiant la trajectoire (défaut: 'flight_id')
+    temps -- colonne temps en secondes (défaut: 'time')
+    colonnes -- colonnes numériques à interpoler linéairement
+    ecart_max -- les instants situés dans un trou de plus de ecart_max secondes sont omis
+
+    Retourne:
+    DataFrame (groupe, temps, 'latitude', 'longitude', colonnes...) trié par (groupe, temps)
+    """
+    colonnes = list(colonnes)
+    trie = df.dropna(subset=['latitude', 'longitude']).sort_values([groupe, temps], kind='stable')
+    vide = pd.DataFrame({c: trie[c].iloc[:0] for c in [groupe, temps, 'latitude', 'longitude'] + colonnes})
+    if trie.empty:
+        return vide
+
+    t = trie[temps].to_numpy(dtype=np.float64)
+    codes, groupes = pd.factorize(trie[groupe], sort=True)
+    debut = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+    fin = np.r_[debut[1:], len(t)] - 1
+
+    # Instants de la grille de chaque vol : multiples de pas entre première et dernière position
+    premier = np.ceil(t[debut] / pas) * pas
+    nb = np.maximum(np.floor((t[fin] - premier) / pas).astype(np.int64) + 1, 0)
+    vol = np.repeat(np.arange(len(debut)), nb)
+    if not len(vol):
+        return vide
+    rang = np.arange(len(vol)) - np.repeat(np.cumsum(nb) - nb, nb)
+    grille = premier[vol] + rang * pas
+
+    # Recherche dichotomique sur une clé (vol, temps) croissante sur tout le tableau
+    t0 = t.min()
+    largeur = t.max() - t0 + 2 * pas
+    cles = codes * largeur + (t - t0)
+    j = np.searchsorted(cles, vol * largeur + (grille - t0), side='right') - 1
+    j = np.clip(j, debut[vol], np.maximum(fin[vol] - 1, debut[vol]))
+    k = np.minimum(j + 1, fin[vol])
+
+    duree = t[k] - t[j]
+    fraction = np.clip(np.divide(grille - t[j], duree, out=np.zeros_like(grille), where=duree > 0), 0, 1)
+    lat = trie['latitude'].to_numpy(dtype=np.float64)
+    lon = trie['longitude'].to_numpy(dtype=np.float64)
+    lat_i, lon_i = interpoler_grand_cercle(lat[j], lon[j], lat[k], lon[k], fraction)
+
+    if np.issubdtype(trie[temps].dtype, np.integer) and float(pas).is_integer():
+        grille = grille.astype(trie[temps].dtype)
+    resultat = pd.DataFrame({groupe: groupes[vol], temps: grille, 'latitude': lat_i, 'longitude': lon_i})
+    for col in colonnes:
+        valeurs = trie[col].to_numpy(dtype=np.float64)
+        resultat[col] = valeurs[j] + fraction * (valeurs[k] - valeurs[j])
+    if ecart_max is not None:
+        resultat = resultat[duree <= ecart_max].reset_index(drop=True)
+    return resultat
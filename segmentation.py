@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from instrumentation import mesure
+
+
+# Au-delà de cet écart entre deux positions d'un même avion, on considère un nouveau vol (secondes)
+ECART_MAX_S = 30 * 60
+
+
+@mesure('segmentation.segmenter_vols')
+def segmenter_vols(df, ecart_max=ECART_MAX_S, groupe='icao24', temps='time', sol='on_ground'):
+    """Découpe les trajectoires de chaque avion en vols (legs) et attribue un 'flight_id'.
+
+    Tout se fait en une passe sur le DataFrame trié par (avion, temps) :
+    - un nouveau vol commence à chaque changement d'avion ou après un trou de plus de ecart_max ;
+    - une période au sol située entre un atterrissage et un décollage est coupée au plus grand
+      trou entre deux positions au sol (stationnement) : le roulage après l'atterrissage reste
+      dans le vol d'arrivée, le roulage avant le décollage passe dans le vol suivant.
+
+    Arguments:
+    df -- DataFrame avec colonnes groupe, temps et sol
+    ecart_max -- écart maximal en secondes entre deux positions d'un même vol
+    groupe -- colonne identifiant l'avion (défaut: 'icao24')
+    temps -- colonne temps en secondes (défaut: 'time')
+    sol -- colonne booléenne au sol / en vol (défaut: 'on_ground')
+
+    Retourne:
+    copie de df triée par (groupe, temps) avec une colonne 'flight_id' (entier, 0..nb_vols-1)
+    """
+    trie = df.sort_values([groupe, temps], kind='stable')
+    n = len(trie)
+    if n == 0:
+        return trie.assign(flight_id=np.empty(0, dtype=np.int64))
+
+    avions = trie[groupe].to_numpy()
+    t = trie[temps].to_numpy(dtype=np.float64)
+    au_sol = trie[sol].fillna(False).to_numpy(dtype=bool)
+
+    meme_avion = np.r_[False, avions[1:] == avions[:-1]]
+    ecart = np.r_[np.inf, np.diff(t)]
+    debut = ~meme_avion | (ecart > ecart_max)
+
+    # Périodes au sol : suites de positions au sol consécutives d'un même avion (sans trou)
+    debut_periode = au_sol & ~(np.r_[False, au_sol[:-1]] & ~debut)
+    periode = np.cumsum(debut_periode) - 1
+    fin_periode = au_sol & np.r_[debut[1:] | ~au_sol[1:], True]
+
+    # Une période est une escale si elle est précédée d'un vol et suivie d'un décollage du même vol
+    atterrissage = debut_periode & ~debut & ~np.r_[False, au_sol[:-1]]
+    decollage = fin_periode & np.r_[~debut[1:] & ~au_sol[1:], False]
+    escales = np.intersect1d(periode[atterrissage], periode[decollage])
+
+    if len(escales):
+        # Plus grand trou à l'intérieur de chaque escale (hors première position de la période)
+        dans_escale = au_sol & ~debut_periode & np.isin(periode, escales)
+        candidats = pd.Series(ecart[dans_escale], index=np.flatnonzero(dans_escale))
+        coupures = candidats.groupby(periode[dans_escale]).idxmax().to_numpy()
+        debut[coupures] = True
+
+        # Escales d'une seule position : le nouveau vol commence au décollage
+        sans_coupure = np.setdiff1d(escales, periode[coupures])
+        indices_decollage = np.flatnonzero(decollage)
+        debut[indices_decollage[np.isin(periode[indices_decollage], sans_coupure)] + 1] = True
+
+    return trie.assign(flight_id=np.cumsum(debut) - 1)
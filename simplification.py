@@ -0,0 +1,132 @@
+import numpy as np
+import pandas as pd
+
+from distances import RAYON_TERRE_KM
+from instrumentation import mesure
+
+
+# Résolution au sol d'un pixel de tuile Web Mercator au zoom 0, à l'équateur (mètres)
+METRES_PAR_PIXEL_ZOOM0 = 2 * np.pi * RAYON_TERRE_KM * 1000 / 256
+
+
+def _plages(debuts, fins):
+    """Concatène les plages [debut, fin[ en un seul tableau d'indices (sans boucle Python)."""
+    longueurs = fins - debuts
+    decalages = np.repeat(debuts - np.cumsum(longueurs) + longueurs, longueurs)
+    return np.arange(longueurs.sum()) + decalages
+
+
+def _distance_segment_m(lat, lon, lat_a, lon_a, lat_b, lon_b):
+    """Distance en mètres de points à des segments [A, B] (projection équirectangulaire locale)."""
+    k = np.radians(1) * RAYON_TERRE_KM * 1000
+    cos_lat = np.cos(np.radians((lat_a + lat_b) / 2))
+    bx = ((lon_b - lon_a + 180) % 360 - 180) * cos_lat * k
+    by = (lat_b - lat_a) * k
+    px = ((lon - lon_a + 180) % 360 - 180) * cos_lat * k
+    py = (lat - lat_a) * k
+    longueur2 = bx**2 + by**2
+    t = np.clip(np.divide(px * bx + py * by, longueur2, out=np.zeros_like(px), where=longueur2 > 0), 0, 1)
+    return np.hypot(px - t * bx, py - t * by)
+
+
+@mesure('simplification.importance_points')
+def importance_points(df, groupe='flight_id', tolerance_min=5.0):
+    """Calcule pour chaque point la tolérance Ramer-Douglas-Peucker jusqu'à laquelle il est gardé.
+
+    Le RDP est exécuté une seule fois pour toutes les trajectoires et tous les niveaux de détail :
+    à chaque itération, tous les segments encore ouverts de tous les vols sont traités ensemble.
+    Simplifier à une tolérance t revient ensuite à garder les points d'importance >= t
+    (résultat identique à un RDP lancé avec la tolérance t). Les extrémités de chaque vol
+    ont une importance infinie.
+
+    Arguments:
+    df -- DataFrame trié chronologiquement par groupe, avec colonnes 'latitude', 'longitude' et groupe
+    groupe -- colonne identifiant la trajectoire (défaut: 'flight_id')
+    tolerance_min -- en dessous de cette tolérance (mètres), les segments ne sont plus subdivisés
+
+    Retourne:
+    Series des importances en mètres, alignée sur l'index de df (0 pour les positions manquantes)
+    """
+    lat_tous = df['latitude'].to_numpy(dtype=np.float64)
+    lon_tous = df['longitude'].to_numpy(dtype=np.float64)
+    valides = np.flatnonzero(~(np.isnan(lat_tous) | np.isnan(lon_tous)))
+    importance = np.zeros(len(df))
+    if len(valides) == 0:
+        return pd.Series(importance, index=df.index)
+
+    lat = lat_tous[valides]
+    lon = lon_tous[valides]
+    groupes = df[groupe].to_numpy()[valides]
+    debut_groupe = np.flatnonzero(np.r_[True, groupes[1:] != groupes[:-1]])
+    fin_groupe = np.r_[debut_groupe[1:], len(valides)] - 1
+
+    imp = np.zeros(len(valides))
+    imp[debut_groupe] = np.inf
+    imp[fin_groupe] = np.inf
+
+    # Segments ouverts (a, b) et importance héritée du segment parent
+    a, b = debut_groupe, fin_groupe
+    parent = np.full(len(a), np.inf)
+    while len(a):
+        ouverts = b - a > 1
+        a, b, parent = a[ouverts], b[ouverts], parent[ouverts]
+        if not len(a):
+            break
+
+        points = _plages(a + 1, b)
+        segment = np.repeat(np.arange(len(a)), b - a - 1)
+        d = _distance_segment_m(lat[points], lon[points], lat[a][segment], lon[a][segment],
+                                lat[b][segment], lon[b][segment])
+
+        # Point le plus éloigné de chaque segment (le premier en cas d'égalité)
+        d_max = np.maximum.reduceat(d, np.r_[0, np.cumsum(b - a - 1)[:-1]])
+        candidats = np.flatnonzero(d == d_max[segment])
+        _, premier = np.unique(segment[candidats], return_index=True)
+        coupure = points[candidats[premier]]
+
+        # Un point ne peut pas être plus important que le segment qui l'a fait apparaître
+        imp_coupure = np.minimum(d_max, parent)
+        imp[coupure] = imp_coupure
+
+        a_garder = d_max >= tolerance_min
+        a, b, parent = (np.r_[a[a_garder], coupure[a_garder]],
+                        np.r_[coupure[a_garder], b[a_garder]],
+                        np.r_[imp_coupure[a_garder], imp_coupure[a_garder]])
+
+    importance[valides] = imp
+    return pd.Series(importance, index=df.index)
+
+
+def tolerance_pour_zoom(zoom, pixels=1.0):
+    """Tolérance en mètres correspondant à un nombre de pixels au niveau de zoom des tuiles."""
+    return pixels * METRES_PAR_PIXEL_ZOOM0 / 2 ** zoom
+
+
+def simplifier(df, tolerance_m, importance='importance'):
+    """Garde les points d'importance suffisante pour une tolérance donnée.
+
+    Arguments:
+    df -- DataFrame avec une colonne d'importance (voir importance_points)
+    tolerance_m -- tolérance en mètres
+    importance -- nom de la colonne d'importance
+
+    Retourne:
+    DataFrame filtré
+    """
+    return df[df[importance] >= tolerance_m]
+
+
+@mesure('simplification.simplifier_pour_zoom')
+def simplifier_pour_zoom(df, zoom, pixels=1.0, importance='importance'):
+    """Garde les points visibles au niveau de zoom des tuiles (écart maximal d'environ 1 pixel).
+
+    Arguments:
+    df -- DataFrame avec une colonne d'importance (voir importance_points)
+    zoom -- niveau de zoom de la carte (6 pour les cartes cartopy, 13 pour folium...)
+    pixels -- écart maximal toléré en pixels
+    importance -- nom de la colonne d'importance
+
+    Retourne:
+    DataFrame filtré
+    """
+    return simplifier(df, tolerance_pour_zoom(zoom, pixels), importance)
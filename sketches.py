@@ -0,0 +1,156 @@
+import numpy as np
+import pandas as pd
+
+
+# 2**12 registres : erreur relative d'environ 1.6 %, 4 Ko par compteur
+PRECISION_HLL = 12
+
+
+def _longueur_bits(x):
+    """Nombre de bits significatifs de chaque entier non signé 64 bits (0 pour 0), calcul exact."""
+    x = np.asarray(x, dtype=np.uint64)
+    haut = (x >> np.uint64(32)).astype(np.float64)
+    bas = (x & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(haut > 0, 32 + np.frexp(haut)[1], np.frexp(bas)[1])
+
+
+def hacher(valeurs):
+    """Empreintes 64 bits de valeurs quelconques (chaînes, entiers...), stables d'une exécution à l'autre."""
+    if isinstance(valeurs, (pd.Series, pd.Index)):
+        return pd.util.hash_pandas_object(valeurs, index=False).to_numpy()
+    return pd.util.hash_array(np.asarray(valeurs, dtype=object))
+
+
+def registres_hll(valeurs, precision=PRECISION_HLL):
+    """Calcule le registre et le rang HyperLogLog de chaque valeur.
+
+    Retourne:
+    tuple (numéros de registre, rangs) : le registre i d'un compteur vaut le rang maximal
+    des valeurs qui y tombent
+    """
+    h = hacher(valeurs)
+    decalage = np.uint64(64 - precision)
+    registre = (h >> decalage).astype(np.int64)
+    reste = h & np.uint64((1 << (64 - precision)) - 1)
+    rang = (64 - precision) - _longueur_bits(reste) + 1
+    return registre, rang.astype(np.uint8)
+
+
+def estimer_hll(registres):
+    """Estime le nombre de valeurs distinctes à partir de registres HyperLogLog.
+
+    Arguments:
+    registres -- tableau (m,) ou (n, m) de registres (une ligne par compteur)
+
+    Retourne:
+    estimation (float, ou tableau (n,) pour plusieurs compteurs)
+    """
+    registres = np.asarray(registres, dtype=np.float64)
+    m = registres.shape[-1]
+    alpha = 0.7213 / (1 + 1.079 / m)
+    brute = alpha * m * m / np.sum(2.0 ** -registres, axis=-1)
+    # Petites cardinalités : comptage linéaire sur les registres vides
+    vides = np.sum(registres == 0, axis=-1)
+    lineaire = m * np.log(m / np.maximum(vides, 1))
+    return np.where((brute <= 2.5 * m) & (vides > 0), lineaire, brute)
+
+
+class HyperLogLog:
+    """Compteur approximatif de valeurs distinctes, fusionnable (maximum des registres).
+
+    Deux compteurs construits sur des partitions différentes (heures, jours, régions...)
+    se fusionnent sans perte : le résultat est celui qu'aurait donné l'union des données.
+    """
+
+    def __init__(self, precision=PRECISION_HLL, registres=None):
+        self.precision = precision
+        self.registres = np.zeros(2 ** precision, dtype=np.uint8) if registres is None else registres
+
+    def ajouter(self, valeurs):
+        """Ajoute des valeurs (tableau, Series ou liste) au compteur."""
+        registre, rang = registres_hll(valeurs, self.precision)
+        np.maximum.at(self.registres, registre, rang)
+        return self
+
+    def fusionner(self, autre):
+        """Retourne le compteur de l'union des deux ensembles."""
+        if autre.precision != self.precision:
+            raise ValueError("Les deux compteurs doivent avoir la même précision")
+        return HyperLogLog(self.precision, np.maximum(self.registres, autre.registres))
+
+    def estimation(self):
+        return float(estimer_hll(self.registres))
+
+    def __len__(self):
+        return int(round(self.estimation()))
+
+    def to_bytes(self):
+        return self.registres.tobytes()
+
+    @classmethod
+    def from_bytes(cls, donnees):
+        registres = np.frombuffer(donnees, dtype=np.uint8).copy()
+        return cls(int(np.log2(len(registres))), registres)
+
+
+# Compression par défaut des t-digests : au plus ~compression centroïdes, erreur de l'ordre de 1/compression
+COMPRESSION_TDIGEST = 200
+
+
+class TDigest:
+    """Résumé fusionnable d'une distribution, pour estimer ses quantiles en mémoire bornée.
+
+    Les valeurs sont regroupées en centroïdes (moyenne, poids) d'autant plus petits qu'ils
+    sont proches des extrémités (fonction d'échelle arcsin) : les quantiles extrêmes
+    restent précis. Chaque ajout trie et recompresse tout d'un bloc, sans boucle Python.
+    """
+
+    def __init__(self, compression=COMPRESSION_TDIGEST):
+        self.compression = compression
+        self.moyennes = np.empty(0)
+        self.poids = np.empty(0)
+        self.min = np.inf
+        self.max = -np.inf
+
+    @property
+    def n(self):
+        return float(self.poids.sum())
+
+    def _compresser(self, moyennes, poids):
+        ordre = np.argsort(moyennes, kind='stable')
+        moyennes, poids = moyennes[ordre], poids[ordre]
+        total = poids.sum()
+        # Quantile du centre de chaque élément, puis numéro de centroïde sur l'échelle k
+        q = (np.cumsum(poids) - poids / 2) / total
+        k = self.compression / (2 * np.pi) * (np.arcsin(2 * q - 1) + np.pi / 2)
+        centroide = np.floor(k).astype(np.int64)
+        _, centroide = np.unique(centroide, return_inverse=True)
+        self.poids = np.bincount(centroide, weights=poids)
+        self.moyennes = np.bincount(centroide, weights=moyennes * poids) / self.poids
+
+    def ajouter(self, valeurs):
+        """Ajoute des valeurs (les NaN sont ignorés)."""
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        valeurs = valeurs[~np.isnan(valeurs)]
+        if len(valeurs):
+            self.min = min(self.min, valeurs.min())
+            self.max = max(self.max, valeurs.max())
+            self._compresser(np.r_[self.moyennes, valeurs], np.r_[self.poids, np.ones(len(valeurs))])
+        return self
+
+    def fusionner(self, autre):
+        """Retourne le t-digest de l'union des deux distributions."""
+        resultat = TDigest(self.compression)
+        resultat.min, resultat.max = min(self.min, autre.min), max(self.max, autre.max)
+        if self.n + autre.n > 0:
+            resultat._compresser(np.r_[self.moyennes, autre.moyennes], np.r_[self.poids, autre.poids])
+        return resultat
+
+    def quantile(self, q):
+        """Estime le(s) quantile(s) q (entre 0 et 1) ; NaN si le résumé est vide."""
+        q = np.asarray(q, dtype=np.float64)
+        if not len(self.poids):
+            return np.full(q.shape, np.nan)[()]
+        total = self.poids.sum()
+        positions = np.r_[0, np.cumsum(self.poids) - self.poids / 2, total]
+        return np.interp(q * total, positions, np.r_[self.min, self.moyennes, self.max])[()]
@@ -0,0 +1,150 @@
+import os
+import pickle
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from sketches import HyperLogLog, TDigest
+
+
+# Statistiques mises à jour par la collecte (python collecte.py --statistiques)
+FICHIER_STATISTIQUES = Path("data/statistiques.pkl")
+
+# Champs suivis en distribution : (borne basse, borne haute, nombre de classes) des histogrammes
+DISTRIBUTIONS = {
+    'velocity': (0, 400, 80),
+    'vertical_rate': (-40, 40, 80),
+    'baro_altitude': (-500, 15000, 62),
+}
+
+
+class HistogrammeFixe:
+    """Histogramme à classes fixes, mis à jour par ajouts successifs et fusionnable.
+
+    Les valeurs hors bornes sont comptées à part (sous et au-dessus), les NaN ignorés.
+    """
+
+    def __init__(self, debut, fin, nb_classes):
+        self.bords = np.linspace(debut, fin, nb_classes + 1)
+        self.effectifs = np.zeros(nb_classes + 2, dtype=np.int64)
+
+    def ajouter(self, valeurs):
+        valeurs = np.asarray(valeurs, dtype=np.float64)
+        valeurs = valeurs[~np.isnan(valeurs)]
+        nb_classes = len(self.bords) - 1
+        pas = (self.bords[-1] - self.bords[0]) / nb_classes
+        classes = np.clip(np.floor((valeurs - self.bords[0]) / pas) + 1, 0, nb_classes + 1).astype(np.int64)
+        self.effectifs += np.bincount(classes, minlength=nb_classes + 2)
+        return self
+
+    def fusionner(self, autre):
+        resultat = HistogrammeFixe(self.bords[0], self.bords[-1], len(self.bords) - 1)
+        resultat.effectifs = self.effectifs + autre.effectifs
+        return resultat
+
+    def to_dataframe(self):
+        """Classes de l'histogramme : 'debut', 'fin', 'centre', 'effectif' (hors valeurs hors bornes)."""
+        return pd.DataFrame({
+            'debut': self.bords[:-1],
+            'fin': self.bords[1:],
+            'centre': (self.bords[:-1] + self.bords[1:]) / 2,
+            'effectif': self.effectifs[1:-1],
+        })
+
+
+class StatistiquesFlux:
+    """Statistiques des instantanés d'états, mises à jour incrémentalement à leur arrivée.
+
+    La mémoire reste bornée quel que soit l'historique : compteurs, HyperLogLog des avions
+    et des pays d'origine, sommes pour les moyennes, t-digests (quantiles) et histogrammes
+    à classes fixes des champs de DISTRIBUTIONS. Deux objets se fusionnent, par exemple
+    pour réunir des collectes faites séparément.
+    """
+
+    def __init__(self, distributions=DISTRIBUTIONS):
+        self.nb_instantanes = 0
+        self.nb_etats = 0
+        self.nb_au_sol = 0
+        self.avions = HyperLogLog()
+        self.avions_au_sol_transpondeur = HyperLogLog()
+        self.pays = HyperLogLog()
+        self.sommes = {champ: 0.0 for champ in distributions}
+        self.comptes = {champ: 0 for champ in distributions}
+        self.digests = {champ: TDigest() for champ in distributions}
+        self.histogrammes = {champ: HistogrammeFixe(*bornes) for champ, bornes in distributions.items()}
+
+    def ajouter(self, df):
+        """Met à jour les statistiques avec un instantané (DataFrame typé des états)."""
+        au_sol = df['on_ground'].fillna(False).to_numpy(dtype=bool)
+        self.nb_instantanes += 1
+        self.nb_etats += len(df)
+        self.nb_au_sol += int(au_sol.sum())
+        self.avions.ajouter(df['icao24'])
+        # Avions distincts : un avion au sol sur plusieurs instantanés n'est compté qu'une fois
+        self.avions_au_sol_transpondeur.ajouter(df['icao24'][au_sol & df['squawk'].notna().to_numpy()])
+        self.pays.ajouter(df['origin_country'].dropna())
+        for champ in self.sommes:
+            valeurs = df[champ].to_numpy(dtype=np.float64)
+            connues = ~np.isnan(valeurs)
+            self.sommes[champ] += float(valeurs[connues].sum())
+            self.comptes[champ] += int(connues.sum())
+            self.digests[champ].ajouter(valeurs)
+            self.histogrammes[champ].ajouter(valeurs)
+        return self
+
+    def fusionner(self, autre):
+        """Retourne les statistiques des deux ensembles d'instantanés réunis."""
+        resultat = StatistiquesFlux({})
+        for attribut in ['nb_instantanes', 'nb_etats', 'nb_au_sol']:
+            setattr(resultat, attribut, getattr(self, attribut) + getattr(autre, attribut))
+        resultat.avions = self.avions.fusionner(autre.avions)
+        resultat.avions_au_sol_transpondeur = self.avions_au_sol_transpondeur.fusionner(autre.avions_au_sol_transpondeur)
+        resultat.pays = self.pays.fusionner(autre.pays)
+        resultat.sommes = {c: self.sommes[c] + autre.sommes[c] for c in self.sommes}
+        resultat.comptes = {c: self.comptes[c] + autre.comptes[c] for c in self.comptes}
+        resultat.digests = {c: self.digests[c].fusionner(autre.digests[c]) for c in self.digests}
+        resultat.histogrammes = {c: self.histogrammes[c].fusionner(autre.histogrammes[c]) for c in self.histogrammes}
+        return resultat
+
+    @property
+    def nb_avions(self):
+        """Nombre (estimé) d'avions distincts."""
+        return len(self.avions)
+
+    @property
+    def nb_au_sol_transpondeur(self):
+        """Nombre (estimé) d'avions distincts vus au sol avec le transpondeur allumé."""
+        return len(self.avions_au_sol_transpondeur)
+
+    @property
+    def nb_pays(self):
+        """Nombre (estimé) de pays d'origine distincts."""
+        return len(self.pays)
+
+    @property
+    def proportion_au_sol(self):
+        return self.nb_au_sol / self.nb_etats if self.nb_etats else np.nan
+
+    def moyenne(self, champ):
+        return self.sommes[champ] / self.comptes[champ] if self.comptes[champ] else np.nan
+
+    def quantile(self, champ, q):
+        return self.digests[champ].quantile(q)
+
+    def histogramme(self, champ):
+        """DataFrame des classes de l'histogramme d'un champ (voir HistogrammeFixe.to_dataframe)."""
+        return self.histogrammes[champ].to_dataframe()
+
+    def sauvegarder(self, chemin):
+        # Écriture atomique : la page relit le fichier pendant que la collecte le met à jour
+        chemin = Path(chemin)
+        temporaire = chemin.with_name(f".{chemin.name}.tmp")
+        with open(temporaire, 'wb') as handle:
+            pickle.dump(self, handle)
+        os.replace(temporaire, chemin)
+
+    @staticmethod
+    def charger(chemin):
+        with open(chemin, 'rb') as handle:
+            return pickle.load(handle)
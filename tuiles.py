@@ -0,0 +1,157 @@
+import argparse
+import math
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache
+from io import BytesIO
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+import cartopy.io.img_tiles as cimgt
+from PIL import Image
+
+from cache_disque import DOSSIER_CACHE, CacheDisque
+
+
+# Taille maximale du cache de tuiles (octets)
+TAILLE_MAX_TUILES = int(os.getenv("TUILES_TAILLE_MAX", 1024 * 2**20))
+
+# Après une erreur réseau, délai avant de retenter un téléchargement (secondes)
+ATTENTE_RESEAU_S = float(os.getenv("TUILES_ATTENTE_RESEAU", 60))
+
+
+class GoogleTilesCache(cimgt.GoogleTiles):
+    """Tuiles Google lues d'abord dans un cache disque partagé, téléchargées sinon.
+
+    En mode hors ligne, seules les tuiles déjà en cache sont utilisées ; les tuiles
+    manquantes sont remplacées par une tuile grise, comme le fait cartopy en cas d'erreur.
+    Une erreur réseau fait passer l'instance hors ligne pendant attente_reseau secondes,
+    après quoi le téléchargement est retenté ; seul hors_ligne=True est permanent.
+    """
+
+    def __init__(self, desired_tile_form="RGB", style="street", cache_disque=None, hors_ligne=False,
+                 attente_reseau=ATTENTE_RESEAU_S):
+        super().__init__(desired_tile_form=desired_tile_form, style=style)
+        self.cache_disque = cache_disque or CacheDisque(DOSSIER_CACHE / "tuiles", TAILLE_MAX_TUILES)
+        self.force_hors_ligne = hors_ligne
+        self.attente_reseau = attente_reseau
+        self.hors_ligne_jusqua = 0.0
+
+    @property
+    def hors_ligne(self):
+        """Vrai en mode hors ligne forcé ou pendant l'attente qui suit une erreur réseau."""
+        return self.force_hors_ligne or time.time() < self.hors_ligne_jusqua
+
+    def cle(self, tile):
+        """Clé de cache d'une tuile (x, y, z)."""
+        x, y, z = tile
+        return f"{self.style}/{z}/{x}/{y}.png"
+
+    def _telecharger(self, tile):
+        """Télécharge une tuile, retourne ses octets ou None en cas d'échec."""
+        try:
+            request = Request(self._image_url(tile), headers={"User-Agent": self.user_agent})
+            with urlopen(request, timeout=10) as fh:
+                return fh.read()
+        except HTTPError as err:
+            print(err)
+        except (URLError, TimeoutError) as err:
+            if not self.hors_ligne:
+                print(f"Réseau indisponible ({err}), tuiles hors ligne pendant {self.attente_reseau:.0f} s")
+            self.hors_ligne_jusqua = time.time() + self.attente_reseau
+        return None
+
+    def get_image(self, tile):
+        cle = self.cle(tile)
+        donnees = self.cache_disque.lire(cle)
+        if donnees is None and not self.hors_ligne:
+            donnees = self._telecharger(tile)
+            if donnees is not None:
+                self.cache_disque.ecrire(cle, donnees)
+
+        if donnees is None:
+            img = Image.new("RGB", (256, 256), (250, 250, 250))
+        else:
+            img = Image.open(BytesIO(donnees))
+        if self.desired_tile_form:
+            img = img.convert(self.desired_tile_form)
+        return img, self.tileextent(tile), 'lower'
+
+
+@cache
+def tuiles_google(hors_ligne=None):
+    """Retourne la source de tuiles partagée par toutes les fonctions de tracé.
+
+    Arguments:
+    hors_ligne -- forcer (True) ou interdire (False) le mode hors ligne ; par défaut
+                  la variable d'environnement TUILES_HORS_LIGNE=1 l'active
+
+    Retourne:
+    instance de GoogleTilesCache
+    """
+    if hors_ligne is None:
+        hors_ligne = os.getenv("TUILES_HORS_LIGNE") == "1"
+    return GoogleTilesCache(hors_ligne=hors_ligne)
+
+
+def tuiles_bbox(lon_min, lon_max, lat_min, lat_max, zoom):
+    """Liste les tuiles (x, y, z) couvrant une emprise géographique à un niveau de zoom.
+
+    Arguments:
+    lon_min, lon_max, lat_min, lat_max -- emprise en degrés
+    zoom -- niveau de zoom
+
+    Retourne:
+    liste de tuples (x, y, z)
+    """
+    n = 2 ** zoom
+
+    def x_tuile(lon):
+        return min(n - 1, max(0, int((lon + 180) / 360 * n)))
+
+    def y_tuile(lat):
+        lat = max(-85.0511, min(85.0511, lat))
+        return min(n - 1, max(0, int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)))
+
+    return [(x, y, zoom)
+            for x in range(x_tuile(lon_min), x_tuile(lon_max) + 1)
+            for y in range(y_tuile(lat_max), y_tuile(lat_min) + 1)]
+
+
+def prechauffer(lon_min, lon_max, lat_min, lat_max, zoom_min, zoom_max, source=None, nb_threads=8):
+    """Télécharge dans le cache toutes les tuiles d'une emprise pour une plage de zooms.
+
+    Arguments:
+    lon_min, lon_max, lat_min, lat_max -- emprise en degrés
+    zoom_min, zoom_max -- plage de zooms (incluse)
+    source -- GoogleTilesCache à remplir (défaut: la source partagée)
+    nb_threads -- nombre de téléchargements simultanés
+
+    Retourne:
+    nombre de tuiles présentes dans le cache pour cette emprise
+    """
+    source = source or tuiles_google(hors_ligne=False)
+    tuiles = [t for z in range(zoom_min, zoom_max + 1)
+              for t in tuiles_bbox(lon_min, lon_max, lat_min, lat_max, z)]
+    manquantes = [t for t in tuiles if source.cle(t) not in source.cache_disque]
+    print(f"{len(tuiles)} tuiles, dont {len(manquantes)} à télécharger")
+
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        list(executor.map(source.get_image, manquantes))
+    return sum(source.cle(t) in source.cache_disque for t in tuiles)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Préchargement du cache de tuiles cartographiques")
+    parser.add_argument('--bbox', type=float, nargs=4, default=[-5, 8, 42, 51],
+                        metavar=('LON_MIN', 'LON_MAX', 'LAT_MIN', 'LAT_MAX'))
+    parser.add_argument('--zoom', type=int, nargs=2, default=[6, 8], metavar=('MIN', 'MAX'))
+    args = parser.parse_args()
+
+    nb = prechauffer(*args.bbox, *args.zoom)
+    print(f"{nb} tuiles disponibles hors ligne")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,116 @@
 import pickle
 import pandas as pd
 import matplotlib.pyplot as plt
-from matplotlib.markers import MarkerStyle
-from matplotlib.colors import Normalize
+import matplotlib.dates as mdates
+from matplotlib.collections import LineCollection, PathCollection
+from matplotlib.colors import LogNorm, Normalize, to_hex, to_rgba
+from matplotlib.path import Path
 from matplotlib.textpath import TextPath
-from matplotlib.transforms import Affine2D
+from matplotlib.transforms import IdentityTransform
 import cartopy.crs as ccrs
-import cartopy.io.img_tiles as cimgt
 import cartopy.feature as cf
 import numpy as np
-import math 
 import streamlit as st
-from PIL import Image
-from io import BytesIO
-import requests
-from dotenv import load_dotenv
-import os
-import folium
+from avion import Flotte
+from tuiles import tuiles_google
+from index_spatial import IndexSpatial
+from images import service_images
+from carte_geojson import carte_geojson, collection_geojson, points_geojson, traces_geojson
+from instrumentation import mesure
+# Ancien utils.haversine, désormais vectorisé dans distances (réexporté pour les imports existants)
+from distances import haversine  # noqa: F401
 
+# Taille d'un glyphe "✈" en points
+TAILLE_GLYPHE = 12
 
+# Intervalle de rafraîchissement de la photo pendant son téléchargement (secondes)
+INTERVALLE_IMAGE_S = 1
+
+
+def _glyphes_orientes(caps):
+    """Construit un chemin "✈" de taille unitaire par avion, tourné selon son cap.
+    
+    Arguments:
+    caps -- tableau des directions vraies en degrés (0 = nord)
+    
+    Retourne:
+    liste de matplotlib.path.Path
+    """
+    symbole = TextPath((0, 0), "✈")
+    sommets = symbole.vertices - (symbole.vertices.max(axis=0) + symbole.vertices.min(axis=0)) / 2
+    sommets = sommets / (2 * np.abs(sommets).max())
+
+    # Rotation de tous les glyphes en une seule opération matricielle : (N, 2, 2) x (S, 2) -> (N, S, 2)
+    angles = np.radians(90 - np.nan_to_num(caps, nan=0.0))
+    cos, sin = np.cos(angles), np.sin(angles)
+    rotations = np.stack([np.stack([cos, -sin], axis=-1), np.stack([sin, cos], axis=-1)], axis=-2)
+    sommets_tournes = np.einsum('nij,sj->nsi', rotations, sommets)
+    return [Path(v, symbole.codes) for v in sommets_tournes]
+
+
+def _annoter_indicatifs(ax, flotte, largeur_pt=45, hauteur_pt=12):
+    """Ajoute les indicatifs en ne gardant qu'une étiquette par case de la taille d'une étiquette.
+    
+    Arguments:
+    ax -- GeoAxes dont l'emprise est déjà fixée
+    flotte -- Flotte des avions affichés
+    largeur_pt -- largeur approximative d'une étiquette en points
+    hauteur_pt -- hauteur approximative d'une étiquette en points
+    """
+    indicatifs = np.array([c.strip() if isinstance(c, str) else "" for c in flotte.callsign], dtype=object)
+    valides = (indicatifs != "") & (indicatifs != "N/A")
+    if not valides.any():
+        return
+    indicatifs = indicatifs[valides]
+
+    lon = flotte.longitude[valides] + 0.15
+    lat = flotte.latitude[valides] + 0.15
+    xy = ax.projection.transform_points(ccrs.PlateCarree(), lon, lat)[:, :2]
+    pixels = ax.transData.transform(xy)
+    dans_la_carte = (
+        (pixels[:, 0] >= ax.bbox.x0) & (pixels[:, 0] <= ax.bbox.x1) &
+        (pixels[:, 1] >= ax.bbox.y0) & (pixels[:, 1] <= ax.bbox.y1)
+    )
+
+    # Grille de cases de la taille d'une étiquette : une seule candidate par case (vectorisé),
+    # puis une étiquette n'est gardée que si les 4 cases qu'elle recouvre sont encore libres
+    points_vers_pixels = ax.figure.dpi / 72
+    cases = np.floor(pixels / [largeur_pt * points_vers_pixels, hauteur_pt * points_vers_pixels]).astype(np.int64)
+    candidats = np.flatnonzero(dans_la_carte)
+    _, premiers = np.unique(cases[candidats], axis=0, return_index=True)
+    candidats = np.sort(candidats[premiers])
+
+    occupees = set()
+    gardes = []
+    for i in candidats:
+        cx, cy = cases[i]
+        recouvertes = {(cx, cy), (cx + 1, cy), (cx, cy + 1), (cx + 1, cy + 1)}
+        if occupees.isdisjoint(recouvertes):
+            occupees |= recouvertes
+            gardes.append(i)
+
+    for i in gardes:
+        ax.text(
+            xy[i, 0],
+            xy[i, 1],
+            indicatifs[i],
+            fontsize=7,
+            transform=ax.transData,
+            color="black",
+            bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.7),
+            zorder=11
+        )
+
+
+@mesure('utils.plot_avions')
 def plot_avions(liste_avion, *args, **kwargs):
     """Affiche les avions sur une carte avec rotation selon direction et couleur selon vitesse.
     
+    Tous les avions sont dessinés par un seul PathCollection (un glyphe tourné par avion).
+    
     Arguments:
-    liste_avion -- liste d'objets Avion avec attributs longitude, latitude, velocity, true_track, on_ground, callsign
-    show_callsign -- (kwarg bool) afficher les indicatifs (défaut: False)
+    liste_avion -- Flotte, ou liste d'objets Avion avec attributs longitude, latitude, velocity, true_track, on_ground, callsign
+    show_callsign -- (kwarg bool) afficher les indicatifs, sans chevauchement (défaut: False)
     show_ground -- (kwarg bool) afficher les avions au sol (défaut: False)
     
     Retourne:
@@ -32,74 +118,49 @@ def plot_avions(liste_avion, *args, **kwargs):
     """
     fig = plt.figure(figsize=(6, 6))
     
-    stamen_terrain = cimgt.GoogleTiles("RGB")
-    ax = fig.add_subplot(1, 1, 1, projection=stamen_terrain.crs)
+    tile = tuiles_google()
+    ax = fig.add_subplot(1, 1, 1, projection=tile.crs)
     ax.set_extent([-5, 8, 42, 51], crs=ccrs.Geodetic())
-    ax.add_image(cimgt.GoogleTiles("RGB"), 8)
-    
-    SYMBOL = TextPath((0, 0), "✈")
+    ax.add_image(tile, 8)
     
     show_callsign = kwargs.get('show_callsign', False)
     show_ground = kwargs.get('show_ground', False)
     
-    avions_valides = []
-    for avion in liste_avion:
-        if avion.longitude is None or avion.latitude is None:
-            continue
-        if not show_ground and avion.on_ground:
-            continue
-        avions_valides.append(avion)
+    flotte = liste_avion if isinstance(liste_avion, Flotte) else Flotte.from_avions(liste_avion)
+    masque = flotte.is_valid_position()
+    if not show_ground:
+        masque &= ~flotte.on_ground
+    flotte = flotte[masque]
     
-    if not avions_valides:
-        print("Aucun avion à afficher")
-        return
+    if len(flotte) == 0:
+        # Carte vide plutôt que None : le rendu reste enregistrable et mis en cache
+        ax.set_title("Aucun avion à afficher", fontsize=16, fontweight='bold', pad=20)
+        return fig
     
-    vitesses = [a.velocity for a in avions_valides]
-    if len(vitesses) > 0 and max(vitesses) > 0:
-        norm = Normalize(vmin=min(vitesses), vmax=max(vitesses))
-        cmap = plt.cm.cividis  
+    vitesses = np.nan_to_num(flotte.velocity, nan=0.0)
+    if vitesses.max() > 0:
+        norm = Normalize(vmin=vitesses.min(), vmax=vitesses.max())
+        cmap = plt.cm.cividis
+        couleurs = cmap(norm(vitesses))
     else:
         norm = None
         cmap = None
+        couleurs = np.tile(to_rgba('red'), (len(flotte), 1))
+    couleurs[flotte.on_ground] = to_rgba('gray')
     
-    for avion in avions_valides:
-        angle_rotation = 90 - avion.true_track
-        
-        t = Affine2D().rotate_deg(angle_rotation).scale(0.08)
-        marker = MarkerStyle(SYMBOL)
-        marker._transform = t
-        
-        if cmap and norm:
-            couleur = cmap(norm(avion.velocity))
-        else:
-            couleur = 'red'
-        
-        if avion.on_ground:
-            couleur = 'gray'
-        
-        ax.plot(
-            avion.longitude,
-            avion.latitude,
-            marker=marker,
-            color=couleur,
-            markersize=20,
-            transform=ccrs.PlateCarree(),
-            markeredgecolor='white',
-            markeredgewidth=0.8,
-            zorder=10
-        )
-        
-        if show_callsign and avion.callsign and avion.callsign != "N/A":
-            ax.text(
-                avion.longitude + 0.15,
-                avion.latitude + 0.15,
-                avion.callsign,
-                fontsize=7,
-                transform=ccrs.PlateCarree(),
-                color="black",
-                bbox=dict(boxstyle="round,pad=0.3", facecolor="white", alpha=0.7),
-                zorder=11
-            )
+    positions = ax.projection.transform_points(ccrs.PlateCarree(), flotte.longitude, flotte.latitude)[:, :2]
+    glyphes = PathCollection(
+        _glyphes_orientes(flotte.true_track),
+        sizes=[TAILLE_GLYPHE ** 2],
+        facecolors=couleurs,
+        edgecolors='white',
+        linewidths=0.8,
+        offsets=positions,
+        offset_transform=ax.transData,
+        transform=IdentityTransform(),
+        zorder=10
+    )
+    ax.add_collection(glyphes)
     
     if cmap and norm:
         sm = plt.cm.ScalarMappable(cmap=cmap, norm=norm)
@@ -108,8 +169,12 @@ def plot_avions(liste_avion, *args, **kwargs):
                            pad=0.05, shrink=0.7, aspect=30)
         cbar.set_label('Vitesse (m/s)', fontsize=12)
     
-    nb_vol = sum(1 for a in avions_valides if not a.on_ground)
-    nb_sol = sum(1 for a in avions_valides if a.on_ground)
+    # Après la colorbar, qui redimensionne l'axe et donc les positions à l'écran
+    if show_callsign:
+        _annoter_indicatifs(ax, flotte)
+    
+    nb_sol = int(flotte.on_ground.sum())
+    nb_vol = len(flotte) - nb_sol
     
     titre = f'Trafic aérien - {nb_vol} avions en vol'
     if show_ground:
@@ -119,17 +184,21 @@ def plot_avions(liste_avion, *args, **kwargs):
     return fig
 
 
-def tracer_position_moyenne(df_af):
-    """Trace les positions des vols et leur centre géographique moyen.
+@mesure('utils.tracer_position_moyenne')
+def tracer_position_moyenne(regions, lat_moyenne, lon_moyenne):
+    """Trace les positions moyennes des vols par région et leur centre géographique moyen.
+    
+    Les positions viennent du cube d'agrégats : la figure ne dépend pas du nombre de positions brutes.
     
     Arguments:
-    df_af -- DataFrame avec colonnes 'lat' et 'lon'
+    regions -- DataFrame avec colonnes 'latitude_moyenne', 'longitude_moyenne' et 'nb_positions'
+               (une ligne par région, voir CubeAgregats.agreger(['region']))
+    lat_moyenne, lon_moyenne -- position moyenne de l'ensemble des vols en degrés
     
     Retourne:
     figure matplotlib
     """
-    lat_moyenne = df_af['lat'].mean()
-    lon_moyenne = df_af['lon'].mean()
+    regions = regions.dropna(subset=['latitude_moyenne', 'longitude_moyenne'])
 
     fig = plt.figure(figsize=(10, 8))
     ax = plt.axes(projection=ccrs.PlateCarree())
@@ -141,24 +210,49 @@ def tracer_position_moyenne(df_af):
     ax.add_feature(cf.LAKES, alpha=0.5)
     ax.add_feature(cf.RIVERS)
 
-    ax.scatter(df_af['lon'], df_af['lat'], s=20, marker='o', transform=ccrs.PlateCarree(), label="Vols")
+    # Surface des points proportionnelle au nombre de positions de la région
+    tailles = 20 + 400 * regions['nb_positions'] / max(regions['nb_positions'].max(), 1)
+    ax.scatter(regions['longitude_moyenne'], regions['latitude_moyenne'], s=tailles, marker='o', alpha=0.7,
+               transform=ccrs.PlateCarree(), label="Vols (position moyenne par région)")
     ax.scatter(lon_moyenne, lat_moyenne, s=100, color='red', marker='x',
             transform=ccrs.PlateCarree(), label="Position moyenne")
 
     ax.legend()
 
     ax.set_extent([
-        df_af['lon'].min() - 1, df_af['lon'].max() + 1,
-        df_af['lat'].min() - 1, df_af['lat'].max() + 1
+        regions['longitude_moyenne'].min() - 1, regions['longitude_moyenne'].max() + 1,
+        regions['latitude_moyenne'].min() - 1, regions['latitude_moyenne'].max() + 1
     ])
     return fig
 
 
-def plot_trajet_avion(df_vol):
+def _premiere_colonne(df, noms):
+    """Retourne le premier nom de colonne présent dans df (None si aucun)."""
+    return next((nom for nom in noms if nom in df.columns), None)
+
+
+def _ligne_coloree(ax, x, y, valeurs, cmap, norm, **kwargs):
+    """Trace une polyligne en un seul artiste, chaque segment coloré par la valeur de son point de départ."""
+    points = np.column_stack([x, y])
+    segments = np.stack([points[:-1], points[1:]], axis=1)
+    ligne = LineCollection(segments, cmap=cmap, norm=norm, **kwargs)
+    ligne.set_array(np.asarray(valeurs, dtype=np.float64)[:-1])
+    ax.add_collection(ligne)
+    return ligne
+
+
+@mesure('utils.plot_trajet_avion')
+def plot_trajet_avion(df_vol, couleur='temps', profils=False):
     """Trace la trajectoire d'un avion unique avec dégradé de couleurs.
     
+    La trajectoire est dessinée en une seule LineCollection (plus un seul nuage de points),
+    quelle que soit sa longueur.
+    
     Arguments:
     df_vol -- DataFrame avec colonnes 'longitude', 'latitude', 'manufacturericao', 'icao24', 'model'
+              (et 'time', 'baroaltitude', 'velocity' pour les couleurs et profils)
+    couleur -- 'temps' (dégradé du début à la fin du vol) ou 'altitude'
+    profils -- ajoute sous la carte les profils d'altitude et de vitesse, colorés de la même façon
     
     Retourne:
     figure matplotlib
@@ -168,10 +262,15 @@ def plot_trajet_avion(df_vol):
     lat_min = df_vol['latitude'].min()
     lat_max = df_vol['latitude'].max()
 
-    fig = plt.figure(figsize=(6,6), dpi=100)
+    if profils:
+        fig = plt.figure(figsize=(6, 9), dpi=100)
+        grille = fig.add_gridspec(3, 1, height_ratios=[4, 1, 1], hspace=0.35)
+    else:
+        fig = plt.figure(figsize=(6,6), dpi=100)
+        grille = fig.add_gridspec(1, 1)
 
-    tile = cimgt.GoogleTiles("RGB")
-    ax = fig.add_subplot(1, 1, 1, projection=tile.crs)
+    tile = tuiles_google()
+    ax = fig.add_subplot(grille[0], projection=tile.crs)
     window = [long_min-5, long_max+5, lat_min-1, lat_max+1]
     ax.set_extent(window, crs=ccrs.Geodetic())
 
@@ -181,18 +280,59 @@ def plot_trajet_avion(df_vol):
     ax.add_feature(cf.COASTLINE)
     ax.set_title(f"{df_vol['manufacturericao'].unique()[0]}: {df_vol['icao24'].unique()[0]}, model {df_vol['model'].unique()[0]}")
 
-    cmap = plt.cm.get_cmap('jet')
-    for i in range(0, len(df_vol)):
-        x = df_vol.loc[i, 'longitude']
-        y = df_vol.loc[i, 'latitude']
-        ax.scatter(x, y, color=cmap(i / len(df_vol)), s=30, transform=ccrs.Geodetic())
-    return fig  
+    colonne_temps = _premiere_colonne(df_vol, ['time', 'time_position'])
+    colonne_altitude = _premiere_colonne(df_vol, ['baroaltitude', 'baro_altitude', 'geoaltitude', 'geo_altitude'])
+    colonne_vitesse = _premiere_colonne(df_vol, ['velocity'])
+    temps = (df_vol[colonne_temps].to_numpy(dtype=np.float64) if colonne_temps
+             else np.arange(len(df_vol), dtype=np.float64))
 
-def plot_tous_les_vols(df):
+    if couleur == 'altitude' and colonne_altitude:
+        valeurs = df_vol[colonne_altitude].to_numpy(dtype=np.float64)
+        legende = 'Altitude (m)'
+    else:
+        valeurs = temps
+        legende = None
+    norm = Normalize(np.nanmin(valeurs), np.nanmax(valeurs)) if len(valeurs) else Normalize()
+    cmap = plt.get_cmap('jet')
+
+    xy = ax.projection.transform_points(ccrs.PlateCarree(), df_vol['longitude'].to_numpy(dtype=np.float64),
+                                        df_vol['latitude'].to_numpy(dtype=np.float64))[:, :2]
+    _ligne_coloree(ax, xy[:, 0], xy[:, 1], valeurs, cmap, norm, linewidth=2, zorder=9)
+    ax.scatter(xy[:, 0], xy[:, 1], c=valeurs, cmap=cmap, norm=norm, s=12, transform=ax.projection, zorder=10)
+    if legende:
+        cbar = fig.colorbar(plt.cm.ScalarMappable(norm=norm, cmap=cmap), ax=ax, shrink=0.7)
+        cbar.set_label(legende)
+
+    if profils:
+        dates = pd.to_datetime(temps, unit='s') if colonne_temps else temps
+        x = mdates.date2num(dates) if colonne_temps else temps
+        for rang, (colonne, titre) in enumerate([(colonne_altitude, 'Altitude (m)'), (colonne_vitesse, 'Vitesse (m/s)')], start=1):
+            ax_profil = fig.add_subplot(grille[rang])
+            y = df_vol[colonne].to_numpy(dtype=np.float64) if colonne else np.empty(0)
+            # Profil sans aucune valeur connue (colonne absente ou toute en NaN) : axes laissés vides
+            if np.isfinite(y).any() and np.isfinite(x).any():
+                _ligne_coloree(ax_profil, x, y, valeurs, cmap, norm, linewidth=2)
+                ax_profil.set_xlim(np.nanmin(x), np.nanmax(x))
+                ax_profil.set_ylim(np.nanmin(y) - 1, np.nanmax(y) * 1.05 + 1)
+            ax_profil.set_ylabel(titre)
+            if colonne_temps:
+                ax_profil.xaxis.set_major_formatter(mdates.DateFormatter('%H:%M'))
+    return fig
+
+@mesure('utils.plot_tous_les_vols')
+def plot_tous_les_vols(df, mode='densite', resolution=1.0):
     """Trace tous les vols d'une journée sur une seule carte.
     
+    En mode 'densite', toutes les positions sont comptées en une passe dans une grille de
+    la résolution de l'écran (en Web Mercator, comme les tuiles), puis la grille est
+    affichée en échelle logarithmique par-dessus le fond de carte : le coût du tracé ne
+    dépend plus du nombre de points. Le mode 'points' trace chaque position, colorée
+    par vol, en un seul appel.
+    
     Arguments:
-    df -- DataFrame avec colonnes 'longitude', 'latitude', 'icao24', 'date'
+    df -- DataFrame avec colonnes 'longitude', 'latitude', 'date' (et 'flight_id' ou 'icao24' en mode 'points')
+    mode -- 'densite' ou 'points'
+    resolution -- taille d'une case de la grille en pixels de la figure (mode 'densite')
     
     Retourne:
     figure matplotlib
@@ -203,7 +343,7 @@ def plot_tous_les_vols(df):
     lat_max = df['latitude'].max()
 
     fig = plt.figure(figsize=(12, 12), dpi=100)
-    tile = cimgt.GoogleTiles("RGB")
+    tile = tuiles_google()
     ax2 = fig.add_subplot(1, 1, 1, projection=tile.crs)
     ax2.set_extent([long_min-5, long_max+5, lat_min-1, lat_max+1], crs=ccrs.Geodetic())
     ax2.add_image(tile, 6)
@@ -212,135 +352,123 @@ def plot_tous_les_vols(df):
     ax2.add_feature(cf.COASTLINE)
     ax2.set_title(f"Tous les vols du {df['date'].dt.day.iloc[0]}/{df['date'].dt.month.iloc[0]}/{df['date'].dt.year.iloc[0]}")
 
-    vol_ids = df['icao24'].unique()
-    cmap = plt.cm.get_cmap('tab20', len(vol_ids))
-
-    for idx, vol in enumerate(vol_ids):
-        df_vol = df[df['icao24'] == vol]
-        ax2.scatter(df_vol['longitude'], df_vol['latitude'], 
-                    color=cmap(idx), s=20, alpha=0.6,
-                    transform=ccrs.Geodetic(), label=vol if idx < 10 else "")
+    positions = df[['longitude', 'latitude']].dropna().to_numpy(dtype=np.float64)
+    xy = ax2.projection.transform_points(ccrs.PlateCarree(), positions[:, 0], positions[:, 1])[:, :2]
+
+    if mode == 'densite':
+        x0, x1, y0, y1 = ax2.get_extent()
+        nx = max(1, int(ax2.bbox.width / resolution))
+        ny = max(1, int(ax2.bbox.height / resolution))
+        grille, _, _ = np.histogram2d(xy[:, 1], xy[:, 0], bins=(ny, nx), range=((y0, y1), (x0, x1)))
+        grille = np.where(grille > 0, grille, np.nan)
+        image = ax2.imshow(grille, extent=(x0, x1, y0, y1), origin='lower', transform=ax2.projection,
+                           cmap='inferno', norm=LogNorm(vmin=1, vmax=max(np.nanmax(grille, initial=1), 2)),
+                           interpolation='nearest', alpha=0.85, zorder=5)
+        cbar = fig.colorbar(image, ax=ax2, orientation='horizontal', pad=0.04, shrink=0.7, aspect=30)
+        cbar.set_label('Positions par pixel')
+    else:
+        cle_vol = 'flight_id' if 'flight_id' in df.columns else 'icao24'
+        vols = pd.factorize(df.loc[df[['longitude', 'latitude']].notna().all(axis=1), cle_vol])[0]
+        ax2.scatter(xy[:, 0], xy[:, 1], c=vols % 20, cmap='tab20', vmin=0, vmax=19,
+                    s=20, alpha=0.6, transform=ax2.projection, zorder=5)
 
     return fig
 
 
-def haversine(lat1, lon1, lat2, lon2):
-    """Calcule la distance entre deux points géographiques.
+@mesure('utils.collection_approches')
+def collection_approches(df, evenements, lat_aero, lon_aero, airport_name, _index=None):
+    """Construit la collection GeoJSON des approches d'un aéroport dans un rayon de 15km.
+    
+    Seuls des événements déjà détectés (voir evenements.evenements_aeroports) sont tracés :
+    la trajectoire et le dernier point des arrivées, le point bas des remises des gaz.
     
     Arguments:
-    lat1 -- latitude du premier point en degrés
-    lon1 -- longitude du premier point en degrés
-    lat2 -- latitude du deuxième point en degrés
-    lon2 -- longitude du deuxième point en degrés
+    df -- DataFrame avec colonnes 'icao24', 'latitude', 'longitude', 'time' (et 'flight_id' si les vols sont segmentés)
+    evenements -- table des événements indexée par aéroport
+    lat_aero -- latitude de l'aéroport (float)
+    lon_aero -- longitude de l'aéroport (float)
+    airport_name -- nom de l'aéroport (str), clé de evenements
+    _index -- IndexSpatial déjà construit sur df (défaut: construit à la volée)
     
     Retourne:
-    distance en kilomètres (float)
+    FeatureCollection GeoJSON (dict)
     """
-    R = 6371
-    dlat = math.radians(lat2 - lat1)
-    dlon = math.radians(lon2 - lon1)
-    a = math.sin(dlat/2)**2 + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dlon/2)**2
-    return 2 * R * math.asin(math.sqrt(a))
-
-
-@st.cache_data
-def plot_approches_aeroport(df, lat_aero, lon_aero, airport_name):
-    """Crée une carte interactive Folium des approches aéroportuaires dans un rayon de 5km.
+    index = _index if _index is not None else IndexSpatial.from_dataframe(df)
+    df_proche = df.iloc[index.query_radius_km(lat_aero, lon_aero, 15)]
+
+    # Un tracé par vol (legs de segmentation.segmenter_vols), à défaut par avion
+    vol = 'flight_id' if 'flight_id' in df_proche.columns else 'icao24'
+    evenements_aero = evenements.loc[evenements.index == airport_name]
+    arrivees = evenements_aero[evenements_aero['type'] == 'arrivee']
+    df_arrivals = df_proche[df_proche[vol].isin(arrivees[vol])].sort_values([vol, 'time'], kind='stable')
+
+    # Couleur par vol (palette tab20) et dernier point de chaque trajectoire
+    numeros = df_arrivals.groupby(vol, sort=False).ngroup().to_numpy()
+    palette = np.array([to_hex(c) for c in plt.get_cmap('tab20').colors])
+    df_arrivals = df_arrivals.assign(couleur=palette[numeros % 20], infobulle="ICAO24: " + df_arrivals['icao24'].astype(str))
+    derniers = df_arrivals[df_arrivals.groupby(vol, sort=False).cumcount(ascending=False) == 0]
+    derniers = derniers[derniers[vol].map(df_arrivals[vol].value_counts()) >= 2].assign(rayon=10)
+
+    remises = evenements_aero[evenements_aero['type'] == 'remise_des_gaz']
+    remises = remises.assign(couleur='orange', rayon=8,
+                             infobulle="Remise des gaz - ICAO24: " + remises['icao24'].astype(str)
+                             + ", " + remises['altitude'].map('{:.0f}'.format).astype(str) + " m")
+    aeroport = pd.DataFrame({'latitude': [lat_aero], 'longitude': [lon_aero], 'couleur': ['red'],
+                             'rayon': [12], 'infobulle': [airport_name]})
+
+    return collection_geojson(
+        traces_geojson(df_arrivals, vol, proprietes=['couleur', 'infobulle']),
+        points_geojson(derniers, proprietes=['couleur', 'rayon', 'infobulle']),
+        points_geojson(remises, proprietes=['couleur', 'rayon', 'infobulle']),
+        points_geojson(aeroport, proprietes=['couleur', 'rayon', 'infobulle']),
+    )
+
+
+@mesure('utils.plot_approches_aeroport')
+def plot_approches_aeroport(df, evenements, lat_aero, lon_aero, airport_name, _index=None):
+    """Crée une carte interactive Folium des approches aéroportuaires dans un rayon de 15km.
+    
+    Toutes les trajectoires et tous les marqueurs forment une seule couche GeoJSON
+    (voir collection_approches).
     
     Arguments:
-    df -- DataFrame avec colonnes 'on_ground', 'icao24', 'latitude', 'longitude', 'time'
-    lat_aero -- latitude de l'aéroport (float)
-    lon_aero -- longitude de l'aéroport (float)
-    airport_name -- nom de l'aéroport (str)
+    voir collection_approches
     
     Retourne:
     objet folium.Map
     """
-    import random
-    
-    # Haversine vectorisé
-    R = 6371
-    lat1_rad = np.radians(lat_aero)
-    lat2_rad = np.radians(df['latitude'])
-    dlat = lat2_rad - lat1_rad
-    dlon = np.radians(df['longitude'] - lon_aero)
-    
-    a = np.sin(dlat/2)**2 + np.cos(lat1_rad) * np.cos(lat2_rad) * np.sin(dlon/2)**2
-    distances = 2 * R * np.arcsin(np.sqrt(a))
-    
-    df_proche = df[distances <= 15].copy()
-    
-    m = folium.Map(location=[lat_aero, lon_aero], zoom_start=13)
-
-    folium.Marker(
-        [lat_aero, lon_aero],
-        popup=airport_name,
-        icon=folium.Icon(color="red", icon="plane", prefix="fa")
-    ).add_to(m)
-
-    df_ground = df_proche[df_proche['on_ground'] == True]
-
-    arriving_planes = []
-    for icao, g in df_ground.groupby('icao24'):
-        last = g.sort_values('time').tail(1)
-        if (abs(last['latitude'].iloc[0] - lat_aero) < 0.01) and \
-           (abs(last['longitude'].iloc[0] - lon_aero) < 0.01):
-            arriving_planes.append(icao)
-
-    df_arrivals = df_proche[df_proche['icao24'].isin(arriving_planes)]
-
-    colors = {icao: "#{:06x}".format(random.randint(0, 0xFFFFFF)) 
-              for icao in df_arrivals['icao24'].unique()}
-
-    for icao, g in df_arrivals.groupby('icao24'):
-        g = g.sort_values('time').tail(150).dropna(subset=['latitude', 'longitude'])
-        
-        if len(g) < 2:
-            continue
-        
-        points = list(zip(g['latitude'], g['longitude']))
-        
-        folium.CircleMarker(
-            location=[g['latitude'].iloc[-1], g['longitude'].iloc[-1]],
-            radius=10,
-            color=colors[icao],
-            fill=True,
-            fill_color=colors[icao],
-            fill_opacity=0.9,
-            tooltip=f"ICAO24: {icao}"
-        ).add_to(m)
-
-        folium.PolyLine(
-            locations=points,
-            weight=2,
-            opacity=0.8,
-            color=colors[icao]
-        ).add_to(m)
-
-    return m
+    collection = collection_approches(df, evenements, lat_aero, lon_aero, airport_name, _index)
+    return carte_geojson(collection, [lat_aero, lon_aero], 13)
 
 
+@mesure('utils.charger_image_unsplash')
 def charger_image_unsplash(model_name, largeur_max=200):
-    """Charge et affiche une image aléatoire d'avion depuis l'API Unsplash.
-    
+    """Affiche une photo du modèle d'avion (Unsplash), servie depuis le cache disque si possible.
+
+    Pour ne pas bloquer la page, appeler service_images().demander(model_name, largeur_max)
+    avant de tracer la carte : le téléchargement se fait pendant le rendu. La photo n'est
+    jamais attendue : tant qu'elle se télécharge, l'image de remplacement est affichée
+    dans un fragment relancé chaque seconde, puis la page est relancée une fois la photo arrivée.
+
     Arguments:
     model_name -- nom du modèle d'avion à rechercher (str)
     largeur_max -- largeur maximale de l'image en pixels (int, défaut: 200)
-    
+
     Retourne:
     None (affiche directement dans Streamlit)
     """
-    load_dotenv() 
-    access_key = os.getenv("UNSPLASH_ACCESS_KEY")
-    url = f"https://api.unsplash.com/photos/random?query={model_name}&client_id={access_key}"
-
-    try:
-        resp = requests.get(url, timeout=5).json()
-        img_url = resp['urls']['regular']
-        img = Image.open(BytesIO(requests.get(img_url).content))
-        if img.width > largeur_max:
-            ratio = largeur_max / img.width
-            img = img.resize((largeur_max, int(img.height * ratio)))
-        st.image(img, caption=f"Image de {model_name}", use_container_width=False)
-    except:
-        st.warning("Clé Unsplash non définie. Créez un fichier .env avec UNSPLASH_ACCESS_KEY")
\ No newline at end of file
+    service = service_images()
+    en_attente = service.demander(model_name, largeur_max) is not None
+
+    @st.fragment(run_every=INTERVALLE_IMAGE_S if en_attente else None)
+    def afficher():
+        if en_attente and not service.en_attente(model_name, largeur_max):
+            # Téléchargement terminé (photo ou échec mémorisé) : la page relancée arrête le rafraîchissement
+            st.rerun()
+        donnees, photo = service.image(model_name, largeur_max, attente=0)
+        legende = f"Image de {model_name}" + (" (chargement...)" if service.en_attente(model_name, largeur_max) else "")
+        st.image(donnees, caption=legende, use_container_width=False)
+        if not photo and not service.cle_acces:
+            st.warning("Clé Unsplash non définie. Créez un fichier .env avec UNSPLASH_ACCESS_KEY")
+
+    afficher()